@@ -0,0 +1,396 @@
+import argparse
+import collections
+import json
+import math
+import queue
+import sys
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import config
+
+# =======================================
+# Alertes en continu sur le flux de mesures
+# =======================================
+#
+# Chaque mesure passe par AlertEngine.process() en O(1), sans accès à la
+# base:
+#   - seuils avertissement/critique avec hystérésis (une alerte levée ne
+#     retombe que sous seuil - hystérésis, sans battement autour du seuil);
+#   - moyenne mobile exponentielle (EWMA) et vitesse de montée en °C/s,
+#     avec projection à une période: alerte de throttling thermique dès la
+#     mesure où le seuil critique sera atteint à la suivante;
+#   - score z sur fenêtre glissante (sommes incrémentales): valeurs
+#     aberrantes par rapport aux window dernières mesures.
+#
+# Les alertes (levée puis retour à la normale) sont transmises aux sinks:
+# fichier journal, sortie standard, webhook HTTP local, et base de données
+# via l'écrivain par lots (table alerts, transaction distincte après chaque lot).
+#
+# Utilisation (récepteur webhook de test):
+#   python alerts.py listen --port 9600
+
+# Niveaux de gravité (ordre croissant)
+NORMAL = 'normal'
+WARNING = 'warning'
+CRITICAL = 'critical'
+SEVERITY_ORDER = {NORMAL: 0, WARNING: 1, CRITICAL: 2}
+
+# États d'une alerte
+RAISED = 'raised'
+CLEARED = 'cleared'
+
+Alert = collections.namedtuple('Alert', 'timestamp kind severity state value message')
+
+_STOP = object()  # Sentinelle de fin du thread webhook
+
+
+def alert_to_dict(alert):
+    data = alert._asdict()
+    data['timestamp'] = alert.timestamp.isoformat(timespec='milliseconds')
+    return data
+
+
+# === Détecteurs ===
+
+class ThresholdDetector:
+    """Seuils avertissement/critique avec hystérésis"""
+
+    kind = 'threshold'
+
+    def __init__(self, warning, critical, hysteresis):
+        self.warning = float(warning)
+        self.critical = float(critical)
+        self.hysteresis = float(hysteresis)
+        self.level = NORMAL
+
+    def reset(self):
+        self.level = NORMAL
+
+    def target_level(self, temp_c):
+        """Niveau justifié par la mesure: montée dès le franchissement,
+        descente seulement sous seuil - hystérésis"""
+        if temp_c > self.critical:
+            return CRITICAL
+        if self.level == CRITICAL and temp_c >= self.critical - self.hysteresis:
+            return CRITICAL
+        if temp_c > self.warning:
+            return WARNING
+        if self.level != NORMAL and temp_c >= self.warning - self.hysteresis:
+            return WARNING
+        return NORMAL
+
+    def update(self, timestamp, temp_c, dt):
+        level = self.target_level(temp_c)
+        if level == self.level:
+            return None
+        previous, self.level = self.level, level
+        if level == NORMAL:
+            return Alert(timestamp, self.kind, previous, CLEARED, temp_c,
+                         f"Température revenue à la normale ({temp_c:.1f} °C)")
+        limit = self.critical if level == CRITICAL else self.warning
+        return Alert(timestamp, self.kind, level, RAISED, temp_c,
+                     f"Température {temp_c:.1f} °C au-dessus du seuil {limit:.0f} °C")
+
+
+class RiseDetector:
+    """EWMA et vitesse de montée; alerte de throttling projetée à une période"""
+
+    kind = 'rise'
+
+    def __init__(self, alpha, max_rate, critical, period):
+        self.alpha = float(alpha)
+        self.max_rate = float(max_rate)      # °C/s
+        self.critical = float(critical)
+        self.period = float(period)          # s, horizon de projection
+        self.reset()
+
+    def reset(self):
+        self.ewma = None
+        self.rate = 0.0
+        self.active = False
+
+    def update(self, timestamp, temp_c, dt):
+        if self.ewma is None or not dt or dt <= 0:
+            self.ewma = temp_c
+            return None
+        previous = self.ewma
+        self.ewma += self.alpha * (temp_c - self.ewma)
+        self.rate = (self.ewma - previous) / dt
+
+        # Projection de la mesure brute: la prochaine lecture dépassera-t-elle le seuil?
+        projected = temp_c + max(self.rate, 0.0) * self.period
+        rising = self.rate > self.max_rate or (temp_c <= self.critical < projected)
+        if rising and not self.active:
+            self.active = True
+            if projected > self.critical >= temp_c:
+                return Alert(timestamp, 'throttle', CRITICAL, RAISED, temp_c,
+                             f"Throttling thermique imminent: {temp_c:.1f} °C, +{self.rate:.2f} °C/s, "
+                             f"{projected:.1f} °C attendus dans {self.period:.0f} s")
+            return Alert(timestamp, self.kind, WARNING, RAISED, self.rate,
+                         f"Montée rapide: +{self.rate:.2f} °C/s ({temp_c:.1f} °C)")
+        if self.active and self.rate < self.max_rate / 2 and projected <= self.critical:
+            self.active = False
+            return Alert(timestamp, self.kind, NORMAL, CLEARED, self.rate,
+                         f"Montée en température terminée ({self.rate:+.2f} °C/s)")
+        return None
+
+
+class ZScoreDetector:
+    """Valeurs aberrantes: score z par rapport aux window dernières mesures.
+
+    min_stddev évite qu'un capteur stable (ou au degré près) rende
+    aberrant le moindre écart; l'alerte est close quand |z| repasse sous
+    la moitié du seuil.
+    """
+
+    kind = 'zscore'
+
+    def __init__(self, window, threshold, min_samples=30, min_stddev=1.0):
+        self.window = int(window)
+        self.threshold = float(threshold)
+        self.min_samples = min(int(min_samples), self.window)
+        self.min_stddev = float(min_stddev)
+        self.reset()
+
+    def reset(self):
+        self.values = collections.deque(maxlen=self.window)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.active = False
+
+    def update(self, timestamp, temp_c, dt):
+        alert = None
+        n = len(self.values)
+        if n >= self.min_samples:
+            mean = self.total / n
+            variance = max(self.total_sq / n - mean * mean, 0.0)
+            z = (temp_c - mean) / max(math.sqrt(variance), self.min_stddev)
+            if abs(z) > self.threshold and not self.active:
+                self.active = True
+                alert = Alert(timestamp, self.kind, WARNING, RAISED, temp_c,
+                              f"Mesure aberrante: {temp_c:.1f} °C (z = {z:+.1f}, "
+                              f"moyenne {mean:.1f} °C sur {n} mesures)")
+            elif self.active and abs(z) < self.threshold / 2:
+                self.active = False
+                alert = Alert(timestamp, self.kind, NORMAL, CLEARED, temp_c,
+                              f"Mesures de nouveau cohérentes ({temp_c:.1f} °C, z = {z:+.1f})")
+
+        # Fenêtre glissante en O(1): retirer la plus ancienne, ajouter la nouvelle
+        if n == self.window:
+            oldest = self.values[0]
+            self.total -= oldest
+            self.total_sq -= oldest * oldest
+        self.values.append(temp_c)
+        self.total += temp_c
+        self.total_sq += temp_c * temp_c
+        return alert
+
+
+# === Sinks ===
+
+class StdoutSink:
+    def __call__(self, alert):
+        print(f"[{alert.timestamp:%H:%M:%S}] {alert.severity.upper()} {alert.kind}: {alert.message}")
+
+
+class LogSink:
+    """Une ligne JSON par alerte dans un fichier"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def __call__(self, alert):
+        line = json.dumps(alert_to_dict(alert), ensure_ascii=False)
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+class WebhookSink:
+    """POST JSON vers une URL, depuis un thread de fond (jamais sur le chemin de mesure)"""
+
+    def __init__(self, url, timeout=2.0, queue_size=1000):
+        self.url = url
+        self.timeout = timeout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.sent = 0
+        self.failed = 0
+        self.thread = threading.Thread(target=self._run, name="alert-webhook", daemon=True)
+        self.thread.start()
+
+    def __call__(self, alert):
+        if self.thread is None:
+            self.failed += 1  # Sink fermé
+            return
+        try:
+            self.queue.put_nowait(alert)
+        except queue.Full:
+            self.failed += 1
+
+    def close(self, timeout=5.0):
+        """Envoie les alertes encore en file puis arrête le thread"""
+        if self.thread is None:
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass  # Thread démon: abandonné avec les alertes restantes
+        self.thread.join(timeout)
+        self.thread = None
+
+    def _run(self):
+        while True:
+            alert = self.queue.get()
+            if alert is _STOP:
+                return
+            body = json.dumps(alert_to_dict(alert), ensure_ascii=False).encode('utf-8')
+            request = urllib.request.Request(self.url, data=body, method='POST',
+                                             headers={'Content-Type': 'application/json'})
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout):
+                    pass
+                self.sent += 1
+            except OSError:
+                self.failed += 1
+
+
+class DatabaseSink:
+    """Enregistre les alertes dans la table alerts via l'écrivain par lots"""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def __call__(self, alert):
+        if self.writer is not None:
+            self.writer.submit_alert(alert)
+
+
+def build_sinks(names, log_path=None, webhook_url=None):
+    """Sinks à partir de leurs noms ('log', 'stdout', 'webhook')"""
+    sinks = []
+    for name in names:
+        if name == 'log':
+            sinks.append(LogSink(log_path or config.ALERT_LOG_PATH))
+        elif name == 'stdout':
+            sinks.append(StdoutSink())
+        elif name == 'webhook':
+            url = webhook_url or config.ALERT_WEBHOOK_URL
+            if url:
+                sinks.append(WebhookSink(url))
+        else:
+            raise ValueError(f"Sink d'alerte inconnu: {name}")
+    return sinks
+
+
+# === Moteur ===
+
+class AlertEngine:
+    """Applique les détecteurs à chaque mesure et diffuse les alertes aux sinks"""
+
+    def __init__(self, detectors, sinks=()):
+        self.detectors = list(detectors)
+        self.sinks = list(sinks)
+        self.threshold = next((d for d in self.detectors if isinstance(d, ThresholdDetector)), None)
+        self.last_timestamp = None
+        self.lock = threading.Lock()
+        self.recent = collections.deque(maxlen=50)
+        self.raised = 0
+
+    @property
+    def level(self):
+        """Niveau courant des seuils (normal, warning, critical)"""
+        return self.threshold.level if self.threshold is not None else NORMAL
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def close(self):
+        """Ferme les sinks qui en ont besoin (threads d'envoi)"""
+        for sink in self.sinks:
+            close = getattr(sink, 'close', None)
+            if close is not None:
+                close()
+
+    def reset(self):
+        with self.lock:
+            self.last_timestamp = None
+            for detector in self.detectors:
+                detector.reset()
+
+    def process(self, timestamp, temp_c):
+        """Évalue une mesure; retourne la liste des alertes produites"""
+        if temp_c is None:
+            return []
+        with self.lock:
+            dt = (timestamp - self.last_timestamp).total_seconds() if self.last_timestamp else None
+            self.last_timestamp = timestamp
+            alerts = []
+            for detector in self.detectors:
+                alert = detector.update(timestamp, temp_c, dt)
+                if alert is not None:
+                    alerts.append(alert)
+            for alert in alerts:
+                self.recent.append(alert)
+                if alert.state == RAISED:
+                    self.raised += 1
+        for alert in alerts:
+            for sink in self.sinks:
+                try:
+                    sink(alert)
+                except Exception as e:
+                    print(f"Erreur du sink d'alerte {type(sink).__name__}: {e}", file=sys.stderr)
+        return alerts
+
+
+def default_engine(sample_interval, sinks=()):
+    """Moteur configuré depuis config.py pour une période d'échantillonnage donnée"""
+    return AlertEngine([
+        ThresholdDetector(config.ALERT_WARNING, config.ALERT_CRITICAL, config.ALERT_HYSTERESIS),
+        RiseDetector(config.ALERT_EWMA_ALPHA, config.ALERT_RISE_RATE, config.ALERT_CRITICAL,
+                     sample_interval),
+        ZScoreDetector(config.ALERT_ZSCORE_WINDOW, config.ALERT_ZSCORE),
+    ], sinks)
+
+
+# === Récepteur webhook local (tests des alertes) ===
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            alert = json.loads(self.rfile.read(length))
+            print(f"[webhook] {alert['timestamp']} {alert['severity'].upper()} {alert['kind']}: "
+                  f"{alert['message']}")
+            self.send_response(204)
+        except (ValueError, KeyError):
+            self.send_response(400)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Outils du moteur d'alertes")
+    commands = parser.add_subparsers(dest='command', required=True)
+    listen = commands.add_parser('listen', help="Récepteur webhook local qui affiche les alertes")
+    listen.add_argument('--host', default='127.0.0.1')
+    listen.add_argument('--port', type=int, default=9600)
+    args = parser.parse_args(argv)
+
+    server = HTTPServer((args.host, args.port), _WebhookHandler)
+    print(f"Récepteur d'alertes sur http://{args.host}:{args.port}/ (Ctrl+C pour arrêter)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
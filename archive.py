@@ -0,0 +1,487 @@
+import argparse
+import datetime
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+import config
+from rollups import RESOLUTIONS, HISTOGRAM_COLUMNS, apply_rollups, to_epoch_ms, from_epoch_ms
+from storage import (HAS_ORACLE, open_oracle, open_sqlite, close_oracle_pools,
+                     ensure_oracle_schema, ensure_sqlite_schema)
+
+# =======================================
+# Export / import en format binaire colonne par tranches
+# =======================================
+#
+# Les tables sont lues par tranches (curseur serveur à grand arraysize
+# sous Oracle) et chaque tranche est écrite colonne par colonne:
+#   - dates en millisecondes epoch, codées en deltas (int64) à partir de la
+#     première valeur de la tranche;
+#   - températures quantifiées en centièmes de degré: int16 (-32768 pour
+#     NULL) si toute la tranche tient dans cette plage, sinon int32 pour
+#     cette tranche (NUMBER(5,2) va jusqu'à 999.99, SQLite REAL est sans
+#     borne); une valeur hors de l'int32 est une erreur, jamais tronquée;
+#   - compteurs en int32, sommes en float64.
+# Chaque colonne est compressée par zlib: des dates régulières se réduisent
+# à quelques octets par tranche.
+#
+# Structure du fichier:
+#   en-tête FILE_MAGIC
+#   pour chaque table: 'T', nom, colonnes (nom, codec)
+#       puis des tranches 'C': nombre de lignes, puis par colonne
+#       (codec effectif u8, taille compressée u32, octets), et 'E' en fin
+#       de table
+#   'Z' en fin de fichier
+#
+# L'import insère par tableaux (executemany) dans une transaction par
+# tranche. Il est idempotent: les lignes dont la date existe déjà dans la
+# base cible sont ignorées. Les agrégats de l'archive sont importés avant
+# les mesures brutes et ne sont ajoutés que s'ils manquent; les mesures
+# réellement insérées mettent ensuite à jour les agrégats, sauf ceux
+# venus de l'archive, déjà complets (un intervalle coupé par la rétention
+# des mesures brutes n'est donc pas reconstruit à partir d'une partie
+# seulement de ses mesures).
+#
+# Utilisation:
+#   python archive.py export --sqlite cpu_temperatures.db historique.cta
+#   python archive.py import --oracle historique.cta
+#   python archive.py copy --from-sqlite cpu_temperatures.db --to-oracle
+
+FILE_MAGIC = b'CPUTARC\x02'
+FILE_MAGIC_V1 = b'CPUTARC\x01'  # Sans codec par tranche (toujours lisible)
+DEFAULT_CHUNK = 50000   # Lignes par tranche
+NULL_CENTI = -32768     # Température absente (int16)
+NULL_CENTI32 = -2 ** 31  # Température absente (int32)
+
+# Codecs de colonne
+DELTA = 1   # int64 en deltas (dates en ms epoch)
+CENTI = 2   # float -> int16 en centièmes, NULL_CENTI pour NULL
+INT32 = 3
+FLOAT64 = 4
+CENTI32 = 5  # Repli de CENTI pour une tranche hors de l'int16
+
+RAW_TABLE = 'cpu_temperatures'
+ROLLUP_TABLES = tuple(table for table, _ in RESOLUTIONS.values())
+
+# Colonnes exportées par table (l'id est une clé technique régénérée à l'import)
+TABLE_COLUMNS = {
+    RAW_TABLE: (('timestamp', DELTA), ('temp_celsius', CENTI)),
+}
+for _table in ROLLUP_TABLES:
+    TABLE_COLUMNS[_table] = (
+        ('bucket_start', DELTA), ('records', INT32), ('temp_count', INT32),
+        ('sum_temp', FLOAT64), ('sum_sq_temp', FLOAT64),
+        ('min_temp', CENTI), ('max_temp', CENTI),
+    ) + tuple((col, INT32) for col in HISTOGRAM_COLUMNS)
+
+# Lignes exportées: les mesures reçues d'autres machines (host non NULL)
+# restent hors archive, la clé d'import étant la seule date
+TABLE_FILTERS = {
+    RAW_TABLE: 'host IS NULL',
+}
+
+_U8 = struct.Struct('<B')
+_U32 = struct.Struct('<I')
+
+
+class ArchiveError(Exception):
+    """Fichier d'archive invalide ou tronqué"""
+
+
+# === Codage des colonnes ===
+
+def _centi(values):
+    """Centièmes de degré (int64) et masque des NULL; codec CENTI ou CENTI32 à utiliser"""
+    values = np.asarray(values, dtype=np.float64)
+    nulls = np.isnan(values)
+    if np.isinf(values).any():
+        raise ArchiveError("Température infinie: non exportable")
+    centi = np.rint(np.where(nulls, 0.0, values) * 100)
+    if not len(centi) or (centi.min() > NULL_CENTI and centi.max() <= 32767):
+        return centi, nulls, CENTI
+    if centi.min() > NULL_CENTI32 and centi.max() <= 2 ** 31 - 1:
+        return centi, nulls, CENTI32
+    raise ArchiveError(f"Température hors plage: {values[~nulls].min()} .. {values[~nulls].max()} °C")
+
+
+def encode_column(values, codec):
+    """Convertit une colonne (tableau NumPy) en octets compressés.
+
+    Retourne (codec effectif, octets): CENTI devient CENTI32 si une valeur
+    de la tranche ne tient pas en int16.
+    """
+    if codec in (CENTI, CENTI32):
+        centi, nulls, codec = _centi(values)
+        if codec == CENTI:
+            data = np.where(nulls, NULL_CENTI, centi).astype('<i2')
+        else:
+            data = np.where(nulls, NULL_CENTI32, centi).astype('<i4')
+    elif codec == DELTA:
+        values = np.asarray(values, dtype=np.int64)
+        data = np.empty_like(values)
+        if len(values):
+            data[0] = values[0]
+            np.subtract(values[1:], values[:-1], out=data[1:])
+        data = data.astype('<i8')
+    elif codec == INT32:
+        data = np.asarray(values).astype('<i4')
+    else:
+        data = np.asarray(values).astype('<f8')
+    return codec, zlib.compress(data.tobytes(), 1)
+
+
+def decode_column(payload, codec):
+    """Inverse de encode_column: CENTI renvoie des float64 avec NaN pour NULL"""
+    raw = zlib.decompress(payload)
+    if codec == DELTA:
+        return np.cumsum(np.frombuffer(raw, dtype='<i8'), dtype=np.int64)
+    if codec == CENTI:
+        data = np.frombuffer(raw, dtype='<i2')
+        return np.where(data == NULL_CENTI, np.nan, data / 100.0)
+    if codec == CENTI32:
+        data = np.frombuffer(raw, dtype='<i4')
+        return np.where(data == NULL_CENTI32, np.nan, data / 100.0)
+    if codec == INT32:
+        return np.frombuffer(raw, dtype='<i4').astype(np.int64)
+    return np.frombuffer(raw, dtype='<f8')
+
+
+# === Lecture des tables par tranches ===
+
+def read_chunks(connection, using_oracle, table, since=None, chunk=DEFAULT_CHUNK):
+    """Génère les tranches d'une table: dict {colonne: tableau NumPy}"""
+    columns = TABLE_COLUMNS[table]
+    names = [name for name, _ in columns]
+    time_column = names[0]
+    conditions = [TABLE_FILTERS[table]] if table in TABLE_FILTERS else []
+    params = ()
+    if since is not None:
+        conditions.append(f"{time_column} >= {':1' if using_oracle else '?'}")
+        params = (since if using_oracle else to_epoch_ms(since),)
+    sql = f"SELECT {', '.join(names)} FROM {table}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {time_column}"
+
+    cursor = connection.cursor()
+    try:
+        if using_oracle:
+            # Curseur serveur: peu d'allers-retours réseau pour de grandes tranches
+            cursor.arraysize = chunk
+            cursor.prefetchrows = chunk + 1
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk)
+            if not rows:
+                break
+            data = {}
+            for i, (name, codec) in enumerate(columns):
+                values = [row[i] for row in rows]
+                if codec == DELTA:
+                    data[name] = np.array([to_epoch_ms(v) for v in values] if using_oracle else values,
+                                          dtype=np.int64)
+                elif codec == CENTI or codec == FLOAT64:
+                    data[name] = np.array(values, dtype=np.float64)  # None -> NaN
+                else:
+                    data[name] = np.array(values, dtype=np.int64)
+            yield data
+    finally:
+        cursor.close()
+
+
+# === Écriture en base ===
+
+def _nullable(values):
+    """Tableau float avec NaN -> liste Python avec None"""
+    return [None if v != v else v for v in values.tolist()]
+
+
+def _existing_keys(cursor, using_oracle, table, column, first_ms, last_ms):
+    """Dates (ms epoch) déjà présentes dans la table cible sur l'intervalle"""
+    extra = f" AND {TABLE_FILTERS[table]}" if table in TABLE_FILTERS else ""
+    if using_oracle:
+        cursor.execute(f"SELECT {column} FROM {table} WHERE {column} BETWEEN :1 AND :2{extra}",
+                       (from_epoch_ms(first_ms), from_epoch_ms(last_ms)))
+        return {to_epoch_ms(row[0]) for row in cursor}
+    cursor.execute(f"SELECT {column} FROM {table} WHERE {column} BETWEEN ? AND ?{extra}",
+                   (int(first_ms), int(last_ms)))
+    return {row[0] for row in cursor}
+
+
+def write_chunk(connection, using_oracle, table, data, imported=None):
+    """Insère une tranche (une transaction); retourne le nombre de lignes insérées.
+
+    imported: {table d'agrégats: intervalles (ms epoch) insérés depuis la
+    source}, complété ici pour les agrégats et consulté pour les mesures
+    brutes, dont les agrégats ne touchent pas à ces intervalles.
+    """
+    columns = [name for name, _ in TABLE_COLUMNS[table]]
+    keys = data[columns[0]]
+    if not len(keys):
+        return 0
+    cursor = connection.cursor()
+    try:
+        existing = _existing_keys(cursor, using_oracle, table, columns[0], keys[0], keys[-1])
+        keep = np.fromiter((k not in existing for k in keys.tolist()), dtype=bool, count=len(keys))
+        if not keep.any():
+            return 0
+
+        key_list = keys[keep].tolist()
+        if using_oracle:
+            key_list = [from_epoch_ms(k) for k in key_list]
+        values = [key_list]
+        for name, codec in TABLE_COLUMNS[table][1:]:
+            column = data[name][keep]
+            values.append(_nullable(column) if codec in (CENTI, FLOAT64) else column.tolist())
+        rows = list(zip(*values))
+
+        if using_oracle:
+            placeholders = ', '.join(f':{i + 1}' for i in range(len(columns)))
+        else:
+            placeholders = ', '.join('?' * len(columns))
+        cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+        if table == RAW_TABLE:
+            # Agrégats mis à jour dans la même transaction que les mesures
+            timestamps = key_list if using_oracle else [from_epoch_ms(k) for k in key_list]
+            apply_rollups(cursor, list(zip(timestamps, values[1])), using_oracle, skip=imported)
+        connection.commit()
+        if imported is not None and table != RAW_TABLE:
+            imported.setdefault(table, set()).update(keys[keep].tolist())
+        return len(rows)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+# === Fichier d'archive ===
+
+def _write_name(out, name):
+    encoded = name.encode('utf-8')
+    out.write(_U8.pack(len(encoded)))
+    out.write(encoded)
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise ArchiveError("Archive tronquée")
+    return data
+
+
+def _read_name(stream):
+    size = _U8.unpack(_read_exact(stream, 1))[0]
+    return _read_exact(stream, size).decode('utf-8')
+
+
+def _ordered(tables):
+    """Tables dans l'ordre d'import: agrégats d'abord, mesures brutes ensuite"""
+    tables = tables or TABLE_COLUMNS
+    return [table for table in ROLLUP_TABLES + (RAW_TABLE,) if table in tables]
+
+
+def export_archive(connection, using_oracle, path, tables=None, since=None, chunk=DEFAULT_CHUNK):
+    """Exporte les tables dans un fichier d'archive; retourne {table: lignes}"""
+    tables = _ordered(tables)
+    counts = {}
+    with open(path, 'wb') as out:
+        out.write(FILE_MAGIC)
+        for table in tables:
+            columns = TABLE_COLUMNS[table]
+            out.write(b'T')
+            _write_name(out, table)
+            out.write(_U8.pack(len(columns)))
+            for name, codec in columns:
+                _write_name(out, name)
+                out.write(_U8.pack(codec))
+            counts[table] = 0
+            for data in read_chunks(connection, using_oracle, table, since, chunk):
+                rows = len(data[columns[0][0]])
+                out.write(b'C')
+                out.write(_U32.pack(rows))
+                for name, codec in columns:
+                    codec, payload = encode_column(data[name], codec)
+                    out.write(_U8.pack(codec))
+                    out.write(_U32.pack(len(payload)))
+                    out.write(payload)
+                counts[table] += rows
+            out.write(b'E')
+        out.write(b'Z')
+    return counts
+
+
+def iter_archive(path, tables=None):
+    """Génère (table, tranche) depuis un fichier d'archive, dans l'ordre du fichier.
+
+    tables: seulement ces tables (les autres tranches sont sautées sans
+    décompression).
+    """
+    with open(path, 'rb') as stream:
+        magic = stream.read(len(FILE_MAGIC))
+        if magic not in (FILE_MAGIC, FILE_MAGIC_V1):
+            raise ArchiveError(f"{path} n'est pas une archive de températures")
+        chunk_codecs = magic == FILE_MAGIC
+        while True:
+            tag = _read_exact(stream, 1)
+            if tag == b'Z':
+                return
+            if tag != b'T':
+                raise ArchiveError(f"Section inattendue: {tag!r}")
+            table = _read_name(stream)
+            if table not in TABLE_COLUMNS:
+                raise ArchiveError(f"Table inconnue dans l'archive: {table}")
+            ncols = _U8.unpack(_read_exact(stream, 1))[0]
+            columns = [(_read_name(stream), _U8.unpack(_read_exact(stream, 1))[0])
+                       for _ in range(ncols)]
+            while True:
+                tag = _read_exact(stream, 1)
+                if tag == b'E':
+                    break
+                if tag != b'C':
+                    raise ArchiveError(f"Tranche attendue, lu {tag!r}")
+                _read_exact(stream, 4)  # Nombre de lignes (implicite dans les colonnes)
+                wanted = tables is None or table in tables
+                data = {}
+                for name, codec in columns:
+                    if chunk_codecs:
+                        codec = _U8.unpack(_read_exact(stream, 1))[0]
+                    size = _U32.unpack(_read_exact(stream, 4))[0]
+                    if wanted:
+                        data[name] = decode_column(_read_exact(stream, size), codec)
+                    else:
+                        stream.seek(size, 1)
+                if wanted:
+                    yield table, data
+
+
+def import_archive(connection, using_oracle, path):
+    """Importe une archive; retourne {table: (lignes lues, lignes insérées)}.
+
+    Deux passes sur le fichier, quel que soit son ordre: agrégats, puis
+    mesures brutes.
+    """
+    counts = {}
+    imported = {}
+    for tables in (ROLLUP_TABLES, (RAW_TABLE,)):
+        for table, data in iter_archive(path, tables):
+            read, inserted = counts.get(table, (0, 0))
+            rows = len(next(iter(data.values())))
+            inserted += write_chunk(connection, using_oracle, table, data, imported)
+            counts[table] = (read + rows, inserted)
+    return counts
+
+
+def copy_tables(source, source_oracle, target, target_oracle, tables=None, since=None,
+                chunk=DEFAULT_CHUNK):
+    """Copie directe d'une base à l'autre, tranche par tranche, sans fichier"""
+    counts = {}
+    imported = {}
+    for table in _ordered(tables):
+        read = inserted = 0
+        for data in read_chunks(source, source_oracle, table, since, chunk):
+            read += len(data[TABLE_COLUMNS[table][0][0]])
+            inserted += write_chunk(target, target_oracle, table, data, imported)
+        counts[table] = (read, inserted)
+    return counts
+
+
+# === Ligne de commande ===
+
+def open_database(use_oracle, sqlite_path, dsn):
+    """Ouvre la base demandée (sans repli: une erreur Oracle est fatale ici)"""
+    if use_oracle:
+        if not HAS_ORACLE:
+            raise RuntimeError("oracledb n'est pas installé")
+        connection = open_oracle(dsn)
+        ensure_oracle_schema(connection)
+    else:
+        connection = open_sqlite(sqlite_path)
+        ensure_sqlite_schema(connection)
+    return connection
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export/import binaire des températures CPU")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_backend(p, prefix=''):
+        group = p.add_mutually_exclusive_group(required=True)
+        group.add_argument(f'--{prefix}oracle', action='store_true', help="Base Oracle")
+        group.add_argument(f'--{prefix}sqlite', metavar='CHEMIN', nargs='?', const=config.SQLITE_DB_PATH,
+                           help="Base SQLite")
+
+    def add_options(p):
+        p.add_argument('--dsn', default=config.CONNECT_STRING, help="Chaîne de connexion Oracle")
+        p.add_argument('--chunk', type=int, default=DEFAULT_CHUNK, help="Lignes par tranche")
+
+    def add_selection(p):
+        p.add_argument('--tables', nargs='+', choices=sorted(TABLE_COLUMNS),
+                       help="Tables à traiter (défaut: toutes)")
+        p.add_argument('--since', metavar='AAAA-MM-JJ', help="Seulement à partir de cette date")
+
+    export = sub.add_parser('export', help="Exporter vers un fichier")
+    add_backend(export)
+    add_options(export)
+    add_selection(export)
+    export.add_argument('path', help="Fichier d'archive à créer")
+
+    imp = sub.add_parser('import', help="Importer un fichier")
+    add_backend(imp)
+    add_options(imp)
+    imp.add_argument('path', help="Fichier d'archive à lire")
+
+    copy = sub.add_parser('copy', help="Copier d'une base à l'autre")
+    add_backend(copy, 'from-')
+    add_backend(copy, 'to-')
+    add_options(copy)
+    add_selection(copy)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    since = datetime.datetime.strptime(args.since, '%Y-%m-%d') if getattr(args, 'since', None) else None
+    tables = getattr(args, 'tables', None)
+    started = time.monotonic()
+    try:
+        if args.command == 'copy':
+            source = open_database(args.from_oracle, args.from_sqlite, args.dsn)
+            target = open_database(args.to_oracle, args.to_sqlite, args.dsn)
+            try:
+                counts = copy_tables(source, args.from_oracle, target, args.to_oracle,
+                                     tables, since, args.chunk)
+            finally:
+                source.close()
+                target.close()
+        else:
+            connection = open_database(args.oracle, args.sqlite, args.dsn)
+            try:
+                if args.command == 'export':
+                    counts = export_archive(connection, args.oracle, args.path, tables, since, args.chunk)
+                else:
+                    counts = import_archive(connection, args.oracle, args.path)
+            finally:
+                connection.close()
+    except (ArchiveError, RuntimeError, OSError) as e:
+        print(f"Erreur: {e}", file=sys.stderr)
+        return 1
+    finally:
+        close_oracle_pools()
+
+    for table, count in counts.items():
+        if isinstance(count, tuple):
+            print(f"{table}: {count[0]} lues, {count[1]} insérées")
+        else:
+            print(f"{table}: {count} exportées")
+    print(f"Terminé en {time.monotonic() - started:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,565 @@
+import collections
+import datetime
+import queue
+import threading
+import time
+
+import metrics
+from rollups import apply_rollups, to_epoch_ms
+from spool import SpoolFull
+from storage import (get_or_create_layout, is_disconnect, is_transient, discard_connection,
+                     checkpoint_sqlite, local_timestamps_ms)
+
+# =======================================
+# Pipeline d'écriture par lots pour les mesures de température
+# =======================================
+#
+# Les mesures sont déposées dans une file bornée par le thread de
+# surveillance, puis un thread écrivain dédié les insère avec executemany
+# et ne fait qu'un seul commit par lot. Un lot est vidé dès qu'il atteint
+# sa taille maximale ou son âge maximal. Les tables d'agrégats sont mises à
+# jour dans la même transaction que les mesures brutes, tout comme le détail
+# par capteur (sensor_samples, une ligne par tick). Sans spool, une base
+# injoignable n'entraîne pas la perte du lot en cours: l'écrivain le garde
+# et se reconnecte avec un délai croissant, la file absorbant l'attente.
+#
+# Avec un spool (spool.Spool), les mesures passent d'abord par le disque
+# local: le thread écrivain expédie le spool par lots et ne le consomme
+# qu'après commit. Base lente ou injoignable: les lots restent dans le
+# spool, l'écrivain se reconnecte avec un délai croissant puis rejoue tout,
+# en ignorant les mesures dont la date exacte est déjà en base (lot commité
+# juste avant la coupure, spool pas encore avancé).
+#
+# Sous SQLite, ce thread est le seul écrivain: il reprend les instructions
+# préparées du cache de la connexion (textes SQL constants) et reporte
+# périodiquement le WAL dans la base par un checkpoint passif.
+
+# Valeurs par défaut du pipeline
+DEFAULT_BATCH_SIZE = 100     # Nombre maximal de mesures par lot
+DEFAULT_MAX_AGE = 10.0       # Âge maximal d'un lot avant écriture (secondes)
+DEFAULT_QUEUE_SIZE = 10000   # Taille maximale de la file d'attente
+RECONNECT_MIN_DELAY = 1.0    # Premier délai avant nouvelle tentative (secondes)
+RECONNECT_MAX_DELAY = 60.0   # Délai maximal entre deux tentatives (secondes)
+
+_STOP = object()  # Sentinelle de fin pour le thread écrivain
+
+# Textes SQL constants: préparés une fois par connexion puis réutilisés
+ORACLE_INSERT_SQL = ("INSERT INTO cpu_temperatures (timestamp, temp_celsius) "
+                     "VALUES (:1, :2) RETURNING id INTO :3")
+SQLITE_INSERT_SQL = "INSERT INTO cpu_temperatures (timestamp, temp_celsius) VALUES (?, ?)"
+ORACLE_READING_SQL = "INSERT INTO sensor_samples (timestamp, layout_id, temps) VALUES (:1, :2, :3)"
+SQLITE_READING_SQL = "INSERT INTO sensor_samples (timestamp, layout_id, temps) VALUES (?, ?, ?)"
+ORACLE_ALERT_SQL = ("INSERT INTO alerts (timestamp, kind, severity, state, value, message) "
+                    "VALUES (:1, :2, :3, :4, :5, :6)")
+SQLITE_ALERT_SQL = ("INSERT INTO alerts (timestamp, kind, severity, state, value, message) "
+                    "VALUES (?, ?, ?, ?, ?, ?)")
+ALERT_MESSAGE_BYTES = 400  # alerts.message: VARCHAR2(400) compte des octets
+
+
+def truncate_utf8(text, limit):
+    """Tronque text à limit octets UTF-8 sans couper un caractère"""
+    encoded = text.encode('utf-8')
+    if len(encoded) <= limit:
+        return text
+    return encoded[:limit].decode('utf-8', 'ignore')
+
+
+class BatchWriter:
+    """Écrivain asynchrone qui regroupe les insertions et les commits.
+
+    connection_factory est appelée dans le thread écrivain pour ouvrir une
+    connexion dédiée (obligatoire pour SQLite). on_flush(rows) est appelée
+    après chaque commit réussi, on_error(exc, rows) après un échec.
+    checkpoint_interval (secondes, SQLite seulement) espace les checkpoints
+    WAL passifs; None les laisse au seul checkpoint automatique.
+
+    Si spool est fourni, il remplace la file en mémoire; on_outage(exc,
+    backlog) est alors appelée au début de chaque indisponibilité de la
+    base (les mesures sont conservées, pas perdues).
+    """
+
+    def __init__(self, connection_factory, using_oracle,
+                 batch_size=DEFAULT_BATCH_SIZE, max_age=DEFAULT_MAX_AGE,
+                 queue_size=DEFAULT_QUEUE_SIZE, on_flush=None, on_error=None,
+                 checkpoint_interval=None, spool=None, on_outage=None):
+        self.connection_factory = connection_factory
+        self.using_oracle = using_oracle
+        self.batch_size = max(1, int(batch_size))
+        self.max_age = float(max_age)
+        self.checkpoint_interval = checkpoint_interval
+        self.last_checkpoint = time.monotonic()
+        self.on_flush = on_flush
+        self.on_error = on_error
+        self.on_outage = on_outage
+
+        self.spool = spool
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        # Pris le temps de chaque transaction d'écriture: les autres écrivains
+        # SQLite (rétention) s'y sérialisent au lieu de se disputer le WAL
+        self.write_lock = threading.Lock()
+        self.replay_check = False  # Dédoublonnage des premiers lots après (re)connexion
+        self.outage = False
+        self.thread = None
+        self.pending = 0  # Mesures retirées de la file mais pas encore commitées
+        self.layout_ids = {}  # Cache canaux -> sensor_layouts.id
+        self.alerts = collections.deque()  # Alertes à enregistrer après le prochain lot
+        self.connection = None
+
+        # Compteurs observables
+        self.reconnects = 0
+        self.deduplicated = 0
+        self.checkpoints = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+        self.alerts_written = 0
+        self.alerts_dropped = 0
+        self.last_batch_size = 0
+        self.last_commit_seconds = 0.0
+
+    def start(self):
+        """Démarre le thread écrivain"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        metrics.WRITE_BACKLOG.set_function(self.backlog)
+        target = self._run_spool if self.spool is not None else self._run
+        self.thread = threading.Thread(target=target, name="batch-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, timestamp, temp_c, reading=None):
+        """Dépose une mesure (et sa lecture multi-capteurs) dans la file sans bloquer.
+
+        Retourne False si la file (ou le spool) est pleine: la mesure est perdue.
+        """
+        if self.spool is not None:
+            try:
+                self.spool.append(timestamp, temp_c, reading)
+                return True
+            except SpoolFull:
+                self.dropped += 1
+                metrics.DROPPED_SAMPLES_TOTAL.inc()
+                return False
+        try:
+            self.queue.put_nowait((timestamp, temp_c, reading))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            metrics.DROPPED_SAMPLES_TOTAL.inc()
+            return False
+
+    def submit_alert(self, alert):
+        """Dépose une alerte (alerts.Alert), écrite dans sa propre transaction après le prochain lot"""
+        self.alerts.append(alert)
+
+    def backlog(self):
+        """Nombre de mesures en attente d'écriture (file ou spool + lot en cours)"""
+        if self.spool is not None:
+            return len(self.spool)
+        return self.queue.qsize() + self.pending
+
+    def stats(self):
+        """Instantané des compteurs du pipeline"""
+        return {
+            'backlog': self.backlog(),
+            'written': self.written,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'alerts_written': self.alerts_written,
+            'alerts_dropped': self.alerts_dropped,
+            'reconnects': self.reconnects,
+            'deduplicated': self.deduplicated,
+            'outage': self.outage,
+            'checkpoints': self.checkpoints,
+            'last_batch_size': self.last_batch_size,
+            'last_commit_seconds': self.last_commit_seconds,
+        }
+
+    def close(self, timeout=5.0):
+        """Vide les mesures restantes puis arrête le thread écrivain.
+
+        Avec un spool, ce qui n'a pas pu être écrit y reste pour le
+        prochain démarrage.
+        """
+        if not self.thread:
+            return
+        self.stop_event.set()  # Interrompt aussi l'attente de reconnexion
+        if self.spool is not None:
+            self.spool.wake()
+        else:
+            # La sentinelle doit passer même si la file est pleine
+            self.queue.put(_STOP)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def _run(self):
+        """Boucle du thread écrivain.
+
+        La connexion est ouverte à la demande: base injoignable au démarrage
+        ou perdue en cours de route, le lot en cours est conservé et
+        l'écrivain réessaie avec un délai croissant. Pendant ce temps la file
+        se remplit, puis submit() écarte les nouvelles mesures (dropped).
+        """
+        batch = []
+        batch_started = None
+        stopping = False
+        delay = RECONNECT_MIN_DELAY
+        try:
+            while True:
+                if not stopping and len(batch) < self.batch_size:
+                    # Attendre au plus jusqu'à l'échéance du lot en cours
+                    if batch:
+                        timeout = max(0.0, batch_started + self.max_age - time.monotonic())
+                    else:
+                        timeout = None
+                    try:
+                        item = self.queue.get(timeout=timeout)
+                    except queue.Empty:
+                        item = None
+
+                    if item is _STOP:
+                        stopping = True
+                    elif item is not None:
+                        if not batch:
+                            batch_started = time.monotonic()
+                        batch.append(item)
+
+                        # Récupérer sans attendre ce qui est déjà en file
+                        while len(batch) < self.batch_size:
+                            try:
+                                item = self.queue.get_nowait()
+                            except queue.Empty:
+                                break
+                            if item is _STOP:
+                                stopping = True
+                                break
+                            batch.append(item)
+                        self.pending = len(batch)
+
+                if not batch:
+                    if stopping:
+                        break
+                    continue
+                if not (stopping or len(batch) >= self.batch_size
+                        or time.monotonic() - batch_started >= self.max_age):
+                    continue
+
+                if (self.connection is not None or self._connect()) and self._flush(batch):
+                    batch = []
+                    self.pending = 0
+                    delay = RECONNECT_MIN_DELAY
+                    continue
+
+                # Base injoignable: garder le lot et réessayer plus tard
+                if stopping or self.stop_event.wait(delay):
+                    if not stopping:
+                        batch += self._drain_queue()
+                    self._report_failure(ConnectionError("base injoignable à l'arrêt"), batch)
+                    batch = []
+                    break
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        finally:
+            self._flush_alerts()
+            self._close_connection()
+            self.pending = 0
+
+    def _drain_queue(self):
+        """Retire les mesures restées en file jusqu'à la sentinelle (arrêt en panne)"""
+        rows = []
+        while True:
+            item = self.queue.get()  # close() dépose toujours la sentinelle
+            if item is _STOP:
+                return rows
+            rows.append(item)
+
+    def _run_spool(self):
+        """Boucle du thread écrivain alimentée par le spool"""
+        delay = RECONNECT_MIN_DELAY
+        try:
+            while True:
+                stopping = self.stop_event.is_set()
+                pending = len(self.spool)
+                if not pending:
+                    if stopping:
+                        break
+                    self.spool.wait(1, self.max_age)
+                    continue
+
+                # Attendre un lot complet ou l'âge maximal du plus ancien
+                age = time.monotonic() - self.spool.pending_since
+                if not stopping and pending < self.batch_size and age < self.max_age:
+                    self.spool.wait(self.batch_size, self.max_age - age)
+                    continue
+
+                if self.connection is None and not self._connect():
+                    if stopping:
+                        break  # Les mesures restent dans le spool
+                    self.stop_event.wait(delay)
+                    delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                    continue
+
+                rows, nbytes = self.spool.read(self.batch_size)
+                fresh = self._skip_replayed(rows)
+                if fresh is not None and (not fresh or self._flush(fresh)):
+                    self.spool.commit(nbytes, len(rows))
+                    delay = RECONNECT_MIN_DELAY
+                elif stopping:
+                    break
+                else:
+                    self.stop_event.wait(delay)
+                    delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        finally:
+            self._flush_alerts()
+            self._close_connection()
+            self.spool.flush()
+
+    def _connect(self):
+        """Ouvre la connexion; False si la base est injoignable"""
+        try:
+            self.connection = self.connection_factory()
+            self.replay_check = True
+            return True
+        except Exception as e:
+            self._close_connection()
+            self._report_outage(e)
+            return False
+
+    def _skip_replayed(self, rows):
+        """Écarte les mesures déjà en base (lot commité mais spool non avancé).
+
+        Compare les dates exactes du lot à celles des mesures locales sur le
+        même intervalle: un autre écrivain local ou une date système qui
+        recule ne font pas écarter de mesures valides. Le spool est rejoué
+        dans l'ordre, donc seuls les premiers lots après une reconnexion
+        peuvent être déjà en base. Retourne None si la base ne répond pas.
+        """
+        if not self.replay_check or not rows:
+            return rows
+        stamps = [to_epoch_ms(row[0]) for row in rows]
+        try:
+            cursor = self.connection.cursor()
+            try:
+                existing = local_timestamps_ms(cursor, self.using_oracle, min(stamps), max(stamps))
+            finally:
+                cursor.close()
+        except Exception as e:
+            self._close_connection(discard=True)
+            self._report_outage(e)
+            return None
+        fresh = [row for row, ms in zip(rows, stamps) if ms not in existing]
+        self.deduplicated += len(rows) - len(fresh)
+        if fresh:
+            self.replay_check = False  # Le lot commité avant la coupure est dépassé
+        return fresh
+
+    def _flush(self, rows):
+        """Écrit un lot; retourne False si l'échec est transitoire et le lot à réessayer.
+
+        En cas de session perdue, se reconnecte et réessaie une fois.
+        """
+        started = time.perf_counter()
+        try:
+            ids = self._write_or_reconnect(rows)
+        except Exception as e:
+            # Erreur transitoire ou reconnexion impossible: lot à réessayer
+            if is_transient(e) or self.connection is None:
+                self._close_connection(discard=True)
+                self._report_outage(e)
+                return False
+            self._report_failure(e, rows)
+            return True
+
+        self.outage = False
+        self.written += len(rows)
+        self.batches += 1
+        self.last_batch_size = len(rows)
+        self.last_commit_seconds = time.perf_counter() - started
+        metrics.COMMIT_SECONDS.observe(self.last_commit_seconds)
+        metrics.WRITTEN_ROWS_TOTAL.inc(len(rows))
+        if self.on_flush:
+            self.on_flush(rows, ids)
+        self._write_alerts()
+        self._maybe_checkpoint()
+        return True
+
+    def _write_or_reconnect(self, rows):
+        with self.write_lock:
+            return self._write_or_reconnect_locked(rows)
+
+    def _write_or_reconnect_locked(self, rows):
+        try:
+            return self._write(self.connection, rows)
+        except Exception as e:
+            self._rollback()
+            if not is_disconnect(e):
+                raise
+        # Session Oracle perdue: la retirer du pool et en reprendre une
+        discard_connection(self.connection)
+        self.connection = None
+        self.connection = self.connection_factory()
+        self.reconnects += 1
+        try:
+            return self._write(self.connection, rows)
+        except Exception:
+            self._rollback()
+            raise
+
+    def _rollback(self):
+        self.layout_ids.clear()  # Une création de layout a pu être annulée
+        try:
+            self.connection.rollback()
+        except Exception:
+            pass
+
+    def _close_connection(self, discard=False):
+        """Ferme la connexion; discard=True la retire du pool (session suspecte)"""
+        if self.connection is None:
+            return
+        if discard and self.using_oracle:
+            discard_connection(self.connection)
+        else:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+        self.connection = None
+
+    def _report_outage(self, e):
+        """Signale le début d'une indisponibilité (une seule fois par panne)"""
+        if self.outage:
+            return
+        self.outage = True
+        if self.on_outage:
+            self.on_outage(e, self.backlog())
+
+    def _maybe_checkpoint(self):
+        """Checkpoint WAL passif si l'intervalle est écoulé (hors transaction)"""
+        if self.using_oracle or not self.checkpoint_interval:
+            return
+        now = time.monotonic()
+        if now - self.last_checkpoint < self.checkpoint_interval:
+            return
+        self.last_checkpoint = now
+        try:
+            checkpoint_sqlite(self.connection)
+            self.checkpoints += 1
+        except Exception:
+            pass  # Simple maintenance: le checkpoint automatique prendra le relais
+
+    def _report_failure(self, e, rows):
+        self.failed += len(rows)
+        metrics.WRITE_FAILED_ROWS_TOTAL.inc(len(rows))
+        if self.on_error:
+            self.on_error(e, rows)
+
+    def _write(self, connection, rows):
+        """Insère un lot avec executemany et un seul commit; retourne les id générés"""
+        cursor = connection.cursor()
+        rounded = [(ts, round(t, 2) if t is not None else None) for ts, t, _ in rows]
+        try:
+            if self.using_oracle:
+                # Les id générés reviennent par DML RETURNING, un par ligne;
+                # types fixés d'avance pour une liaison tableau sans inférence
+                id_var = cursor.var(int, arraysize=len(rounded))
+                cursor.setinputsizes(datetime.datetime, float, id_var)
+                cursor.executemany(ORACLE_INSERT_SQL, rounded)
+                ids = [id_var.getvalue(i)[0] for i in range(len(rounded))]
+            else:
+                params = [(to_epoch_ms(ts), t) for ts, t in rounded]
+                cursor.executemany(SQLITE_INSERT_SQL, params)
+                # Écrivain unique et transaction en cours: les id AUTOINCREMENT
+                # du lot sont consécutifs et se terminent par last_insert_rowid()
+                cursor.execute("SELECT last_insert_rowid()")
+                last_id = cursor.fetchone()[0]
+                ids = list(range(last_id - len(params) + 1, last_id + 1))
+            apply_rollups(cursor, rounded, self.using_oracle)
+            self._insert_readings(cursor, rows)
+            connection.commit()
+            return ids
+        finally:
+            cursor.close()
+
+    def _write_alerts(self):
+        """Écrit les alertes en attente dans leur propre transaction.
+
+        Une alerte en échec ne bloque jamais les mesures: erreur transitoire,
+        les alertes restent en file pour le lot suivant; erreur permanente,
+        elles sont réessayées une par une et celles qui échouent encore sont
+        abandonnées (on_error, compteur alerts_dropped).
+        """
+        alerts = list(self.alerts)
+        if not alerts:
+            return
+        with self.write_lock:
+            self._write_alerts_locked(alerts)
+
+    def _write_alerts_locked(self, alerts):
+        try:
+            self._insert_alerts(alerts)
+        except Exception as e:
+            self._rollback()
+            if is_transient(e) or is_disconnect(e):
+                return
+            for alert in alerts:
+                try:
+                    self._insert_alerts([alert])
+                    self.alerts_written += 1
+                except Exception as e:
+                    self._rollback()
+                    if is_transient(e) or is_disconnect(e):
+                        return  # Celle-ci et les suivantes restent en file
+                    self.alerts_dropped += 1
+                    if self.on_error:
+                        self.on_error(e, [])
+                self.alerts.popleft()
+            return
+        for _ in alerts:
+            self.alerts.popleft()
+        self.alerts_written += len(alerts)
+
+    def _flush_alerts(self):
+        """Arrêt de l'écrivain: écrit les alertes encore en file.
+
+        Base en panne, elles ne sont pas conservées (le spool ne contient que
+        des mesures): comptées dans alerts_dropped et signalées à on_error.
+        """
+        if not self.alerts:
+            return
+        if self.connection is not None or (not self.outage and self._connect()):
+            self._write_alerts()
+        if self.alerts:
+            self.alerts_dropped += len(self.alerts)
+            self.alerts.clear()
+            if self.on_error:
+                self.on_error(ConnectionError("alertes non écrites: base injoignable à l'arrêt"), [])
+
+    def _insert_alerts(self, alerts):
+        """Insère des alertes et valide la transaction"""
+        params = [(a.timestamp if self.using_oracle else to_epoch_ms(a.timestamp),
+                   a.kind, a.severity, a.state, a.value,
+                   truncate_utf8(a.message, ALERT_MESSAGE_BYTES)) for a in alerts]
+        cursor = self.connection.cursor()
+        try:
+            cursor.executemany(ORACLE_ALERT_SQL if self.using_oracle else SQLITE_ALERT_SQL, params)
+            self.connection.commit()
+        finally:
+            cursor.close()
+
+    def _insert_readings(self, cursor, rows):
+        """Insère le détail multi-capteurs: une ligne par tick, vecteur en BLOB"""
+        params = []
+        for timestamp, _, reading in rows:
+            if reading is None or not len(reading):
+                continue
+            layout_id = self.layout_ids.get(reading.channels)
+            if layout_id is None:
+                layout_id = get_or_create_layout(cursor, reading.channels, self.using_oracle)
+                self.layout_ids[reading.channels] = layout_id
+            ts = timestamp if self.using_oracle else to_epoch_ms(timestamp)
+            params.append((ts, layout_id, reading.pack()))
+        if not params:
+            return
+        cursor.executemany(ORACLE_READING_SQL if self.using_oracle else SQLITE_READING_SQL, params)
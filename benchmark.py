@@ -0,0 +1,402 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import config
+from batch_writer import BatchWriter
+from fake_hwmon import FAKE_CHIPS, make_fake_hwmon
+from history import fetch_envelope
+from ring_buffer import RingBuffer
+from rollups import seed_query, to_epoch_ms
+from running_stats import RunningStats
+from spool import Spool
+import sensors
+from storage import (HAS_ORACLE, SQLITE_TABLE_DDL, open_oracle, open_sqlite,
+                     ensure_oracle_schema, ensure_sqlite_schema, fetch_recent,
+                     close_oracle_pools)
+
+# =======================================
+# Mesures de performance des chemins critiques
+# =======================================
+#
+# Chaque mesure est répétée et résumée (moyenne, médiane, p95, min, max);
+# le résultat complet est un document JSON à conserver pour suivre les
+# régressions d'une version à l'autre.
+#
+#   - lecture des capteurs sur une arborescence hwmon factice et sur un
+#     dictionnaire au format psutil;
+#   - débit d'insertion de BatchWriter (SQLite, avec et sans spool;
+#     Oracle seulement si --dsn est fourni);
+#   - latence des requêtes de l'interface (10 dernières mesures,
+#     statistiques, enveloppe d'historique) à plusieurs volumes;
+#   - temps d'image du graphique (blitting et rendu complet) à plusieurs
+#     tailles d'historique.
+#
+# Utilisation:
+#   python benchmark.py --output resultats.json
+#   python benchmark.py --quick
+
+DEFAULT_SIZES = (10_000, 1_000_000, 10_000_000)
+QUICK_SIZES = (10_000,)
+RENDER_SIZES = (60, 600, 3600, 86400)
+
+
+def measure(fn, repeat, warmup=1):
+    """Durées (secondes) de repeat appels à fn, après warmup appels ignorés"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def summarize(name, samples, scale=1000.0, unit='ms', **params):
+    """Résumé statistique d'une série de durées"""
+    values = sorted(s * scale for s in samples)
+    p95 = values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))]
+    return {
+        'name': name,
+        'params': params,
+        'unit': unit,
+        'n': len(values),
+        'mean': statistics.fmean(values),
+        'median': statistics.median(values),
+        'p95': p95,
+        'min': values[0],
+        'max': values[-1],
+    }
+
+
+def skipped(name, reason, **params):
+    return {'name': name, 'params': params, 'skipped': reason}
+
+
+# === Capteurs ===
+
+def bench_sensors(workdir, repeat):
+    results = []
+    channels = sum(count for _, count in FAKE_CHIPS)
+
+    if hasattr(os, 'pread'):
+        root = os.path.join(workdir, 'hwmon')
+        make_fake_hwmon(root)
+        reader = sensors.HwmonReader(root)
+        previous = sensors._hwmon_reader
+        sensors._hwmon_reader = reader  # Chemin réel de lire_temperature_cpu, capteurs factices
+        try:
+            results.append(summarize('sensors.hwmon_read', measure(reader.read, repeat),
+                                     scale=1e6, unit='us', channels=channels))
+            results.append(summarize('sensors.lire_temperature_cpu',
+                                     measure(lambda: sensors.lire_temperature_cpu(lambda msg: None), repeat),
+                                     scale=1e6, unit='us', channels=channels, backend='hwmon'))
+        finally:
+            sensors._hwmon_reader = previous
+            reader.close()
+    else:
+        results.append(skipped('sensors.hwmon_read', "os.pread indisponible sur cette plateforme"))
+
+    entry = namedtuple('shwtemp', 'label current high critical')
+    fake = {chip: [entry(f'Core {n}', 40.0 + n, 90.0, 100.0) for n in range(count)]
+            for chip, count in FAKE_CHIPS}
+    results.append(summarize('sensors.lire_capteurs_psutil_format',
+                             measure(lambda: sensors.lire_capteurs(fake), repeat),
+                             scale=1e6, unit='us', channels=channels))
+
+    sampler = sensors.LoadSampler()
+    results.append(summarize('sensors.load_sampler', measure(sampler.read, repeat),
+                             scale=1e6, unit='us', channels=len(sampler.read())))
+    return results
+
+
+# === Insertion ===
+
+def _ingest(writer, rows, reading):
+    """Soumet rows mesures et attend leur écriture; retourne la durée en secondes"""
+    start = datetime.datetime.now() - datetime.timedelta(seconds=rows)
+    writer.start()
+    started = time.perf_counter()
+    for i in range(rows):
+        writer.submit(start + datetime.timedelta(seconds=i), 40.0 + (i % 400) / 10.0, reading)
+    writer.close(timeout=600)
+    return time.perf_counter() - started
+
+
+def _throughput(name, durations, rows, **params):
+    result = summarize(name, [rows / d for d in durations], scale=1.0, unit='rows/s', rows=rows, **params)
+    result['seconds'] = statistics.fmean(durations)
+    return result
+
+
+def bench_ingest(workdir, rows, repeat, dsn=None):
+    results = []
+    reading = sensors.lire_capteurs({'coretemp': [
+        namedtuple('shwtemp', 'label current')(f'Core {n}', 45.0) for n in range(8)]})
+
+    for use_spool in (False, True):
+        durations = []
+        for run in range(repeat):
+            path = os.path.join(workdir, f'ingest_{use_spool}_{run}.db')
+            connection = open_sqlite(path)
+            ensure_sqlite_schema(connection)
+            connection.close()
+            spool = Spool(os.path.join(workdir, f'ingest_{run}.spool'),
+                          max_size=1 << 30) if use_spool else None
+            writer = BatchWriter(lambda: open_sqlite(path), False,
+                                 batch_size=config.WRITE_BATCH_SIZE, max_age=0.05,
+                                 queue_size=rows + 1, spool=spool)
+            durations.append(_ingest(writer, rows, reading))
+            if writer.stats()['written'] != rows:
+                raise RuntimeError(f"Insertion incomplète: {writer.stats()}")
+            if spool is not None:
+                spool.close()
+        results.append(_throughput('ingest.sqlite', durations, rows,
+                                   batch_size=config.WRITE_BATCH_SIZE, spool=use_spool))
+
+    if not dsn:
+        results.append(skipped('ingest.oracle', "--dsn non fourni"))
+    elif not HAS_ORACLE:
+        results.append(skipped('ingest.oracle', "oracledb non installé"))
+    else:
+        try:
+            connection = open_oracle(dsn)
+            ensure_oracle_schema(connection)
+            connection.close()
+            durations = []
+            for _ in range(repeat):
+                writer = BatchWriter(lambda: open_oracle(dsn), True,
+                                     batch_size=config.WRITE_BATCH_SIZE, max_age=0.05,
+                                     queue_size=rows + 1)
+                durations.append(_ingest(writer, rows, reading))
+            results.append(_throughput('ingest.oracle', durations, rows,
+                                       batch_size=config.WRITE_BATCH_SIZE))
+        except Exception as e:
+            results.append(skipped('ingest.oracle', f"Oracle injoignable: {e}"))
+        finally:
+            close_oracle_pools()
+    return results
+
+
+# === Requêtes de l'interface ===
+
+def populate_sqlite(path, rows, chunk=200_000):
+    """Base SQLite de rows mesures à 1 Hz se terminant maintenant (agrégats inclus)"""
+    connection = open_sqlite(path)
+    cursor = connection.cursor()
+    cursor.execute(SQLITE_TABLE_DDL.format(table='cpu_temperatures'))
+    end_ms = to_epoch_ms(datetime.datetime.now())
+    first_ms = end_ms - (rows - 1) * 1000
+    rng = np.random.default_rng(42)
+    for offset in range(0, rows, chunk):
+        n = min(chunk, rows - offset)
+        times = first_ms + (offset + np.arange(n, dtype=np.int64)) * 1000
+        temps = np.round(45.0 + 15.0 * rng.random(n), 2)
+        cursor.executemany("INSERT INTO cpu_temperatures (timestamp, temp_celsius) VALUES (?, ?)",
+                           zip(times.tolist(), temps.tolist()))
+        connection.commit()
+    cursor.close()
+    # Index temporel et agrégats remplis par SQL depuis les mesures
+    ensure_sqlite_schema(connection)
+    connection.close()
+
+
+def bench_queries(workdir, sizes, repeat):
+    results = []
+    for rows in sizes:
+        path = os.path.join(workdir, f'queries_{rows}.db')
+        started = time.perf_counter()
+        populate_sqlite(path, rows)
+        build_seconds = time.perf_counter() - started
+
+        connection = open_sqlite(path, readonly=True)
+        cursor = connection.cursor()
+        stats = RunningStats()
+
+        def seed_stats():
+            cursor.execute(seed_query())
+            stats.seed(*cursor.fetchone())
+            return stats.snapshot()
+
+        def full_scan_stats():
+            cursor.execute("SELECT COUNT(*), AVG(temp_celsius), MIN(temp_celsius), "
+                           "MAX(temp_celsius) FROM cpu_temperatures")
+            return cursor.fetchone()
+
+        now = datetime.datetime.now()
+        span = datetime.timedelta(seconds=rows)
+        results.append(summarize('query.recent_rows', measure(lambda: fetch_recent(cursor, False, 10), repeat),
+                                 rows=rows, build_seconds=build_seconds))
+        results.append(summarize('query.stats_rollup', measure(seed_stats, repeat), rows=rows))
+        results.append(summarize('query.stats_full_scan', measure(full_scan_stats, max(1, repeat // 5)),
+                                 rows=rows))
+        results.append(summarize('query.history_envelope',
+                                 measure(lambda: fetch_envelope(cursor, False, now - span, now, 1000),
+                                         repeat),
+                                 rows=rows, width=1000))
+        cursor.close()
+        connection.close()
+        os.remove(path)
+    return results
+
+
+# === Rendu du graphique ===
+
+class _FakeRoot:
+    """Remplace la fenêtre Tk: les ticks sont appelés directement par le benchmark"""
+
+    def after(self, delay, callback):
+        return None
+
+    def after_cancel(self, job):
+        pass
+
+
+def bench_render(sizes, frames):
+    # Import tardif: seul ce benchmark a besoin de matplotlib
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from live_plot import SlidingWindow, BlitAnimator, full_frame
+
+    results = []
+    for size in sizes:
+        history = RingBuffer(size)
+        util_history = RingBuffer(size)
+        freq_history = RingBuffer(size)
+        t0 = time.time() - size
+        state = {'t': t0}
+
+        def push():
+            # Même contenu que l'interface: température, utilisation et fréquence en %
+            t = state['t']
+            history.append(t, 50.0 + (int(t) % 100) / 10.0)
+            util_history.append(t, float(int(t) % 100))
+            freq_history.append(t, 60.0 + (int(t) % 40))
+            state['t'] += 1
+
+        for _ in range(size):
+            push()
+
+        def figure():
+            """Figure organisée comme celle de l'interface (courbes de charge sur twinx)"""
+            fig = Figure(figsize=(8, 4), dpi=100)
+            canvas = FigureCanvasAgg(fig)
+            ax = fig.add_subplot(111)
+            line, = ax.plot([], [], 'b-', linewidth=2)
+            load_ax = ax.twinx()
+            load_ax.set_ylim(0, 105)
+            util_line, = load_ax.plot([], [], 'g-', linewidth=1)
+            freq_line, = load_ax.plot([], [], 'm:', linewidth=1)
+            overlays = [(util_line, util_history), (freq_line, freq_history)]
+            return fig, canvas, ax, line, overlays
+
+        # Mode 'blit': BlitAnimator tel qu'utilisé par l'interface
+        fig, canvas, ax, line, overlays = figure()
+        animator = BlitAnimator(_FakeRoot(), canvas, ax, line, history,
+                                SlidingWindow(span=size), interval_ms=100, overlays=overlays)
+        canvas.draw()
+
+        def blit_frame():
+            push()
+            animator.tick()
+
+        results.append(summarize('render.blit_frame', measure(blit_frame, frames, warmup=5),
+                                 points=size, full_redraws=animator.full_redraws))
+
+        # Mode 'full': live_plot.full_frame, appelée par update_graph, + rendu complet
+        fig, canvas, ax, line, overlays = figure()
+
+        def full_frame_draw():
+            push()
+            full_frame(fig, ax, line, history, overlays)
+            canvas.draw()
+
+        results.append(summarize('render.full_frame', measure(full_frame_draw, max(1, frames // 4), warmup=2),
+                                 points=size))
+    return results
+
+
+# === Point d'entrée ===
+
+def environment():
+    import matplotlib
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'sqlite': sqlite3.sqlite_version,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks des chemins critiques (résultat JSON)")
+    parser.add_argument('--output', '-o', help="Fichier JSON de sortie (défaut: sortie standard)")
+    parser.add_argument('--quick', action='store_true', help="Volumes et répétitions réduits")
+    parser.add_argument('--sizes', type=lambda s: tuple(int(x) for x in s.split(',')),
+                        help="Volumes de la table pour les requêtes (ex: 10000,1000000)")
+    parser.add_argument('--ingest-rows', type=int, default=None, help="Mesures par essai d'insertion")
+    parser.add_argument('--dsn', default=None, help="Inclure Oracle (chaîne de connexion)")
+    parser.add_argument('--only', nargs='+', choices=('sensors', 'ingest', 'queries', 'render'),
+                        help="Ne lancer que ces groupes")
+    parser.add_argument('--workdir', help="Répertoire de travail (défaut: temporaire, supprimé)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    groups = set(args.only or ('sensors', 'ingest', 'queries', 'render'))
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    repeat = 5 if args.quick else 20
+    ingest_rows = args.ingest_rows or (10_000 if args.quick else 100_000)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='cpu_temp_bench_')
+    os.makedirs(workdir, exist_ok=True)
+    results = []
+    started = time.perf_counter()
+    try:
+        if 'sensors' in groups:
+            results += bench_sensors(workdir, repeat * 50)
+        if 'ingest' in groups:
+            results += bench_ingest(workdir, ingest_rows, 1 if args.quick else 3, args.dsn)
+        if 'queries' in groups:
+            results += bench_queries(workdir, sizes, repeat)
+        if 'render' in groups:
+            results += bench_render(RENDER_SIZES[:2] if args.quick else RENDER_SIZES, repeat * 5)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    document = {
+        'environment': environment(),
+        'elapsed_seconds': time.perf_counter() - started,
+        'results': results,
+    }
+    text = json.dumps(document, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,71 +1,195 @@
-import oracledb
-import socket
-import subprocess
+import argparse
+import collections
+import concurrent.futures
+import datetime
+import json
 import os
+import socket
+import sys
+import time
 
-def check_oracle_connection():
-    print("Vérification des connexions Oracle possibles...")
-    
-    # Options possibles pour le service_name/SID
-    service_names = [
-        "Oracle24C", "ORCL", "XE", "FREEPDB1", "ORCLPDB1", 
-        "XEPDB1", "PDBORCL", "FREE", "Oracle24C.localdomain"
-    ]
-    
-    # Options possibles pour l'hôte
-    hosts = ["localhost", "127.0.0.1"]
-    
-    # Options possibles pour le port
-    ports = [1521, 1522]
-    
-    # User/password
-    user = "system"
-    password = "jawad-10-10-2001"
-    
-    # Tester les connexions
+import oracledb
+
+import config
+
+# =======================================
+# Découverte des services Oracle joignables
+# =======================================
+#
+# 1. Balayage des ports (hôtes x ports) en parallèle, une seconde maximum
+#    par port: les listeners absents sont écartés sans essai de connexion.
+# 2. Essais de connexion en parallèle sur les ports ouverts (noms de
+#    service en EZ Connect et SID), chacun borné par tcp_connect_timeout et
+#    par une échéance globale.
+# 3. Classement des résultats: connexions réussies d'abord (format service
+#    préféré au SID, puis plus faible latence), puis services existants mais
+#    refusés (identifiants), puis le reste.
+#
+# Le DSN gagnant est écrit dans DSN_FILE (config.py), lu au démarrage à la
+# place de CONNECT_STRING par l'interface, le collecteur et les outils.
+
+SERVICE_NAMES = [
+    "Oracle24C", "ORCL", "XE", "FREEPDB1", "ORCLPDB1",
+    "XEPDB1", "PDBORCL", "FREE", "Oracle24C.localdomain"
+]
+HOSTS = ["localhost", "127.0.0.1"]
+PORTS = [1521, 1522]
+
+# Rang des résultats (plus petit = meilleur)
+CONNECTED = 0      # Connexion établie
+AUTH_FAILED = 1    # Service trouvé mais identifiants refusés
+UNREACHABLE = 2    # Service inconnu, délai dépassé, autre erreur
+
+# Codes d'erreur indiquant que le listener connaît le service
+SERVICE_EXISTS_ERRORS = ('ORA-01017', 'ORA-28000', 'ORA-28001', 'ORA-01045')
+
+Probe = collections.namedtuple('Probe', 'dsn host port service format rank latency_ms error')
+
+
+def scan_port(host, port, timeout):
+    """Vrai si une connexion TCP s'établit dans le délai"""
+    try:
+        with socket.create_connection((host, port), timeout):
+            return True
+    except OSError:
+        return False
+
+
+def scan_ports(hosts, ports, timeout, workers):
+    """Ports ouverts parmi hosts x ports, testés en parallèle"""
+    targets = [(host, port) for host in hosts for port in ports]
+    with concurrent.futures.ThreadPoolExecutor(max(1, min(workers, len(targets)))) as pool:
+        results = pool.map(lambda target: scan_port(*target, timeout), targets)
+        return [target for target, is_open in zip(targets, results) if is_open]
+
+
+def probe(user, password, host, port, service, dsn_format, timeout):
+    """Tente une connexion; retourne un Probe classé"""
+    dsn = f"{host}:{port}/{service}" if dsn_format == 'service' else f"{host}:{port}:{service}"
+    started = time.perf_counter()
+    try:
+        connection = oracledb.connect(user=user, password=password, dsn=dsn,
+                                      tcp_connect_timeout=timeout)
+        try:
+            connection.ping()
+        finally:
+            connection.close()
+        rank, error = CONNECTED, None
+    except Exception as e:
+        error = str(e).splitlines()[0] if str(e) else type(e).__name__
+        rank = AUTH_FAILED if any(code in error for code in SERVICE_EXISTS_ERRORS) else UNREACHABLE
+    latency_ms = (time.perf_counter() - started) * 1000
+    return Probe(dsn, host, port, service, dsn_format, rank, latency_ms, error)
+
+
+def rank_key(result):
+    return (result.rank, result.format != 'service', result.latency_ms)
+
+
+def discover(user, password, hosts=HOSTS, ports=PORTS, services=SERVICE_NAMES,
+             timeout=3.0, deadline=20.0, workers=16, report=print):
+    """Balaye ports puis services en parallèle; retourne les Probe classés"""
+    open_ports = scan_ports(hosts, ports, min(timeout, 1.0), workers)
     for host in hosts:
         for port in ports:
-            # Vérifier si le port est ouvert
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(1)
-                    result = s.connect_ex((host, port))
-                    if result != 0:
-                        print(f"Port {port} non disponible sur {host}")
-                        continue
-                    else:
-                        print(f"Port {port} est ouvert sur {host}")
-            except Exception as e:
-                print(f"Erreur de vérification du port {port} sur {host}: {e}")
-                continue
-            
-            # Tester chaque service
-            for service in service_names:
-                try:
-                    # Format EZ Connect
-                    dsn = f"{host}:{port}/{service}"
-                    print(f"Essai avec: {dsn}")
-                    conn = oracledb.connect(user=user, password=password, dsn=dsn)
-                    print(f"✅ Connexion réussie avec: {dsn}")
-                    conn.close()
-                except Exception as e:
-                    print(f"❌ Échec: {e}")
-                    
-                try:
-                    # Format SID
-                    dsn = f"{host}:{port}:{service}"
-                    print(f"Essai avec: {dsn}")
-                    conn = oracledb.connect(user=user, password=password, dsn=dsn)
-                    print(f"✅ Connexion réussie avec: {dsn}")
-                    conn.close()
-                except Exception as e:
-                    print(f"❌ Échec: {e}")
+            state = "ouvert" if (host, port) in open_ports else "non disponible"
+            report(f"Port {port} {state} sur {host}")
+    if not open_ports:
+        return []
+
+    attempts = [(host, port, service, dsn_format)
+                for host, port in open_ports
+                for service in services
+                for dsn_format in ('service', 'sid')]
+    report(f"{len(attempts)} essais de connexion en parallèle...")
+
+    results = []
+    pool = concurrent.futures.ThreadPoolExecutor(max(1, min(workers, len(attempts))))
+    futures = {pool.submit(probe, user, password, *attempt, timeout): attempt for attempt in attempts}
+    try:
+        for future in concurrent.futures.as_completed(futures, timeout=deadline):
+            result = future.result()
+            results.append(result)
+            mark = "✅" if result.rank == CONNECTED else "❌"
+            report(f"{mark} {result.dsn} ({result.latency_ms:.0f} ms){'' if result.error is None else ': ' + result.error}")
+    except concurrent.futures.TimeoutError:
+        for future, (host, port, service, dsn_format) in futures.items():
+            if not future.done():
+                dsn = f"{host}:{port}/{service}" if dsn_format == 'service' else f"{host}:{port}:{service}"
+                results.append(Probe(dsn, host, port, service, dsn_format, UNREACHABLE,
+                                     deadline * 1000, "Échéance globale dépassée"))
+    finally:
+        # Ne pas attendre les essais encore bloqués (bornés par tcp_connect_timeout)
+        pool.shutdown(wait=False, cancel_futures=True)
+    return sorted(results, key=rank_key)
+
+
+def write_dsn_config(path, best):
+    """Enregistre le DSN retenu dans le fichier lu par config.py au démarrage"""
+    document = {
+        'dsn': best.dsn,
+        'latency_ms': round(best.latency_ms, 1),
+        'discovered_at': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def check_oracle_connection(argv=None):
+    args = parse_args(argv)
+    print("Vérification des connexions Oracle possibles...")
+    started = time.perf_counter()
+    results = discover(args.user, args.password, args.hosts, args.ports, args.services,
+                       timeout=args.timeout, deadline=args.deadline, workers=args.workers)
+    print(f"\nBalayage terminé en {time.perf_counter() - started:.1f} s")
+
+    if not results:
+        print("Aucun listener Oracle joignable.")
+        return None
+    print("Classement:")
+    for i, result in enumerate(results[:10], 1):
+        state = {CONNECTED: "connexion", AUTH_FAILED: "service trouvé, accès refusé",
+                 UNREACHABLE: "échec"}[result.rank]
+        print(f"  {i:2d}. {result.dsn:40s} {state} ({result.latency_ms:.0f} ms)")
+
+    best = results[0]
+    if best.rank != CONNECTED:
+        print("Aucune connexion réussie: configuration inchangée.")
+        return None
+    if args.no_write:
+        print(f"DSN retenu: {best.dsn} (non enregistré)")
+    else:
+        write_dsn_config(args.output, best)
+        print(f"DSN retenu: {best.dsn}, enregistré dans {args.output}")
+    return best
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Découverte parallèle des services Oracle joignables")
+    parser.add_argument('--hosts', nargs='+', default=HOSTS, help="Hôtes à tester")
+    parser.add_argument('--ports', nargs='+', type=int, default=PORTS, help="Ports à tester")
+    parser.add_argument('--services', nargs='+', default=SERVICE_NAMES, help="Noms de service/SID")
+    parser.add_argument('--user', default=config.DB_USER)
+    parser.add_argument('--password', default=config.DB_PASSWORD)
+    parser.add_argument('--timeout', type=float, default=3.0, help="Délai par essai de connexion (s)")
+    parser.add_argument('--deadline', type=float, default=20.0, help="Durée maximale des essais (s)")
+    parser.add_argument('--workers', type=int, default=16, help="Essais simultanés")
+    parser.add_argument('--output', default=config.DSN_FILE, help="Fichier de configuration du DSN")
+    parser.add_argument('--no-write', action='store_true', help="Ne pas enregistrer le DSN retenu")
+    parser.add_argument('--no-pause', action='store_true', help="Ne pas attendre Entrée avant de quitter")
+    return parser.parse_args(argv)
+
 
 if __name__ == "__main__":
+    pause = '--no-pause' not in sys.argv[1:]
     try:
         check_oracle_connection()
     except Exception as e:
         print(f"Erreur globale: {e}")
-    
-    print("\nAppuyez sur Entrée pour quitter...")
-    input() 
\ No newline at end of file
+
+    if pause:
+        print("\nAppuyez sur Entrée pour quitter...")
+        input()
@@ -0,0 +1,349 @@
+import argparse
+import datetime
+import signal
+import sys
+import threading
+import time
+
+import config
+import metrics
+from alerts import DatabaseSink, build_sinks, default_engine
+from batch_writer import BatchWriter
+from retention import RetentionJob, retention_targets
+from spool import Spool, spool_path
+from scheduler import DeadlineScheduler
+from sensors import lire_capteurs_cpu
+from storage import (HAS_ORACLE, open_oracle, open_sqlite, close_oracle_pools,
+                     ensure_oracle_schema, ensure_sqlite_schema)
+
+# =======================================
+# Collecteur headless: échantillonnage + persistance sans interface
+# =======================================
+#
+# Ce module n'importe ni tkinter ni matplotlib. La classe Collector est
+# aussi utilisée par l'interface graphique pour sa boucle de surveillance.
+#
+# Utilisation:
+#   python collector.py --sqlite cpu_temperatures.db --interval 2 --persist-interval 5
+#   python collector.py --forward 10.0.0.5:9500   # agent d'une flotte (fleet.py)
+
+
+class Collector:
+    """Boucle d'échantillonnage qui dépose les mesures dans un BatchWriter.
+
+    read_sensors() retourne (température °C ou None, SensorReading ou None).
+    on_sample(timestamp, temp_c, reading) est appelée après chaque lecture,
+    on_dropped(timestamp) si la file d'écriture est pleine et
+    on_error(exc) si la boucle s'arrête sur une exception. alert_engine
+    (alerts.AlertEngine) évalue chaque mesure avant on_sample.
+
+    Les lectures sont cadencées par un DeadlineScheduler (horloge monotone),
+    et l'enregistrement par un second échéancier évalué sur l'instant
+    planifié de chaque lecture.
+    """
+
+    def __init__(self, writer, sample_interval, persist_interval,
+                 read_sensors=lire_capteurs_cpu,
+                 on_sample=None, on_dropped=None, on_error=None,
+                 missed_tick_policy=config.MISSED_TICK_POLICY, alert_engine=None):
+        self.writer = writer
+        self.sample_interval = float(sample_interval)
+        self.persist_interval = float(persist_interval)
+        self.read_sensors = read_sensors
+        self.on_sample = on_sample
+        self.on_dropped = on_dropped
+        self.on_error = on_error
+        self.alert_engine = alert_engine
+
+        self.running = False
+        self.stop_event = threading.Event()
+        self.scheduler = DeadlineScheduler(self.sample_interval, policy=missed_tick_policy)
+        self.persist_scheduler = DeadlineScheduler(self.persist_interval)
+        self.samples = 0
+
+    def stop(self):
+        """Demande l'arrêt de la boucle (retour au plus tard après un intervalle)"""
+        self.running = False
+        self.stop_event.set()
+
+    def run(self):
+        """Boucle principale (bloquante, à lancer dans un thread si besoin)"""
+        self.running = True
+        self.stop_event.clear()
+        self.scheduler.start()
+        self.persist_scheduler.next_deadline = None
+        while self.running:
+            try:
+                # Attendre l'échéance suivante (interruptible par stop())
+                tick = self.scheduler.wait(self.stop_event)
+                if tick is None or not self.running:
+                    break
+
+                # Lire tous les capteurs (température agrégée + détail par canal)
+                started = time.perf_counter()
+                temp_c, reading = self.read_sensors()
+                metrics.SENSOR_READ_SECONDS.since(started)
+                timestamp = datetime.datetime.now()
+                self.samples += 1
+                metrics.SAMPLES_TOTAL.inc()
+                if temp_c is not None:
+                    metrics.LAST_TEMPERATURE.set(temp_c)
+
+                # Déposer dans le pipeline d'écriture selon la cadence d'enregistrement
+                if self.persist_scheduler.due(tick):
+                    if self.writer and not self.writer.submit(timestamp, temp_c, reading):
+                        if self.on_dropped:
+                            self.on_dropped(timestamp)
+
+                # Alertes évaluées sur la mesure elle-même (aucun accès base)
+                if self.alert_engine is not None:
+                    self.alert_engine.process(timestamp, temp_c)
+
+                if self.on_sample:
+                    self.on_sample(timestamp, temp_c, reading)
+
+            except Exception as e:
+                self.running = False
+                if self.on_error:
+                    self.on_error(e)
+                else:
+                    raise
+
+    def cadence_stats(self):
+        """Gigue et dépassements de la cadence d'échantillonnage"""
+        return self.scheduler.stats()
+
+
+def oracle_factory(dsn):
+    """Fabrique de connexions Oracle qui prépare le schéma à la première connexion"""
+    ready = []
+
+    def factory():
+        connection = open_oracle(dsn)
+        if not ready:
+            try:
+                ensure_oracle_schema(connection, cache_key=dsn)
+            except Exception:
+                connection.close()
+                raise
+            ready.append(True)
+        return connection
+    return factory
+
+
+def open_backend(use_oracle, sqlite_path, dsn, wait_for_oracle=False):
+    """Prépare le schéma et retourne (fabrique de connexion, using_oracle).
+
+    wait_for_oracle: si Oracle est injoignable au démarrage, le garder
+    comme cible (les mesures attendent dans le spool) au lieu de basculer
+    sur SQLite.
+    """
+    if use_oracle and HAS_ORACLE:
+        factory = oracle_factory(dsn)
+        try:
+            factory().close()
+            return factory, True
+        except Exception as e:
+            if wait_for_oracle:
+                print(f"Oracle injoignable ({e}): mesures conservées dans le spool jusqu'à son retour.")
+                return factory, True
+            print(f"Erreur de connexion Oracle: {e}\nPassage à SQLite.")
+    elif use_oracle:
+        print("ATTENTION: oracledb n'est pas installé, utilisation de SQLite à la place.")
+
+    connection = open_sqlite(sqlite_path)
+    try:
+        ensure_sqlite_schema(connection)
+    finally:
+        connection.close()
+    return (lambda: open_sqlite(sqlite_path)), False
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Collecteur de température CPU sans interface graphique")
+    backend = parser.add_mutually_exclusive_group()
+    backend.add_argument('--oracle', action='store_true', default=None,
+                         help="Enregistrer dans Oracle (CONNECT_STRING de config.py)")
+    backend.add_argument('--sqlite', metavar='CHEMIN', nargs='?', const=config.SQLITE_DB_PATH,
+                         help="Enregistrer dans une base SQLite")
+    parser.add_argument('--dsn', default=config.CONNECT_STRING, help="Chaîne de connexion Oracle")
+    parser.add_argument('--interval', type=float, default=config.UPDATE_INTERVAL,
+                        help="Intervalle d'échantillonnage (s)")
+    parser.add_argument('--persist-interval', type=float, default=config.SAMPLE_INTERVAL,
+                        help="Intervalle d'enregistrement (s)")
+    parser.add_argument('--duration', type=float, default=None,
+                        help="Arrêter après cette durée (s)")
+    parser.add_argument('--spool', metavar='CHEMIN', default=None,
+                        help="Fichier spool (défaut: SPOOL_PATH de config.py)")
+    parser.add_argument('--no-spool', action='store_true',
+                        help="Écrire directement en base, sans spool local")
+    parser.add_argument('--forward', metavar='HÔTE:PORT', default=None,
+                        help="Mode agent: envoyer les mesures à un agrégateur (fleet.py) sans base locale")
+    parser.add_argument('--forward-tcp', action='store_true',
+                        help="Envoyer à l'agrégateur en TCP (défaut: UDP)")
+    parser.add_argument('--host-id', default=None,
+                        help="Identifiant de cette machine pour l'agrégateur (défaut: nom d'hôte)")
+    parser.add_argument('--alerts', nargs='*', default=list(config.ALERT_SINKS),
+                        choices=('log', 'stdout', 'webhook'),
+                        help="Sinks des alertes (en plus de la table alerts)")
+    parser.add_argument('--metrics-port', type=int, default=config.METRICS_PORT,
+                        help="Port de l'endpoint Prometheus /metrics (0 pour le désactiver)")
+    parser.add_argument('--quiet', action='store_true', help="Ne pas afficher chaque mesure")
+    return parser.parse_args(argv)
+
+
+def stop_on_signal(collector, duration=None):
+    """Arrêt propre de la boucle sur SIGINT/SIGTERM ou après duration secondes"""
+    def handle_signal(signum, frame):
+        collector.stop()
+    signal.signal(signal.SIGINT, handle_signal)
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, handle_signal)
+    if duration:
+        timer = threading.Timer(duration, collector.stop)
+        timer.daemon = True
+        timer.start()
+
+
+def run_agent(args):
+    """Mode agent: chaque mesure est envoyée à l'agrégateur de flotte"""
+    from fleet import FleetSender
+    sender = FleetSender(args.forward, args.host_id, 'tcp' if args.forward_tcp else 'udp')
+    print(f"Agent {sender.host_id} -> {args.forward} ({sender.transport.upper()})")
+
+    def on_sample(timestamp, temp_c, reading):
+        sender.send(timestamp, temp_c)
+        if not args.quiet:
+            temp_str = f"{temp_c:.1f} °C" if temp_c is not None else "N/A"
+            print(f"{timestamp.strftime('%H:%M:%S')}  {temp_str}")
+
+    alert_engine = default_engine(args.interval, build_sinks(args.alerts))
+    collector = Collector(
+        None, args.interval, args.persist_interval,
+        read_sensors=lambda: lire_capteurs_cpu(lambda msg: print(msg, file=sys.stderr)),
+        on_sample=on_sample,
+        alert_engine=alert_engine,
+    )
+    stop_on_signal(collector, args.duration)
+    try:
+        collector.run()
+    finally:
+        alert_engine.close()
+        sender.close()
+        print(f"Agent arrêté: {sender.sent} mesures envoyées, {sender.errors} échecs d'envoi")
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.forward:
+        return run_agent(args)
+    use_oracle = config.USE_ORACLE if args.sqlite is None and not args.oracle else bool(args.oracle)
+    sqlite_path = args.sqlite or config.SQLITE_DB_PATH
+
+    use_spool = config.SPOOL_ENABLED and not args.no_spool
+    connection_factory, using_oracle = open_backend(use_oracle, sqlite_path, args.dsn,
+                                                    wait_for_oracle=use_spool)
+    print(f"Collecteur démarré ({'Oracle ' + args.dsn if using_oracle else 'SQLite ' + sqlite_path})")
+
+    spool = None
+    if use_spool:
+        path = args.spool or spool_path(config.SPOOL_PATH, using_oracle)
+        try:
+            spool = Spool(path, max_size=config.SPOOL_MAX_BYTES)
+            if len(spool):
+                print(f"Spool {path}: {len(spool)} mesures en attente à rejouer")
+        except (OSError, ValueError) as e:
+            print(f"Spool indisponible ({e}), écriture directe en base.", file=sys.stderr)
+
+    def on_error(e, rows):
+        print(f"Erreur d'écriture en base ({len(rows)} mesures perdues): {e}", file=sys.stderr)
+
+    def on_outage(e, backlog):
+        print(f"Base indisponible ({e}): mesures conservées dans le spool "
+              f"({backlog} en attente)", file=sys.stderr)
+
+    writer = BatchWriter(
+        connection_factory, using_oracle,
+        batch_size=config.WRITE_BATCH_SIZE,
+        max_age=config.WRITE_BATCH_MAX_AGE,
+        queue_size=config.WRITE_QUEUE_SIZE,
+        on_error=on_error,
+        checkpoint_interval=config.SQLITE_CHECKPOINT_INTERVAL,
+        spool=spool,
+        on_outage=on_outage,
+    )
+
+    retention = RetentionJob(
+        connection_factory, using_oracle,
+        retention_targets(config.RETENTION_RAW_DAYS, config.RETENTION_MINUTE_DAYS,
+                          config.RETENTION_HOUR_DAYS),
+        interval=config.RETENTION_INTERVAL,
+        chunk=config.RETENTION_CHUNK,
+        on_error=lambda e: print(f"Erreur de compactage: {e}", file=sys.stderr),
+        lock=None if using_oracle else writer.write_lock,
+    )
+
+    def on_sample(timestamp, temp_c, reading):
+        if not args.quiet:
+            temp_str = f"{temp_c:.1f} °C" if temp_c is not None else "N/A"
+            hottest = reading.hottest() if reading is not None else None
+            hot_str = f"  point chaud {hottest[0]} {hottest[1]:.1f} °C" if hottest else ""
+            load = reading.load_summary() if reading is not None else None
+            load_str = f"  charge {load.util:.0f} %" if load is not None and load.util is not None else ""
+            print(f"{timestamp.strftime('%H:%M:%S')}  {temp_str}{hot_str}{load_str}  "
+                  f"(en attente: {writer.backlog()})")
+
+    alert_engine = default_engine(args.interval, build_sinks(args.alerts) + [DatabaseSink(writer)])
+
+    collector = Collector(
+        writer, args.interval, args.persist_interval,
+        read_sensors=lambda: lire_capteurs_cpu(lambda msg: print(msg, file=sys.stderr)),
+        on_sample=on_sample,
+        on_dropped=lambda ts: print("File d'écriture pleine, mesure perdue", file=sys.stderr),
+        alert_engine=alert_engine,
+    )
+
+    # Arrêt propre sur SIGINT/SIGTERM
+    stop_on_signal(collector, args.duration)
+
+    metrics_server = None
+    if args.metrics_port and metrics.REGISTRY.enabled:
+        try:
+            metrics_server = metrics.MetricsServer(args.metrics_port, config.METRICS_HOST)
+            metrics_server.start()
+            print(f"Métriques exposées sur {metrics_server.address}")
+        except OSError as e:
+            print(f"Endpoint de métriques indisponible ({e})", file=sys.stderr)
+
+    writer.start()
+    retention.start()
+    started = time.monotonic()
+    try:
+        collector.run()
+    finally:
+        if metrics_server is not None:
+            metrics_server.stop()
+        alert_engine.close()
+        retention.stop()
+        writer.close()
+        if spool is not None:
+            spool.close()
+        close_oracle_pools()
+        stats = writer.stats()
+        cadence = collector.cadence_stats()
+        print(f"Collecteur arrêté après {time.monotonic() - started:.0f} s: "
+              f"{collector.samples} lectures, {stats['written']} enregistrées, "
+              f"{stats['dropped']} perdues, {stats['backlog']} restées dans le spool")
+        if alert_engine.raised:
+            print(f"Alertes: {alert_engine.raised} levées")
+        if cadence['ticks']:
+            print(f"Cadence: gigue moyenne {cadence['jitter_mean_ms']:.2f} ms, "
+                  f"max {cadence['jitter_max_ms']:.2f} ms, "
+                  f"{cadence['overruns']} dépassements, {cadence['missed']} ticks sautés")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# =======================================
+# Configuration partagée (interface graphique et collecteur sans interface)
+# =======================================
+#
+# Ce module ne dépend ni de tkinter ni de matplotlib: le collecteur
+# headless peut l'importer sans charger la pile graphique.
+
+import json
+
+# === Variables de connexion Oracle ===
+DB_USER     = 'system'    # utilisateur Oracle
+DB_PASSWORD = 'jawad-10-10-2001'  # mot de passe Oracle
+USE_ORACLE  = True        # Définir sur True pour utiliser Oracle, False pour SQLite
+
+# Chaîne de connexion - Utiliser FREEPDB1 ou FREE qui sont des services disponibles
+CONNECT_STRING = "localhost:1521/FREE"
+# Alternative si la connexion échoue
+# CONNECT_STRING = "localhost:1521/FREEPDB1"
+
+# DSN découvert par check_oracle_services.py: s'il existe, il remplace
+# CONNECT_STRING au démarrage
+DSN_FILE = "oracle_dsn.json"
+# Schémas Oracle déjà vérifiés (par DSN): les DDL ne sont pas rejouées
+SCHEMA_CACHE_FILE = "schema_cache.json"
+
+
+def _discovered_dsn(path, default):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f).get('dsn') or default
+    except (OSError, ValueError, AttributeError):
+        return default
+
+
+CONNECT_STRING = _discovered_dsn(DSN_FILE, CONNECT_STRING)
+
+# Pool de sessions Oracle (une session pour l'écrivain, une pour les lectures)
+ORACLE_POOL_MIN = 2          # Sessions ouvertes au démarrage
+ORACLE_POOL_MAX = 4          # Sessions maximales par processus
+ORACLE_STMT_CACHE = 40       # Requêtes préparées gardées en cache par session
+ORACLE_PING_INTERVAL = 60    # Vérification des sessions inactives avant réutilisation (s)
+
+# === Variables de configuration ===
+UPDATE_INTERVAL = 2  # Intervalle de mise à jour du graphique en secondes
+SAMPLE_INTERVAL = 5  # Intervalle d'échantillonnage et sauvegarde en secondes
+SQLITE_DB_PATH = "cpu_temperatures.db"  # Chemin pour la base SQLite
+# Profil SQLite: journal WAL (les lecteurs ne bloquent pas l'écrivain),
+# fsync seulement aux checkpoints, lectures par mmap
+SQLITE_JOURNAL_MODE = 'WAL'
+SQLITE_SYNCHRONOUS = 'NORMAL'
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024   # Octets projetés en mémoire (0 pour désactiver)
+SQLITE_CACHE_KB = 16384                # Cache de pages par connexion (Kio)
+SQLITE_BUSY_TIMEOUT = 5.0              # Attente max d'un verrou (secondes)
+SQLITE_CHECKPOINT_INTERVAL = 60        # Checkpoint WAL passif par l'écrivain (secondes)
+MISSED_TICK_POLICY = 'skip'  # 'skip': sauter les échéances manquées, 'catchup': les rattraper
+LOAD_SAMPLING = True  # Enregistrer utilisation, fréquence et load average avec chaque mesure
+SENSOR_BACKEND = 'auto'  # 'auto': sysfs hwmon direct sous Linux, sinon psutil; 'psutil': toujours psutil
+
+# === Pipeline d'écriture par lots ===
+WRITE_BATCH_SIZE = 100      # Nombre maximal de mesures par commit
+WRITE_BATCH_MAX_AGE = 10    # Âge maximal d'un lot avant écriture (secondes)
+WRITE_QUEUE_SIZE = 10000    # Mesures en attente au-delà desquelles on abandonne
+
+# === Spool local (tampon disque avant la base) ===
+SPOOL_ENABLED = True
+SPOOL_PATH = "cpu_temperatures_{backend}.spool"  # {backend}: oracle ou sqlite
+SPOOL_MAX_BYTES = 64 * 1024 * 1024   # Au-delà, les nouvelles mesures sont perdues
+
+# === Rétention (None = conserver indéfiniment) ===
+# Mesures brutes, puis agrégats minute, puis agrégats horaires;
+# les agrégats journaliers sont toujours conservés
+RETENTION_RAW_DAYS = 7
+RETENTION_MINUTE_DAYS = 30
+RETENTION_HOUR_DAYS = 365
+RETENTION_INTERVAL = 3600   # Période du compactage en tâche de fond (secondes)
+RETENTION_CHUNK = 5000      # Lignes supprimées par transaction
+
+# === Auto-instrumentation (metrics.py) ===
+METRICS_ENABLED = True       # False: chronomètres et compteurs réduits à un test de booléen
+METRICS_HOST = '127.0.0.1'   # Interface d'écoute de l'endpoint /metrics du collecteur
+METRICS_PORT = 9464          # Port de l'endpoint /metrics (0 pour ne pas le servir)
+
+# === Agrégateur de flotte (fleet.py) ===
+FLEET_HOST = '127.0.0.1'     # Interface d'écoute ('0.0.0.0' pour toutes)
+FLEET_PORT = 9500            # Port UDP et TCP de l'agrégateur
+FLEET_BATCH_SIZE = 1000      # Mesures par commit
+FLEET_BATCH_MAX_AGE = 1.0    # Âge maximal d'un lot avant écriture (secondes)
+FLEET_MAX_PENDING = 200000   # Mesures en attente au-delà desquelles on abandonne
+
+# === Alertes (alerts.py) ===
+ALERT_WARNING = 60.0         # Seuil d'avertissement (°C)
+ALERT_CRITICAL = 75.0        # Seuil critique (°C)
+ALERT_HYSTERESIS = 2.0       # Descente sous le seuil nécessaire pour clore une alerte (°C)
+ALERT_EWMA_ALPHA = 0.3       # Lissage de la moyenne mobile exponentielle
+ALERT_RISE_RATE = 1.0        # Vitesse de montée jugée anormale (°C/s)
+ALERT_ZSCORE = 4.0           # Score z au-delà duquel une mesure est aberrante
+ALERT_ZSCORE_WINDOW = 120    # Mesures de la fenêtre glissante du score z
+ALERT_SINKS = ('log',)       # Parmi 'log', 'stdout', 'webhook' (+ base de données)
+ALERT_LOG_PATH = "alerts.log"
+ALERT_WEBHOOK_URL = None     # Ex.: "http://127.0.0.1:9600/" (python alerts.py listen)
@@ -0,0 +1,26 @@
+import os
+
+# =======================================
+# Arborescence sysfs hwmon factice pour les tests et les benchmarks
+# =======================================
+#
+# Même structure que /sys/class/hwmon: un répertoire hwmonN par puce avec
+# son fichier name et des paires tempN_input / tempN_label. Les valeurs
+# sont en millidegrés, comme celles du noyau.
+
+# (nom de puce, nombre d'entrées de température)
+FAKE_CHIPS = (('coretemp', 9), ('nvme', 3), ('acpitz', 1), ('k10temp', 2))
+
+
+def make_fake_hwmon(root):
+    """Crée une arborescence hwmon factice (même structure que /sys/class/hwmon)"""
+    for index, (chip, count) in enumerate(FAKE_CHIPS):
+        base = os.path.join(root, f'hwmon{index}')
+        os.makedirs(base)
+        with open(os.path.join(base, 'name'), 'w') as f:
+            f.write(chip + '\n')
+        for n in range(1, count + 1):
+            with open(os.path.join(base, f'temp{n}_input'), 'w') as f:
+                f.write(f'{40000 + 1000 * n}\n')
+            with open(os.path.join(base, f'temp{n}_label'), 'w') as f:
+                f.write(f'Core {n - 1}\n')
@@ -0,0 +1,467 @@
+import argparse
+import asyncio
+import concurrent.futures
+import math
+import random
+import signal
+import socket
+import sys
+import time
+
+import config
+from rollups import from_epoch_ms
+from storage import HOST_MAX_LENGTH, close_oracle_pools, discard_connection, is_disconnect
+
+# =======================================
+# Agrégateur de flotte: mesures de nombreuses machines, une boucle asyncio
+# =======================================
+#
+# Chaque agent (collector.py --forward) envoie ses mesures à l'agrégateur
+# par UDP ou TCP sous forme de lignes texte:
+#
+#   <host> <date en ms epoch> <température °C ou nan>\n
+#
+# Un datagramme UDP peut contenir plusieurs lignes; en TCP, le flux est
+# découpé sur les fins de ligne. L'agrégateur accumule les mesures de
+# toutes les machines et les écrit par lots (executemany + un commit) dans
+# cpu_temperatures, colonne host renseignée. Une seule écriture est en
+# cours à la fois, dans un thread dédié: la boucle d'événements ne fait
+# jamais d'E/S base et sert des milliers d'agents.
+#
+# Les agrégats minute/heure/jour restent ceux de la machine locale: les
+# mesures de flotte ne sont conservées qu'en brut (rétention des mesures
+# brutes).
+#
+# Utilisation:
+#   python fleet.py serve --sqlite cpu_temperatures.db --port 9500
+#   python fleet.py simulate --agents 2000 --rate 1 --duration 30 --port 9500
+#   python collector.py --forward 127.0.0.1:9500
+
+ORACLE_FLEET_SQL = ("INSERT INTO cpu_temperatures (timestamp, temp_celsius, host) "
+                    "VALUES (:1, :2, :3)")
+SQLITE_FLEET_SQL = "INSERT INTO cpu_temperatures (timestamp, temp_celsius, host) VALUES (?, ?, ?)"
+MAX_LINE = 256  # Au-delà, une ligne TCP sans fin de ligne est rejetée
+
+
+class MalformedSample(ValueError):
+    """Ligne de protocole invalide"""
+
+
+def encode_sample(host, epoch_ms, temp_c):
+    """Ligne de protocole d'une mesure"""
+    temp = 'nan' if temp_c is None else f'{temp_c:.2f}'
+    return f'{host} {int(epoch_ms)} {temp}\n'.encode('ascii')
+
+
+def parse_sample(line):
+    """Décode une ligne (bytes, sans fin de ligne): (host, ms epoch, température ou None)"""
+    parts = line.split()
+    if len(parts) != 3:
+        raise MalformedSample(f"3 champs attendus: {line[:60]!r}")
+    host, epoch_ms, temp = parts
+    if len(host) > HOST_MAX_LENGTH:
+        raise MalformedSample(f"Identifiant de machine trop long: {host[:60]!r}")
+    try:
+        epoch_ms = int(epoch_ms)
+        temp = float(temp)
+        host = host.decode('ascii')
+    except (ValueError, UnicodeDecodeError) as e:
+        raise MalformedSample(str(e))
+    return host, epoch_ms, None if math.isnan(temp) else round(temp, 2)
+
+
+def parse_address(value, default_port=config.FLEET_PORT):
+    """'hôte:port' (ou 'hôte') -> (hôte, port)"""
+    host, _, port = value.rpartition(':')
+    if not host:
+        return value, default_port
+    return host, int(port)
+
+
+class FleetAggregator:
+    """Reçoit les mesures de la flotte et les écrit par lots.
+
+    connection_factory() ouvre une connexion d'écriture (appelée dans le
+    thread d'écriture). batch_size et max_age (secondes) bornent chaque lot;
+    au-delà de max_pending mesures en attente, les nouvelles sont perdues.
+    """
+
+    def __init__(self, connection_factory, using_oracle,
+                 batch_size=config.FLEET_BATCH_SIZE, max_age=config.FLEET_BATCH_MAX_AGE,
+                 max_pending=config.FLEET_MAX_PENDING, on_error=None):
+        self.connection_factory = connection_factory
+        self.using_oracle = using_oracle
+        self.batch_size = max(1, int(batch_size))
+        self.max_age = float(max_age)
+        self.max_pending = int(max_pending)
+        self.on_error = on_error
+
+        self.pending = []
+        self.hosts = {}  # host -> (dernière date ms, dernière température)
+        self.executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='fleet-writer')
+        self.connection = None
+        self.servers = []
+        self.flush_task = None
+        self.wake = None
+        self.stopping = False
+
+        # Compteurs observables
+        self.received = 0
+        self.malformed = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.connections = 0
+        self.last_commit_seconds = 0.0
+
+    # --- Réception ---
+
+    def ingest_line(self, line):
+        try:
+            host, epoch_ms, temp_c = parse_sample(line)
+        except MalformedSample:
+            self.malformed += 1
+            return
+        self.ingest(host, epoch_ms, temp_c)
+
+    def ingest(self, host, epoch_ms, temp_c):
+        """Ajoute une mesure au lot courant (boucle d'événements uniquement)"""
+        self.received += 1
+        self.hosts[host] = (epoch_ms, temp_c)
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self.pending.append((epoch_ms, temp_c, host))
+        if len(self.pending) >= self.batch_size:
+            self.wake.set()
+
+    async def start(self, host=config.FLEET_HOST, port=config.FLEET_PORT, udp=True, tcp=True):
+        """Ouvre les écoutes UDP/TCP et démarre la tâche d'écriture"""
+        loop = asyncio.get_running_loop()
+        self.wake = asyncio.Event()
+        self.stopping = False
+        if udp:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DatagramProtocol(self), local_addr=(host, port))
+            self.servers.append(transport)
+        if tcp:
+            server = await loop.create_server(lambda: _StreamProtocol(self), host, port,
+                                              backlog=1024, reuse_address=True)
+            self.servers.append(server)
+        self.flush_task = asyncio.create_task(self._flush_loop())
+
+    def addresses(self):
+        """Adresses réellement liées {'udp': (hôte, port), 'tcp': (hôte, port)} (utile avec port=0)"""
+        bound = {}
+        for server in self.servers:
+            if isinstance(server, asyncio.AbstractServer):
+                bound['tcp'] = server.sockets[0].getsockname()[:2]
+            else:
+                bound['udp'] = server.get_extra_info('sockname')[:2]
+        return bound
+
+    async def stop(self):
+        """Ferme les écoutes, écrit les mesures restantes et libère la connexion"""
+        for server in self.servers:
+            server.close()
+        self.servers = []
+        self.stopping = True
+        if self.flush_task is not None:
+            self.wake.set()
+            await self.flush_task
+            self.flush_task = None
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._close_connection)
+        self.executor.shutdown(wait=True)
+
+    def stats(self):
+        """Instantané des compteurs"""
+        return {
+            'hosts': len(self.hosts),
+            'connections': self.connections,
+            'received': self.received,
+            'malformed': self.malformed,
+            'dropped': self.dropped,
+            'pending': len(self.pending),
+            'written': self.written,
+            'failed': self.failed,
+            'batches': self.batches,
+            'last_commit_seconds': self.last_commit_seconds,
+        }
+
+    # --- Écriture par lots ---
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.max_age)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            # Les mesures arrivées pendant l'écriture forment le lot suivant
+            while self.pending:
+                rows = self.pending[:self.batch_size]
+                del self.pending[:self.batch_size]
+                await loop.run_in_executor(self.executor, self._write, rows)
+                if len(self.pending) < self.batch_size and not self.stopping:
+                    break
+            if self.stopping and not self.pending:
+                return
+
+    def _write(self, rows):
+        """Thread d'écriture: un executemany et un commit par lot"""
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = self.connection_factory()
+            cursor = self.connection.cursor()
+            try:
+                if self.using_oracle:
+                    cursor.executemany(ORACLE_FLEET_SQL,
+                                       [(from_epoch_ms(ms), t, h) for ms, t, h in rows])
+                else:
+                    cursor.executemany(SQLITE_FLEET_SQL, rows)
+            finally:
+                cursor.close()
+            self.connection.commit()
+        except Exception as e:
+            self.failed += len(rows)
+            self._close_connection(discard=is_disconnect(e))
+            if self.on_error:
+                self.on_error(e, rows)
+            return
+        self.written += len(rows)
+        self.batches += 1
+        self.last_commit_seconds = time.perf_counter() - started
+
+    def _close_connection(self, discard=False):
+        if self.connection is None:
+            return
+        if discard and self.using_oracle:
+            discard_connection(self.connection)
+        else:
+            try:
+                self.connection.rollback()
+                self.connection.close()
+            except Exception:
+                pass
+        self.connection = None
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, aggregator):
+        self.aggregator = aggregator
+
+    def datagram_received(self, data, addr):
+        for line in data.splitlines():
+            if line:
+                self.aggregator.ingest_line(line)
+
+
+class _StreamProtocol(asyncio.Protocol):
+    """Connexion TCP d'un agent: découpage du flux en lignes"""
+
+    def __init__(self, aggregator):
+        self.aggregator = aggregator
+        self.buffer = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.aggregator.connections += 1
+
+    def connection_lost(self, exc):
+        self.aggregator.connections -= 1
+
+    def data_received(self, data):
+        buffer = self.buffer + data
+        lines = buffer.split(b'\n')
+        self.buffer = lines.pop()
+        for line in lines:
+            if line:
+                self.aggregator.ingest_line(line)
+        if len(self.buffer) > MAX_LINE:
+            self.aggregator.malformed += 1
+            self.transport.close()
+
+
+# === Côté agent ===
+
+class FleetSender:
+    """Envoie les mesures d'une machine à l'agrégateur (UDP, ou TCP avec reconnexion).
+
+    send() ne bloque pas sur un agrégateur absent: en UDP la mesure part
+    sans accusé; en TCP elle est perdue jusqu'à la reconnexion suivante.
+    """
+
+    def __init__(self, address, host_id=None, transport='udp', timeout=1.0):
+        self.address = parse_address(address) if isinstance(address, str) else tuple(address)
+        self.host_id = (host_id or socket.gethostname().split('.')[0]).replace(' ', '_')[:HOST_MAX_LENGTH]
+        self.transport = transport
+        self.timeout = timeout
+        self.socket = None
+        self.sent = 0
+        self.errors = 0
+
+    def send(self, timestamp, temp_c):
+        payload = encode_sample(self.host_id, timestamp.timestamp() * 1000, temp_c)
+        try:
+            if self.transport == 'udp':
+                if self.socket is None:
+                    self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self.socket.sendto(payload, self.address)
+            else:
+                if self.socket is None:
+                    self.socket = socket.create_connection(self.address, self.timeout)
+                self.socket.sendall(payload)
+            self.sent += 1
+            return True
+        except OSError:
+            self.errors += 1
+            self.close()
+            return False
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+
+# === Simulation d'agents (charge de test sur localhost) ===
+
+async def simulate_agents(address, agents, rate, duration, transport='udp'):
+    """Simule agents machines envoyant rate mesures/s chacune pendant duration s.
+
+    Retourne le nombre de mesures envoyées.
+    """
+    loop = asyncio.get_running_loop()
+    host, port = address
+    period = 1.0 / rate
+    deadline = loop.time() + duration
+    sent = [0]
+
+    async def udp_agent(index, transport_):
+        name = f'sim-{index:05d}'
+        await asyncio.sleep(random.random() * period)  # Étaler les envois
+        while loop.time() < deadline:
+            transport_.sendto(encode_sample(name, time.time() * 1000, 40 + 20 * random.random()))
+            sent[0] += 1
+            await asyncio.sleep(period)
+
+    async def tcp_agent(index):
+        name = f'sim-{index:05d}'
+        await asyncio.sleep(random.random() * period)
+        _, writer = await asyncio.open_connection(host, port)
+        try:
+            while loop.time() < deadline:
+                writer.write(encode_sample(name, time.time() * 1000, 40 + 20 * random.random()))
+                sent[0] += 1
+                await writer.drain()
+                await asyncio.sleep(period)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    if transport == 'udp':
+        datagram, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol,
+                                                           remote_addr=(host, port))
+        try:
+            await asyncio.gather(*(udp_agent(i, datagram) for i in range(agents)))
+        finally:
+            datagram.close()
+    else:
+        await asyncio.gather(*(tcp_agent(i) for i in range(agents)))
+    return sent[0]
+
+
+# === Point d'entrée ===
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Agrégateur de températures d'une flotte de machines")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="Recevoir les mesures des agents et les enregistrer")
+    backend = serve.add_mutually_exclusive_group()
+    backend.add_argument('--oracle', action='store_true', default=None, help="Enregistrer dans Oracle")
+    backend.add_argument('--sqlite', metavar='CHEMIN', nargs='?', const=config.SQLITE_DB_PATH,
+                         help="Enregistrer dans une base SQLite")
+    serve.add_argument('--dsn', default=config.CONNECT_STRING, help="Chaîne de connexion Oracle")
+    serve.add_argument('--host', default=config.FLEET_HOST, help="Interface d'écoute")
+    serve.add_argument('--port', type=int, default=config.FLEET_PORT, help="Port UDP et TCP")
+    serve.add_argument('--no-udp', action='store_true', help="Ne pas écouter en UDP")
+    serve.add_argument('--no-tcp', action='store_true', help="Ne pas écouter en TCP")
+    serve.add_argument('--duration', type=float, default=None, help="Arrêter après cette durée (s)")
+    serve.add_argument('--report', type=float, default=10.0, help="Période du bilan affiché (s)")
+
+    simulate = commands.add_parser('simulate', help="Simuler des agents sur cette machine")
+    simulate.add_argument('--address', default=f'127.0.0.1:{config.FLEET_PORT}',
+                          help="Agrégateur (hôte:port)")
+    simulate.add_argument('--agents', type=int, default=1000, help="Nombre d'agents simulés")
+    simulate.add_argument('--rate', type=float, default=1.0, help="Mesures par seconde et par agent")
+    simulate.add_argument('--duration', type=float, default=10.0, help="Durée (s)")
+    simulate.add_argument('--tcp', action='store_true', help="Une connexion TCP par agent (défaut: UDP)")
+    return parser.parse_args(argv)
+
+
+async def serve(args):
+    # Import tardif: collector.open_backend prépare le schéma (colonne host incluse)
+    from collector import open_backend
+    use_oracle = config.USE_ORACLE if args.sqlite is None and not args.oracle else bool(args.oracle)
+    connection_factory, using_oracle = open_backend(use_oracle, args.sqlite or config.SQLITE_DB_PATH,
+                                                    args.dsn)
+
+    def on_error(e, rows):
+        print(f"Erreur d'écriture en base ({len(rows)} mesures perdues): {e}", file=sys.stderr)
+
+    aggregator = FleetAggregator(connection_factory, using_oracle, on_error=on_error)
+    await aggregator.start(args.host, args.port, udp=not args.no_udp, tcp=not args.no_tcp)
+    listening = ', '.join(f"{kind.upper()} {host}:{port}"
+                          for kind, (host, port) in aggregator.addresses().items())
+    print(f"Agrégateur à l'écoute ({listening}, {'Oracle' if using_oracle else 'SQLite'})")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, getattr(signal, 'SIGTERM', None)):
+        if signum is not None:
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except NotImplementedError:  # Windows
+                pass
+    if args.duration:
+        loop.call_later(args.duration, stop.set)
+
+    previous = 0
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), args.report)
+        except asyncio.TimeoutError:
+            stats = aggregator.stats()
+            print(f"{stats['hosts']} machines, {(stats['received'] - previous) / args.report:.0f} mesures/s, "
+                  f"{stats['written']} enregistrées, {stats['pending']} en attente, "
+                  f"{stats['dropped']} perdues, {stats['malformed']} invalides")
+            previous = stats['received']
+
+    await aggregator.stop()
+    close_oracle_pools()
+    stats = aggregator.stats()
+    print(f"Agrégateur arrêté: {stats['received']} mesures reçues de {stats['hosts']} machines, "
+          f"{stats['written']} enregistrées en {stats['batches']} lots, {stats['dropped']} perdues")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'serve':
+        asyncio.run(serve(args))
+        return 0
+
+    started = time.monotonic()
+    sent = asyncio.run(simulate_agents(parse_address(args.address), args.agents, args.rate,
+                                       args.duration, 'tcp' if args.tcp else 'udp'))
+    elapsed = time.monotonic() - started
+    print(f"{args.agents} agents simulés: {sent} mesures envoyées en {elapsed:.1f} s "
+          f"({sent / elapsed:.0f} mesures/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
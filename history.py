@@ -0,0 +1,209 @@
+import collections
+import datetime
+
+import numpy as np
+
+from config import RETENTION_RAW_DAYS, RETENTION_MINUTE_DAYS, RETENTION_HOUR_DAYS
+from rollups import RESOLUTIONS, to_epoch_ms, from_epoch_ms
+from storage import fetch_blobs_as_bytes, load_layouts
+
+# =======================================
+# Lecture de l'historique avec niveau de détail adapté à l'affichage
+# =======================================
+#
+# Une plage de temps est découpée en autant d'intervalles que de pixels
+# de largeur du graphique. La base renvoie pour chaque pixel le minimum,
+# le maximum et la moyenne (enveloppe min/max): les pics restent visibles
+# quel que soit le zoom, et le nombre de lignes renvoyées ne dépend que de
+# la largeur, pas de la durée.
+#
+# La source est la table la plus grossière dont la résolution reste plus
+# fine qu'un pixel (mesures brutes, agrégats minute, heure ou jour), parmi
+# celles dont la rétention couvre encore le début de la plage: quelques
+# mois s'affichent en lisant quelques milliers d'agrégats horaires.
+#
+# Le détail multi-canaux (sensor_samples: un vecteur float32 par tick,
+# températures et charge CPU) est relu par fetch_readings, décodé par
+# layout en une matrice dates x canaux.
+
+# (nom, table, colonne de date, résolution en secondes, rétention en jours)
+TIERS = (
+    ('raw', 'cpu_temperatures', 'timestamp', 1, RETENTION_RAW_DAYS),
+    ('minute', RESOLUTIONS['minute'][0], 'bucket_start', 60, RETENTION_MINUTE_DAYS),
+    ('hour', RESOLUTIONS['hour'][0], 'bucket_start', 3600, RETENTION_HOUR_DAYS),
+    ('day', RESOLUTIONS['day'][0], 'bucket_start', 86400, None),
+)
+
+# Enveloppe d'une plage: dates epoch (s), minimum, maximum et moyenne par pixel
+Envelope = collections.namedtuple('Envelope', 'tier times lows highs means')
+
+# Lectures multi-canaux: dates epoch (s), noms des canaux, matrice float32
+# (une ligne par tick, NaN pour un canal absent de la lecture)
+Readings = collections.namedtuple('Readings', 'times channels values')
+
+
+def choose_tier(start, end, width, now=None):
+    """Choisit la source la plus économique pour une plage et une largeur en pixels"""
+    now = now or datetime.datetime.now()
+    pixel_seconds = (end - start).total_seconds() / max(1, width)
+
+    available = [tier for tier in TIERS
+                 if not tier[4] or start >= now - datetime.timedelta(days=tier[4])]
+    if not available:
+        available = [TIERS[-1]]
+
+    chosen = available[0]
+    for tier in available:
+        if tier[3] <= pixel_seconds:
+            chosen = tier
+    return chosen
+
+
+def _value_exprs(raw):
+    """Expressions (min, max, moyenne, filtre) sur mesures brutes ou agrégats"""
+    if raw:
+        # Mesures locales seulement, comme les agrégats
+        return ('MIN(temp_celsius), MAX(temp_celsius), AVG(temp_celsius)',
+                'temp_celsius IS NOT NULL AND host IS NULL')
+    return 'MIN(min_temp), MAX(max_temp), SUM(sum_temp) / SUM(temp_count)', 'temp_count > 0'
+
+
+def _sqlite_query(table, column, raw):
+    values, present = _value_exprs(raw)
+    return f"""
+        SELECT ({column} - ?) / ? AS px, MIN({column}), {values}
+        FROM {table}
+        WHERE {column} >= ? AND {column} < ? AND {present}
+        GROUP BY px
+        ORDER BY px
+    """
+
+
+def _oracle_query(table, column, raw):
+    values, present = _value_exprs(raw)
+    # Indice de pixel calculé une seule fois dans une vue en ligne: Oracle ne
+    # reconnaît pas une expression à variables liées répétée dans le GROUP BY
+    # (ORA-00979)
+    px = f"FLOOR((CAST({column} AS DATE) - CAST(:t0 AS DATE)) * 86400 / :px)"
+    return f"""
+        SELECT px, MIN({column}), {values}
+        FROM (
+            SELECT {px} AS px, t.*
+            FROM {table} t
+            WHERE {column} >= :t0 AND {column} < :t1 AND {present}
+        )
+        GROUP BY px
+        ORDER BY px
+    """
+
+
+def fetch_envelope(cursor, using_oracle, start, end, width, now=None):
+    """Enveloppe min/max/moyenne de [start, end) en au plus width points"""
+    tier = choose_tier(start, end, width, now)
+    name, table, column, _, _ = tier
+    raw = name == 'raw'
+    pixel_seconds = max(1.0, (end - start).total_seconds() / max(1, width))
+
+    if using_oracle:
+        cursor.execute(_oracle_query(table, column, raw),
+                       {'t0': start, 't1': end, 'px': pixel_seconds})
+        rows = cursor.fetchall()
+        times = [row[1].timestamp() for row in rows]
+    else:
+        t0 = to_epoch_ms(start)
+        cursor.execute(_sqlite_query(table, column, raw),
+                       (t0, int(pixel_seconds * 1000), t0, to_epoch_ms(end)))
+        rows = cursor.fetchall()
+        times = [row[1] / 1000.0 for row in rows]
+
+    return Envelope(
+        name,
+        np.array(times, dtype=np.float64),
+        np.array([row[2] for row in rows], dtype=np.float32),
+        np.array([row[3] for row in rows], dtype=np.float32),
+        np.array([row[4] for row in rows], dtype=np.float32),
+    )
+
+
+def data_bounds(cursor, using_oracle):
+    """(première date, dernière date) disponibles, d'après les agrégats journaliers"""
+    table = RESOLUTIONS['day'][0]
+    cursor.execute(f"SELECT MIN(bucket_start), MAX(bucket_start) FROM {table}")
+    first, last = cursor.fetchone()
+    if first is None:
+        return None
+    if not using_oracle:
+        first, last = from_epoch_ms(first), from_epoch_ms(last)
+    return first, last + datetime.timedelta(days=1)
+
+
+def fetch_readings(cursor, using_oracle, start, end):
+    """Lectures multi-canaux de [start, end) depuis sensor_samples.
+
+    Les vecteurs sont décodés par layout d'un seul np.frombuffer, puis
+    alignés sur l'union des canaux dans l'ordre d'apparition des layouts.
+    """
+    if using_oracle:
+        fetch_blobs_as_bytes(cursor)
+        try:
+            cursor.execute("SELECT timestamp, layout_id, temps FROM sensor_samples "
+                           "WHERE timestamp >= :1 AND timestamp < :2 ORDER BY timestamp", (start, end))
+            rows = cursor.fetchall()
+        finally:
+            fetch_blobs_as_bytes(cursor, enabled=False)
+    else:
+        cursor.execute("SELECT timestamp, layout_id, temps FROM sensor_samples "
+                       "WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+                       (to_epoch_ms(start), to_epoch_ms(end)))
+        rows = cursor.fetchall()
+    if not rows:
+        return Readings(np.empty(0), (), np.empty((0, 0), dtype=np.float32))
+    layouts = load_layouts(cursor)
+
+    if using_oracle:
+        times = np.array([row[0].timestamp() for row in rows], dtype=np.float64)
+    else:
+        times = np.array([row[0] for row in rows], dtype=np.float64) / 1000.0
+    layout_ids = np.array([row[1] for row in rows])
+
+    channels = []
+    index = {}
+    for layout_id in dict.fromkeys(layout_ids.tolist()):
+        for name in layouts[layout_id]:
+            if name not in index:
+                index[name] = len(channels)
+                channels.append(name)
+
+    values = np.full((len(rows), len(channels)), np.nan, dtype=np.float32)
+    for layout_id in dict.fromkeys(layout_ids.tolist()):
+        selected = np.flatnonzero(layout_ids == layout_id)
+        payload = b''.join(rows[i][2] for i in selected)  # bytes, Oracle comme SQLite
+        names = layouts[layout_id]
+        block = np.frombuffer(payload, dtype='<f4').reshape(len(selected), len(names))
+        values[np.ix_(selected, [index[name] for name in names])] = block
+    return Readings(times, tuple(channels), values)
+
+
+def channel_mean(readings, chip, start, end, width):
+    """Moyenne des canaux d'une puce (ex. util), ramenée à au plus width points.
+
+    Retourne (dates epoch s, moyennes) par pixel, sans les pixels vides.
+    """
+    columns = [i for i, name in enumerate(readings.channels) if name.split('/', 1)[0] == chip]
+    if not columns or not len(readings.times):
+        return np.empty(0), np.empty(0, dtype=np.float32)
+    block = readings.values[:, columns]
+    counts = np.sum(~np.isnan(block), axis=1)
+    present = counts > 0
+    row_means = np.nansum(block, axis=1)[present] / counts[present]
+    times = readings.times[present]
+
+    t0 = start.timestamp()
+    pixel = max(1.0, (end.timestamp() - t0) / max(1, width))
+    bins = ((times - t0) // pixel).astype(np.int64)
+    bins -= bins.min() if len(bins) else 0
+    n = np.bincount(bins)
+    keep = n > 0
+    means = np.bincount(bins, weights=row_means)[keep] / n[keep]
+    return (np.bincount(bins, weights=times)[keep] / n[keep],
+            means.astype(np.float32))
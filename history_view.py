@@ -0,0 +1,175 @@
+import datetime
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
+
+from history import fetch_envelope, fetch_readings, channel_mean, data_bounds
+from sensors import UTIL_CHIP
+
+# =======================================
+# Fenêtre de consultation de l'historique
+# =======================================
+#
+# Affiche une plage quelconque sous forme d'enveloppe min/max par pixel
+# (history.fetch_envelope). Après un zoom ou un déplacement avec la barre
+# d'outils, seule la plage visible est relue, à la résolution adaptée.
+# Tant que la plage est lue depuis les mesures brutes, l'utilisation CPU
+# moyenne enregistrée avec chaque mesure (sensor_samples) est superposée.
+
+# Plages proposées: libellé -> durée en jours (None = tout l'historique)
+HISTORY_RANGES = (
+    ('24 heures', 1),
+    ('7 jours', 7),
+    ('30 jours', 30),
+    ('1 an', 365),
+    ('Tout', None),
+)
+RELOAD_DELAY_MS = 200  # Regroupe les changements d'axe d'un même geste
+
+
+class HistoryWindow:
+    """Fenêtre Toplevel de l'historique.
+
+    get_connection() retourne la connexion de lecture courante de
+    l'interface (elle peut être remplacée après une reconnexion).
+    """
+
+    def __init__(self, root, get_connection, using_oracle):
+        self.get_connection = get_connection
+        self.using_oracle = using_oracle
+        self.reload_job = None
+        self.loading = False
+
+        self.top = tk.Toplevel(root)
+        self.top.title("Historique des températures")
+        self.top.geometry("1000x600")
+        self.top.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Choix de la plage
+        controls = ttk.Frame(self.top, padding=5)
+        controls.pack(fill=tk.X)
+        ttk.Label(controls, text="Plage:").pack(side=tk.LEFT)
+        self.range_var = tk.StringVar(value=HISTORY_RANGES[0][0])
+        range_box = ttk.Combobox(controls, textvariable=self.range_var, state='readonly', width=12,
+                                 values=[label for label, _ in HISTORY_RANGES])
+        range_box.pack(side=tk.LEFT, padx=5)
+        range_box.bind('<<ComboboxSelected>>', lambda event: self.show_range())
+        self.info_var = tk.StringVar(value="")
+        ttk.Label(controls, textvariable=self.info_var).pack(side=tk.RIGHT)
+
+        # Graphique: enveloppe min/max + moyenne
+        self.fig = Figure(figsize=(8, 4), dpi=100)
+        self.ax = self.fig.add_subplot(111)
+        self.ax.set_ylabel('Température (°C)')
+        self.ax.grid(True)
+        self.ax.xaxis.set_major_formatter(
+            FuncFormatter(lambda x, pos: time.strftime('%Y-%m-%d\n%H:%M', time.localtime(x))))
+        self.envelope = None
+        self.mean_line, = self.ax.plot([], [], 'b-', linewidth=1)
+        
+        # Utilisation CPU (mesures brutes seulement) sur un axe jumeau 0-100 %
+        self.load_ax = self.ax.twinx()
+        self.load_ax.set_ylabel('Utilisation CPU (%)')
+        self.load_ax.set_ylim(0, 105)
+        self.util_line, = self.load_ax.plot([], [], color='tab:orange', linewidth=1)
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.top)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.top)
+        self.toolbar.update()
+
+        self.ax.callbacks.connect('xlim_changed', self.on_xlim_changed)
+        self.top.after(50, self.show_range)
+
+    def lift(self):
+        self.top.deiconify()
+        self.top.lift()
+
+    def close(self):
+        if self.reload_job is not None:
+            self.top.after_cancel(self.reload_job)
+            self.reload_job = None
+        self.top.destroy()
+        self.top = None
+
+    @property
+    def closed(self):
+        return self.top is None
+
+    def show_range(self):
+        """Affiche la plage choisie dans la liste"""
+        days = dict(HISTORY_RANGES)[self.range_var.get()]
+        end = datetime.datetime.now()
+        if days is None:
+            cursor = self.get_connection().cursor()
+            try:
+                bounds = data_bounds(cursor, self.using_oracle)
+            finally:
+                cursor.close()
+            if bounds is None:
+                self.info_var.set("Aucune donnée")
+                return
+            start, end = bounds[0], max(end, bounds[1])
+        else:
+            start = end - datetime.timedelta(days=days)
+        self.load(start, end, set_limits=True)
+
+    def on_xlim_changed(self, ax):
+        """Zoom/déplacement: relire la plage visible une fois le geste terminé"""
+        if self.loading:
+            return
+        if self.reload_job is not None:
+            self.top.after_cancel(self.reload_job)
+        self.reload_job = self.top.after(RELOAD_DELAY_MS, self.reload_visible)
+
+    def reload_visible(self):
+        self.reload_job = None
+        x0, x1 = self.ax.get_xlim()
+        if x1 <= x0:
+            return
+        self.load(datetime.datetime.fromtimestamp(x0), datetime.datetime.fromtimestamp(x1))
+
+    def load(self, start, end, set_limits=False):
+        """Lit l'enveloppe de [start, end) à la largeur de la zone de tracé"""
+        width = max(1, int(self.ax.bbox.width))
+        started = time.perf_counter()
+        cursor = self.get_connection().cursor()
+        try:
+            envelope = fetch_envelope(cursor, self.using_oracle, start, end, width)
+            util = ((), ())
+            if envelope.tier == 'raw':
+                readings = fetch_readings(cursor, self.using_oracle, start, end)
+                util = channel_mean(readings, UTIL_CHIP, start, end, width)
+        except Exception as e:
+            self.info_var.set(f"Erreur de lecture: {e}")
+            return
+        finally:
+            cursor.close()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.loading = True
+        try:
+            if self.envelope is not None:
+                self.envelope.remove()
+            self.envelope = self.ax.fill_between(
+                envelope.times, envelope.lows, envelope.highs,
+                color='tab:blue', alpha=0.25, linewidth=0)
+            self.mean_line.set_data(envelope.times, envelope.means)
+            self.util_line.set_data(*util)
+
+            if set_limits:
+                self.ax.set_xlim(start.timestamp(), end.timestamp())
+                if len(envelope.times):
+                    self.ax.set_ylim(float(envelope.lows.min()) - 2, float(envelope.highs.max()) + 2)
+                # Nouvelle vue de référence pour le bouton "Accueil" de la barre d'outils
+                self.toolbar.update()
+                self.toolbar.push_current()
+        finally:
+            self.loading = False
+
+        self.info_var.set(f"{len(envelope.times)} points ({envelope.tier}) en {elapsed_ms:.0f} ms")
+        self.canvas.draw_idle()
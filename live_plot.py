@@ -0,0 +1,182 @@
+import time
+
+import metrics
+
+# =======================================
+# Rendu économique du graphique temps réel
+# =======================================
+#
+# Les axes restent fixes dans une fenêtre glissante et ne sont recalculés
+# que lorsque les données en sortent (avec hystérésis). Entre deux
+# recalculs, seule la courbe est redessinée par blitting sur un fond mis
+# en cache, et aucune image n'est produite sans nouvelle mesure.
+#
+# Des courbes superposées (charge CPU) peuvent être tracées sur un axe
+# jumeau (twinx) à échelle fixe: même zone de dessin, même blitting.
+#
+# full_frame() est la mise à jour du mode 'full' (axes recalculés à chaque
+# image), partagée par l'interface et benchmark.py.
+
+
+def full_frame(fig, ax, line, history, overlays=()):
+    """Mode 'full': données de toutes les courbes, axes recalculés.
+
+    history et les historiques d'overlays ((Line2D, RingBuffer)) sont lus
+    par copie cohérente. Le rendu lui-même reste à l'appelant (animation
+    matplotlib ou canvas.draw()). Retourne les courbes mises à jour.
+    """
+    started = time.perf_counter()
+    line.set_data(*history.view())
+    for overlay_line, overlay_history in overlays:
+        overlay_line.set_data(*overlay_history.view())
+    ax.relim()
+    ax.autoscale_view()
+    fig.autofmt_xdate(rotation=0)
+    metrics.REDRAW_SECONDS.since(started)
+    return (line,) + tuple(overlay_line for overlay_line, _ in overlays)
+
+
+class SlidingWindow:
+    """Calcule des limites d'axes stables pour une fenêtre temporelle glissante.
+
+    span: largeur visible en secondes. lead: fraction de span laissée libre
+    à droite, pour ne décaler l'axe X qu'une fois de temps en temps.
+    y_margin: marge en °C autour des données. y_shrink: l'axe Y ne se
+    resserre que si les données occupent moins de cette fraction de la
+    hauteur affichée.
+    """
+
+    def __init__(self, span, lead=0.2, y_margin=2.0, y_shrink=0.5):
+        self.span = float(span)
+        self.lead = float(lead)
+        self.y_margin = float(y_margin)
+        self.y_shrink = float(y_shrink)
+        self.xlim = None
+        self.ylim = None
+
+    def reset(self):
+        self.xlim = None
+        self.ylim = None
+
+    def update(self, t_min, t_max, y_min, y_max):
+        """Met à jour les limites; retourne True si elles ont changé"""
+        changed = False
+
+        # Axe X: décaler seulement quand la dernière mesure dépasse le bord droit
+        if self.xlim is None or t_max > self.xlim[1] or t_min < self.xlim[0] - self.span:
+            right = t_max + self.lead * self.span
+            self.xlim = (right - (1 + self.lead) * self.span, right)
+            changed = True
+
+        # Axe Y: élargir dès qu'une valeur sort, resserrer avec hystérésis
+        if self.ylim is None or y_min < self.ylim[0] or y_max > self.ylim[1]:
+            low, high = y_min, y_max
+            if self.ylim is not None:
+                low, high = min(low, self.ylim[0] + self.y_margin), max(high, self.ylim[1] - self.y_margin)
+            self.ylim = (low - self.y_margin, high + self.y_margin)
+            changed = True
+        elif (y_max - y_min) + 2 * self.y_margin < self.y_shrink * (self.ylim[1] - self.ylim[0]):
+            self.ylim = (y_min - self.y_margin, y_max + self.y_margin)
+            changed = True
+
+        return changed
+
+
+class BlitAnimator:
+    """Anime une courbe par blitting à partir d'un RingBuffer.
+
+    Pilotée par root.after: chaque tick vérifie la version de l'historique
+    et ne dessine que s'il y a une nouvelle mesure. overlays: couples
+    (courbe, RingBuffer) tracés sur un axe jumeau à limites fixes.
+    """
+
+    def __init__(self, root, canvas, ax, line, history, window, interval_ms, toolbar=None,
+                 overlays=()):
+        self.root = root
+        self.canvas = canvas
+        self.ax = ax
+        self.line = line
+        self.history = history
+        self.window = window
+        self.interval_ms = int(interval_ms)
+        self.toolbar = toolbar
+        self.overlays = list(overlays)
+
+        self.background = None
+        self.last_version = None
+        self.job = None
+        self.frames_drawn = 0
+        self.frames_skipped = 0
+        self.full_redraws = 0
+
+        self.line.set_animated(True)
+        for overlay_line, _ in self.overlays:
+            overlay_line.set_animated(True)
+        self.draw_cid = self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def start(self):
+        """Démarre les ticks de rendu"""
+        self.window.reset()
+        self.last_version = None
+        if self.job is None:
+            self.job = self.root.after(self.interval_ms, self.tick)
+
+    def stop(self):
+        """Arrête les ticks de rendu (la dernière image reste affichée)"""
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+    def disconnect(self):
+        """Stoppe l'animation et rend la courbe au rendu normal"""
+        self.stop()
+        self.canvas.mpl_disconnect(self.draw_cid)
+        self.line.set_animated(False)
+        for overlay_line, _ in self.overlays:
+            overlay_line.set_animated(False)
+
+    def on_draw(self, event):
+        """Après un rendu complet: mettre le fond en cache et redessiner les courbes"""
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.draw_lines()
+
+    def draw_lines(self):
+        for overlay_line, _ in self.overlays:
+            overlay_line.axes.draw_artist(overlay_line)
+        self.ax.draw_artist(self.line)
+
+    def tick(self):
+        self.job = self.root.after(self.interval_ms, self.tick)
+
+        version = (self.history.version,) + tuple(h.version for _, h in self.overlays)
+        if version == self.last_version:
+            self.frames_skipped += 1
+            return
+        self.last_version = version
+
+        started = time.perf_counter()
+        dates, temps = self.history.view()
+        if not len(dates):
+            return
+        self.line.set_data(dates, temps)
+        for overlay_line, overlay_history in self.overlays:
+            overlay_line.set_data(*overlay_history.view())
+
+        # Ne pas imposer de limites pendant un zoom/déplacement de la barre d'outils
+        navigating = self.toolbar is not None and bool(self.toolbar.mode)
+        if not navigating and self.window.update(dates[0], dates[-1], temps.min(), temps.max()):
+            self.ax.set_xlim(self.window.xlim)
+            self.ax.set_ylim(self.window.ylim)
+            self.full_redraws += 1
+            self.canvas.draw_idle()  # on_draw redessinera la courbe
+            return
+
+        if self.background is None:
+            self.canvas.draw_idle()
+            return
+
+        self.canvas.restore_region(self.background)
+        self.draw_lines()
+        self.canvas.blit(self.ax.bbox)
+        self.frames_drawn += 1
+        metrics.REDRAW_SECONDS.since(started)
@@ -0,0 +1,297 @@
+import bisect
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_ENABLED
+
+# =======================================
+# Auto-instrumentation: compteurs, jauges et chronomètres
+# =======================================
+#
+# Les chemins critiques (lecture des capteurs, commit, rendu) mesurent leur
+# durée avec time.perf_counter() et la déposent dans un Timer; les
+# événements (mesures perdues, lots écrits...) incrémentent des Counter.
+# Désactivé (METRICS_ENABLED = False), chaque appel se réduit à un test
+# de booléen.
+#
+# Les valeurs sont lues par l'interface (barre de statut) et exposées au
+# format texte Prometheus par MetricsServer (GET /metrics), servi par le
+# collecteur: le moniteur peut ainsi être surveillé comme ses capteurs.
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bornes des histogrammes de durée (secondes): de 10 µs à 10 s
+DEFAULT_BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return 'NaN'
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class Registry:
+    """Ensemble nommé de métriques, activable globalement"""
+
+    def __init__(self, enabled=True):
+        self.enabled = bool(enabled)
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def register(self, metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Métrique déjà enregistrée avec un autre type: {metric.name}")
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def get(self, name):
+        return self.metrics.get(name)
+
+    def counter(self, name, help_text):
+        return self.register(Counter(self, name, help_text))
+
+    def gauge(self, name, help_text):
+        return self.register(Gauge(self, name, help_text))
+
+    def timer(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self.register(Timer(self, name, help_text, buckets))
+
+    def render(self):
+        """Toutes les métriques au format texte Prometheus"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+class Counter:
+    """Compteur monotone"""
+
+    kind = 'counter'
+
+    def __init__(self, registry, name, help_text):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        if not self.registry.enabled:
+            return
+        with self.lock:
+            self.value += amount
+
+    def samples(self):
+        return [f"{self.name} {_format_value(self.value)}"]
+
+
+class Gauge:
+    """Valeur instantanée, fixée par set() ou lue à la demande (set_function)"""
+
+    kind = 'gauge'
+
+    def __init__(self, registry, name, help_text):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.value = None  # Exposée comme NaN tant qu'aucune valeur n'a été fixée
+        self.function = None
+
+    def set(self, value):
+        if self.registry.enabled:
+            self.value = value
+
+    def set_function(self, function):
+        """Lit la valeur par function() à chaque consultation (None pour revenir à set())"""
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return None
+        return self.value
+
+    def samples(self):
+        return [f"{self.name} {_format_value(self.get())}"]
+
+
+class Timer:
+    """Histogramme de durées (secondes), avec dernière valeur et maximum"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counts = [0] * (len(self.buckets) + 1)  # Dernière case: au-delà de la borne max
+            self.count = 0
+            self.total = 0.0
+            self.last = None
+            self.max = None
+
+    def observe(self, seconds):
+        if not self.registry.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            self.last = seconds
+            if self.max is None or seconds > self.max:
+                self.max = seconds
+
+    def since(self, started):
+        """Enregistre la durée écoulée depuis started (valeur de time.perf_counter())"""
+        if self.registry.enabled:
+            self.observe(time.perf_counter() - started)
+
+    def time(self):
+        """Gestionnaire de contexte chronométrant son bloc"""
+        return _Timing(self)
+
+    def snapshot(self):
+        """Nombre, moyenne, dernière et plus grande durée (secondes)"""
+        with self.lock:
+            mean = self.total / self.count if self.count else None
+            return {'count': self.count, 'mean': mean, 'last': self.last, 'max': self.max}
+
+    def samples(self):
+        with self.lock:
+            counts = list(self.counts)
+            count, total = self.count, self.total
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (math.inf,), counts):
+            cumulative += n
+            lines.append(f'{self.name}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {_format_value(total)}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+class _Timing:
+    __slots__ = ('timer', 'started')
+
+    def __init__(self, timer):
+        self.timer = timer
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.since(self.started)
+        return False
+
+
+# === Registre du processus et métriques des chemins critiques ===
+
+REGISTRY = Registry(METRICS_ENABLED)
+
+SENSOR_READ_SECONDS = REGISTRY.timer(
+    'cpu_monitor_sensor_read_seconds', "Durée d'une lecture de tous les capteurs")
+SAMPLES_TOTAL = REGISTRY.counter(
+    'cpu_monitor_samples_total', "Lectures de capteurs effectuées")
+DROPPED_SAMPLES_TOTAL = REGISTRY.counter(
+    'cpu_monitor_dropped_samples_total', "Mesures perdues (file d'écriture ou spool plein)")
+WRITE_BACKLOG = REGISTRY.gauge(
+    'cpu_monitor_write_backlog', "Mesures en attente d'écriture en base (file ou spool)")
+COMMIT_SECONDS = REGISTRY.timer(
+    'cpu_monitor_commit_seconds', "Durée d'écriture d'un lot (executemany, agrégats et commit)")
+WRITTEN_ROWS_TOTAL = REGISTRY.counter(
+    'cpu_monitor_written_rows_total', "Mesures enregistrées en base")
+WRITE_FAILED_ROWS_TOTAL = REGISTRY.counter(
+    'cpu_monitor_write_failed_rows_total', "Mesures perdues sur erreur d'écriture")
+REDRAW_SECONDS = REGISTRY.timer(
+    'cpu_monitor_redraw_seconds', "Durée d'une image du graphique temps réel")
+LAST_TEMPERATURE = REGISTRY.gauge(
+    'cpu_monitor_temperature_celsius', "Dernière température CPU lue")
+
+
+def status_summary(registry=REGISTRY):
+    """Résumé court des métriques pour la barre de statut de l'interface"""
+    if not registry.enabled:
+        return ""
+
+    def ms(metric):
+        value = metric.snapshot()['mean']
+        return f"{value * 1000:.2f} ms" if value is not None else "--"
+
+    backlog = WRITE_BACKLOG.get()
+    return (f"capteurs {ms(SENSOR_READ_SECONDS)} | commit {ms(COMMIT_SECONDS)} | "
+            f"file {backlog if backlog is not None else '--'} | "
+            f"perdues {DROPPED_SAMPLES_TOTAL.value} | image {ms(REDRAW_SECONDS)}")
+
+
+# === Exposition HTTP ===
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Une ligne par collecte serait du bruit
+
+
+class MetricsServer:
+    """Serveur HTTP local exposant /metrics dans un thread de fond"""
+
+    def __init__(self, port, host='127.0.0.1', registry=REGISTRY):
+        handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+        self.server = ThreadingHTTPServer((host, int(port)), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-http",
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join(1.0)
+        self.thread = None
@@ -0,0 +1,205 @@
+import contextlib
+import datetime
+import threading
+import time
+
+from rollups import RESOLUTIONS, to_epoch_ms
+
+# =======================================
+# Rétention et compactage des données anciennes
+# =======================================
+#
+# Paliers de rétention: mesures brutes pendant N jours, puis agrégats par
+# minute, puis agrégats horaires; les agrégats journaliers sont conservés
+# indéfiniment (ils servent aussi à initialiser les statistiques globales).
+# Les agrégats étant mis à jour à chaque lot, compacter revient à supprimer
+# ce qui a dépassé la durée de son palier.
+#
+# Oracle: cpu_temperatures et sensor_samples sont partitionnées par jour
+# (partitionnement par intervalle); les jours expirés sont supprimés par
+# DROP PARTITION, sans DELETE ligne à ligne.
+# SQLite: suppression par tranches dans l'ordre de l'index temporel, une
+# transaction courte par tranche; les pages libérées sont réutilisées par
+# les insertions suivantes (taille de fichier stable). La tâche écrit par sa
+# propre connexion: chaque tranche prend le verrou d'écriture du BatchWriter
+# (write_lock), si bien que les deux écrivains ne se disputent jamais le
+# verrou du WAL (pas de SQLITE_BUSY) et que l'écrivain n'attend jamais plus
+# d'une tranche.
+
+DEFAULT_CHUNK = 5000  # Lignes supprimées par transaction
+
+# Début de la partition initiale Oracle (toujours vide, non supprimable)
+PARTITION_ORIGIN = datetime.datetime(2000, 1, 1)
+
+RAW_TABLES = ('cpu_temperatures', 'sensor_samples')
+
+
+def retention_targets(raw_days, minute_days, hour_days):
+    """Liste (table, colonne de date, jours conservés); None ou 0 = conserver tout"""
+    targets = [(table, 'timestamp', raw_days) for table in RAW_TABLES]
+    targets.append((RESOLUTIONS['minute'][0], 'bucket_start', minute_days))
+    targets.append((RESOLUTIONS['hour'][0], 'bucket_start', hour_days))
+    return [(table, column, days) for table, column, days in targets if days]
+
+
+def delete_before(connection, table, column, cutoff, using_oracle, chunk=DEFAULT_CHUNK, lock=None):
+    """Supprime par tranches les lignes antérieures à cutoff; retourne le nombre supprimé.
+
+    lock: verrou pris le temps de chaque tranche (écrivain SQLite partagé)
+    """
+    lock = lock or contextlib.nullcontext()
+    cursor = connection.cursor()
+    removed = 0
+    try:
+        if using_oracle:
+            sql = f"DELETE FROM {table} WHERE {column} < :1 AND ROWNUM <= :2"
+            params = (cutoff, chunk)
+        else:
+            sql = (f"DELETE FROM {table} WHERE rowid IN ("
+                   f"SELECT rowid FROM {table} WHERE {column} < ? ORDER BY {column} LIMIT ?)")
+            params = (to_epoch_ms(cutoff), chunk)
+        while True:
+            with lock:
+                cursor.execute(sql, params)
+                count = cursor.rowcount
+                connection.commit()
+            removed += count
+            if count < chunk:
+                return removed
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def is_partitioned(cursor, table):
+    """True si la table Oracle est partitionnée"""
+    cursor.execute("SELECT COUNT(*) FROM user_part_tables WHERE table_name = :1", (table.upper(),))
+    return cursor.fetchone()[0] > 0
+
+
+def drop_expired_partitions(connection, table, cutoff, chunk=DEFAULT_CHUNK):
+    """Supprime les partitions journalières Oracle entièrement antérieures à cutoff.
+
+    Retourne (partitions supprimées, lignes supprimées par DELETE). Si la
+    table n'est pas partitionnée, tout passe par des DELETE par tranches.
+    """
+    cursor = connection.cursor()
+    try:
+        if not is_partitioned(cursor, table):
+            return 0, delete_before(connection, table, 'timestamp', cutoff, True, chunk)
+
+        # Lignes de la partition initiale (dates aberrantes): DELETE classique
+        removed = delete_before(connection, table, 'timestamp', min(cutoff, PARTITION_ORIGIN), True, chunk)
+
+        dropped = 0
+        while True:
+            cursor.execute(f"SELECT MIN(timestamp) FROM {table}")
+            oldest = cursor.fetchone()[0]
+            if oldest is None:
+                break
+            day_end = datetime.datetime.combine(oldest.date(), datetime.time()) + datetime.timedelta(days=1)
+            if day_end > cutoff:
+                break
+            # DDL: pas de variable de liaison possible, date formatée en littéral
+            cursor.execute(
+                f"ALTER TABLE {table} DROP PARTITION FOR "
+                f"(TIMESTAMP '{oldest:%Y-%m-%d %H:%M:%S}') UPDATE GLOBAL INDEXES")
+            dropped += 1
+        return dropped, removed
+    finally:
+        cursor.close()
+
+
+def compact(connection, using_oracle, targets, now=None, chunk=DEFAULT_CHUNK, lock=None):
+    """Applique les paliers de rétention; retourne {table: {'partitions': n, 'rows': n}}"""
+    now = now or datetime.datetime.now()
+    result = {}
+    for table, column, days in targets:
+        cutoff = now - datetime.timedelta(days=days)
+        if using_oracle and table in RAW_TABLES:
+            dropped, removed = drop_expired_partitions(connection, table, cutoff, chunk)
+            result[table] = {'partitions': dropped, 'rows': removed}
+        else:
+            result[table] = {'partitions': 0,
+                             'rows': delete_before(connection, table, column, cutoff, using_oracle,
+                                                   chunk, lock)}
+    return result
+
+
+class RetentionJob:
+    """Tâche de fond qui applique périodiquement les paliers de rétention.
+
+    connection_factory ouvre une connexion (écriture) le temps d'un passage
+    puis la referme. on_error(exc) est appelée si un passage échoue.
+    lock: verrou d'écriture partagé avec l'écrivain SQLite (BatchWriter.write_lock).
+    """
+
+    def __init__(self, connection_factory, using_oracle, targets,
+                 interval, chunk=DEFAULT_CHUNK, on_error=None, lock=None):
+        self.connection_factory = connection_factory
+        self.using_oracle = using_oracle
+        self.targets = targets
+        self.interval = float(interval)
+        self.chunk = int(chunk)
+        self.on_error = on_error
+        self.lock = lock
+
+        self.thread = None
+        self.stop_event = threading.Event()
+
+        # Compteurs observables
+        self.runs = 0
+        self.rows_removed = 0
+        self.partitions_dropped = 0
+        self.last_run_seconds = 0.0
+
+    def start(self):
+        """Démarre la tâche (un premier passage a lieu immédiatement)"""
+        if not self.targets or (self.thread and self.thread.is_alive()):
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5.0):
+        """Arrête la tâche (attend au plus timeout la fin d'un passage en cours)"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def run_once(self):
+        """Un passage complet de compactage"""
+        started = time.monotonic()
+        connection = self.connection_factory()
+        try:
+            result = compact(connection, self.using_oracle, self.targets, chunk=self.chunk,
+                             lock=self.lock)
+        finally:
+            connection.close()
+        self.runs += 1
+        for counts in result.values():
+            self.rows_removed += counts['rows']
+            self.partitions_dropped += counts['partitions']
+        self.last_run_seconds = time.monotonic() - started
+        return result
+
+    def stats(self):
+        return {
+            'runs': self.runs,
+            'rows_removed': self.rows_removed,
+            'partitions_dropped': self.partitions_dropped,
+            'last_run_seconds': self.last_run_seconds,
+        }
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+            if self.stop_event.wait(self.interval):
+                break
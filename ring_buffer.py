@@ -0,0 +1,61 @@
+import threading
+
+import numpy as np
+
+# =======================================
+# Historique circulaire pour le graphique temps réel
+# =======================================
+#
+# Chaque mesure est écrite deux fois (indices i et i + capacité): la
+# fenêtre des N dernières mesures est donc toujours contiguë en mémoire et
+# se copie d'un bloc sous le verrou (deux np.copy par image, sans
+# reconstruction de listes). Les copies sont cohérentes entre elles: un
+# ajout concurrent ne peut pas décaler les dates par rapport aux valeurs.
+
+
+class RingBuffer:
+    """Tampon circulaire thread-safe (dates epoch en float64, températures en float32)"""
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("La capacité doit être d'au moins 1")
+        self.capacity = int(capacity)
+        self.lock = threading.Lock()
+        self._times = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._temps = np.zeros(2 * self.capacity, dtype=np.float32)
+        self._head = 0      # Prochaine position d'écriture dans [0, capacité)
+        self._size = 0
+        self.version = 0    # Incrémenté à chaque ajout
+
+    def __len__(self):
+        return self._size
+
+    def append(self, epoch_seconds, temp_c):
+        """Ajoute une mesure (appelé depuis le thread de surveillance)"""
+        with self.lock:
+            i = self._head
+            j = i + self.capacity
+            self._times[i] = self._times[j] = epoch_seconds
+            self._temps[i] = self._temps[j] = temp_c
+            self._head = (i + 1) % self.capacity
+            if self._size < self.capacity:
+                self._size += 1
+            self.version += 1
+
+    def clear(self):
+        """Vide l'historique"""
+        with self.lock:
+            self._head = 0
+            self._size = 0
+            self.version += 1
+
+    def view(self):
+        """Retourne (dates, températures), de la plus ancienne à la plus récente.
+
+        Copies prises sous le verrou: le thread de surveillance peut ajouter
+        des mesures pendant que l'appelant les utilise.
+        """
+        with self.lock:
+            start = self._head if self._size == self.capacity else 0
+            end = start + self._size
+            return self._times[start:end].copy(), self._temps[start:end].copy()
@@ -0,0 +1,258 @@
+import datetime
+import functools
+
+# =======================================
+# Tables d'agrégats pré-calculés (minute / heure / jour)
+# =======================================
+#
+# Chaque lot écrit dans cpu_temperatures met aussi à jour, dans la même
+# transaction, un agrégat par intervalle de temps. Les rapports longue
+# durée lisent ces tables au lieu de rebalayer les mesures brutes.
+#
+# Sous SQLite, bucket_start est stocké en millisecondes epoch (début de
+# l'intervalle en heure locale). Sous Oracle, c'est un TIMESTAMP.
+
+# Résolutions maintenues: nom -> (table, unité TRUNC Oracle)
+RESOLUTIONS = {
+    'minute': ('cpu_temp_rollup_minute', 'MI'),
+    'hour':   ('cpu_temp_rollup_hour', 'HH'),
+    'day':    ('cpu_temp_rollup_day', 'DD'),
+}
+
+# Bornes de l'histogramme (mêmes plages que view_cpu_temps.sql)
+HISTOGRAM_BOUNDS = (40, 50, 60, 70, 80)
+HISTOGRAM_COLUMNS = ('hist_lt40', 'hist_40_50', 'hist_50_60',
+                     'hist_60_70', 'hist_70_80', 'hist_ge80')
+
+VALUE_COLUMNS = ('records', 'temp_count', 'sum_temp', 'sum_sq_temp',
+                 'min_temp', 'max_temp') + HISTOGRAM_COLUMNS
+
+
+def bucket_start(timestamp, resolution):
+    """Tronque un datetime au début de son intervalle"""
+    if resolution == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if resolution == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def to_epoch_ms(timestamp):
+    """Convertit un datetime local naïf en millisecondes epoch"""
+    return int(round(timestamp.timestamp() * 1000))
+
+
+def from_epoch_ms(value):
+    """Convertit des millisecondes epoch en datetime local naïf"""
+    return datetime.datetime.fromtimestamp(value / 1000.0)
+
+
+def histogram_index(temp_c):
+    """Indice de la plage d'histogramme d'une température"""
+    for i, bound in enumerate(HISTOGRAM_BOUNDS):
+        if temp_c < bound:
+            return i
+    return len(HISTOGRAM_BOUNDS)
+
+
+def aggregate(rows, resolution):
+    """Agrège des mesures (timestamp, temp) par intervalle.
+
+    Retourne {bucket_start: [records, count, sum, sum_sq, min, max, hist...]}
+    """
+    buckets = {}
+    for timestamp, temp_c in rows:
+        key = bucket_start(timestamp, resolution)
+        acc = buckets.get(key)
+        if acc is None:
+            acc = [0, 0, 0.0, 0.0, None, None] + [0] * len(HISTOGRAM_COLUMNS)
+            buckets[key] = acc
+        acc[0] += 1
+        if temp_c is None:
+            continue
+        acc[1] += 1
+        acc[2] += temp_c
+        acc[3] += temp_c * temp_c
+        if acc[4] is None or temp_c < acc[4]:
+            acc[4] = temp_c
+        if acc[5] is None or temp_c > acc[5]:
+            acc[5] = temp_c
+        acc[6 + histogram_index(temp_c)] += 1
+    return buckets
+
+
+# === Requêtes de mise à jour incrémentale ===
+#
+# Texte SQL construit une seule fois par table: le même objet chaîne est
+# repassé à chaque lot et retrouve l'instruction préparée du cache.
+
+@functools.lru_cache(maxsize=None)
+def _sqlite_upsert(table):
+    columns = ', '.join(('bucket_start',) + VALUE_COLUMNS)
+    placeholders = ', '.join('?' * (len(VALUE_COLUMNS) + 1))
+    updates = [
+        'records = records + excluded.records',
+        'temp_count = temp_count + excluded.temp_count',
+        'sum_temp = sum_temp + excluded.sum_temp',
+        'sum_sq_temp = sum_sq_temp + excluded.sum_sq_temp',
+        'min_temp = MIN(COALESCE(min_temp, excluded.min_temp), COALESCE(excluded.min_temp, min_temp))',
+        'max_temp = MAX(COALESCE(max_temp, excluded.max_temp), COALESCE(excluded.max_temp, max_temp))',
+    ] + [f'{col} = {col} + excluded.{col}' for col in HISTOGRAM_COLUMNS]
+    return (f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT(bucket_start) DO UPDATE SET {', '.join(updates)}")
+
+
+@functools.lru_cache(maxsize=None)
+def _oracle_merge(table):
+    source = ', '.join(f':{i + 1} {col}' for i, col in enumerate(('bucket_start',) + VALUE_COLUMNS))
+    updates = [
+        't.records = t.records + s.records',
+        't.temp_count = t.temp_count + s.temp_count',
+        't.sum_temp = t.sum_temp + s.sum_temp',
+        't.sum_sq_temp = t.sum_sq_temp + s.sum_sq_temp',
+        't.min_temp = LEAST(NVL(t.min_temp, s.min_temp), NVL(s.min_temp, t.min_temp))',
+        't.max_temp = GREATEST(NVL(t.max_temp, s.max_temp), NVL(s.max_temp, t.max_temp))',
+    ] + [f't.{col} = t.{col} + s.{col}' for col in HISTOGRAM_COLUMNS]
+    columns = ('bucket_start',) + VALUE_COLUMNS
+    return (f"MERGE INTO {table} t USING (SELECT {source} FROM dual) s "
+            f"ON (t.bucket_start = s.bucket_start) "
+            f"WHEN MATCHED THEN UPDATE SET {', '.join(updates)} "
+            f"WHEN NOT MATCHED THEN INSERT ({', '.join(columns)}) "
+            f"VALUES ({', '.join('s.' + col for col in columns)})")
+
+
+def apply_rollups(cursor, rows, using_oracle, skip=None):
+    """Met à jour les trois tables d'agrégats pour un lot de mesures.
+
+    Doit être appelée dans la même transaction que l'insertion brute.
+    skip: {table: débuts d'intervalle en ms epoch} déjà complets (agrégats
+    importés d'une archive), laissés tels quels.
+    """
+    for resolution, (table, _) in RESOLUTIONS.items():
+        buckets = aggregate(rows, resolution)
+        done = skip.get(table) if skip else None
+        if done:
+            buckets = {key: acc for key, acc in buckets.items() if to_epoch_ms(key) not in done}
+        if using_oracle:
+            params = [(key,) + tuple(acc) for key, acc in buckets.items()]
+            cursor.executemany(_oracle_merge(table), params)
+        else:
+            params = [(to_epoch_ms(key),) + tuple(acc) for key, acc in buckets.items()]
+            cursor.executemany(_sqlite_upsert(table), params)
+
+
+# === Création des tables ===
+
+def _histogram_sql(temp_expr):
+    """Expressions SUM(CASE ...) pour remplir l'histogramme par SQL"""
+    exprs = []
+    lower = None
+    for bound in HISTOGRAM_BOUNDS + (None,):
+        conditions = []
+        if lower is not None:
+            conditions.append(f"{temp_expr} >= {lower}")
+        if bound is not None:
+            conditions.append(f"{temp_expr} < {bound}")
+        exprs.append(f"SUM(CASE WHEN {' AND '.join(conditions)} THEN 1 ELSE 0 END)")
+        lower = bound
+    return ', '.join(exprs)
+
+
+def _sqlite_bucket_expr(resolution):
+    """Début d'intervalle en ms epoch à partir du timestamp (ms epoch)"""
+    local = "datetime(timestamp / 1000, 'unixepoch', 'localtime')"
+    if resolution == 'minute':
+        local = f"strftime('%Y-%m-%d %H:%M:00', {local})"
+    elif resolution == 'hour':
+        local = f"strftime('%Y-%m-%d %H:00:00', {local})"
+    else:
+        local = f"date({local})"
+    return f"CAST(strftime('%s', {local}, 'utc') AS INTEGER) * 1000"
+
+
+def ensure_rollup_tables_sqlite(cursor):
+    """Crée les tables d'agrégats SQLite et les remplit depuis l'historique si besoin"""
+    value_columns = ', '.join(f'{col} INTEGER NOT NULL DEFAULT 0' for col in HISTOGRAM_COLUMNS)
+    for resolution, (table, _) in RESOLUTIONS.items():
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        exists = cursor.fetchone()[0] > 0
+        if exists:
+            continue
+        cursor.execute(f"""
+            CREATE TABLE {table} (
+                bucket_start INTEGER PRIMARY KEY,
+                records      INTEGER NOT NULL,
+                temp_count   INTEGER NOT NULL,
+                sum_temp     REAL    NOT NULL,
+                sum_sq_temp  REAL    NOT NULL,
+                min_temp     REAL,
+                max_temp     REAL,
+                {value_columns}
+            )
+        """)
+        # Remplissage initial depuis les mesures déjà présentes
+        bucket = _sqlite_bucket_expr(resolution)
+        cursor.execute(f"""
+            INSERT INTO {table} (bucket_start, {', '.join(VALUE_COLUMNS)})
+            SELECT {bucket}, COUNT(*), COUNT(temp_celsius),
+                   COALESCE(SUM(temp_celsius), 0), COALESCE(SUM(temp_celsius * temp_celsius), 0),
+                   MIN(temp_celsius), MAX(temp_celsius), {_histogram_sql('temp_celsius')}
+            FROM cpu_temperatures
+            WHERE host IS NULL
+            GROUP BY 1
+        """)
+
+
+def oracle_rollup_ddl():
+    """Bloc PL/SQL qui crée et remplit les tables d'agrégats Oracle si absentes"""
+    statements = []
+    hist_columns = ', '.join(f'{col} NUMBER DEFAULT 0 NOT NULL' for col in HISTOGRAM_COLUMNS)
+    for table, unit in RESOLUTIONS.values():
+        statements.append(f"""
+              SELECT COUNT(*) INTO cnt FROM user_tables WHERE table_name = UPPER('{table}');
+              IF cnt = 0 THEN
+                EXECUTE IMMEDIATE '
+                  CREATE TABLE {table} (
+                    bucket_start TIMESTAMP PRIMARY KEY,
+                    records      NUMBER NOT NULL,
+                    temp_count   NUMBER NOT NULL,
+                    sum_temp     NUMBER NOT NULL,
+                    sum_sq_temp  NUMBER NOT NULL,
+                    min_temp     NUMBER(5,2),
+                    max_temp     NUMBER(5,2),
+                    {hist_columns}
+                  )';
+                EXECUTE IMMEDIATE '
+                  INSERT INTO {table} (bucket_start, {', '.join(VALUE_COLUMNS)})
+                  SELECT CAST(TRUNC(timestamp, ''{unit}'') AS TIMESTAMP), COUNT(*), COUNT(temp_celsius),
+                         NVL(SUM(temp_celsius), 0), NVL(SUM(temp_celsius * temp_celsius), 0),
+                         MIN(temp_celsius), MAX(temp_celsius), {_histogram_sql('temp_celsius')}
+                  FROM cpu_temperatures
+                  WHERE host IS NULL
+                  GROUP BY CAST(TRUNC(timestamp, ''{unit}'') AS TIMESTAMP)';
+              END IF;""")
+    return "DECLARE\n  cnt NUMBER;\nBEGIN" + ''.join(statements) + "\nEND;"
+
+
+def ensure_rollup_tables(cursor, using_oracle):
+    """Crée les tables d'agrégats pour la base active"""
+    if using_oracle:
+        cursor.execute(oracle_rollup_ddl())
+    else:
+        ensure_rollup_tables_sqlite(cursor)
+
+
+def seed_query():
+    """Requête d'initialisation des statistiques globales (O(nombre de jours))"""
+    table = RESOLUTIONS['day'][0]
+    return f"""
+        SELECT
+            SUM(records),
+            SUM(temp_count),
+            SUM(sum_temp),
+            SUM(sum_sq_temp),
+            MIN(min_temp),
+            MAX(max_temp)
+        FROM {table}
+    """
@@ -0,0 +1,71 @@
+import math
+import threading
+
+# =======================================
+# Statistiques incrémentales des températures
+# =======================================
+#
+# Agrégats (nombre, somme, somme des carrés, min, max) initialisés une
+# seule fois depuis la base puis mis à jour en O(1) à chaque mesure, pour
+# éviter de rebalayer toute la table à chaque actualisation.
+
+
+class RunningStats:
+    """Agrégats courants thread-safe sur les températures enregistrées"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Remet tous les agrégats à zéro"""
+        with self.lock:
+            self.seeded = False
+            self.records = 0      # Nombre total de mesures (NULL inclus)
+            self.count = 0        # Nombre de températures non NULL
+            self.total = 0.0
+            self.total_sq = 0.0
+            self.min = None
+            self.max = None
+
+    def seed(self, records, count, total, total_sq, min_temp, max_temp):
+        """Initialise les agrégats à partir du résultat d'une requête SQL"""
+        with self.lock:
+            self.seeded = True
+            self.records = int(records or 0)
+            self.count = int(count or 0)
+            self.total = float(total or 0.0)
+            self.total_sq = float(total_sq or 0.0)
+            self.min = float(min_temp) if min_temp is not None else None
+            self.max = float(max_temp) if max_temp is not None else None
+
+    def add(self, temp_c):
+        """Ajoute une mesure (None pour une température inconnue)"""
+        with self.lock:
+            self.records += 1
+            if temp_c is None:
+                return
+            self.count += 1
+            self.total += temp_c
+            self.total_sq += temp_c * temp_c
+            if self.min is None or temp_c < self.min:
+                self.min = temp_c
+            if self.max is None or temp_c > self.max:
+                self.max = temp_c
+
+    def snapshot(self):
+        """Retourne un dictionnaire cohérent des statistiques courantes"""
+        with self.lock:
+            mean = self.total / self.count if self.count else None
+            stddev = None
+            if self.count > 1:
+                variance = (self.total_sq - self.total * self.total / self.count) / (self.count - 1)
+                stddev = math.sqrt(max(variance, 0.0))
+            return {
+                'records': self.records,
+                'count': self.count,
+                'min': self.min,
+                'max': self.max,
+                'mean': mean,
+                'stddev': stddev,
+            }
@@ -0,0 +1,98 @@
+import math
+import time
+
+from running_stats import RunningStats
+
+# =======================================
+# Cadencement à échéances fixes sur horloge monotone
+# =======================================
+#
+# Les échéances sont calculées à partir de l'instant de départ
+# (départ + k * intervalle) et non à partir de la fin du traitement
+# précédent: le coût d'une itération ne décale pas les suivantes.
+# La gigue (retard du réveil sur l'échéance) et les dépassements sont
+# mesurés pour vérifier la cadence réellement obtenue.
+
+# Politiques en cas d'échéances manquées
+SKIP = 'skip'        # Sauter les ticks manqués et se recaler sur la grille
+CATCH_UP = 'catchup'  # Exécuter les ticks manqués sans attendre
+
+
+class DeadlineScheduler:
+    """Produit des ticks réguliers à partir d'une horloge monotone"""
+
+    def __init__(self, interval, policy=SKIP, clock=time.monotonic):
+        if interval <= 0:
+            raise ValueError("L'intervalle doit être strictement positif")
+        if policy not in (SKIP, CATCH_UP):
+            raise ValueError(f"Politique inconnue: {policy}")
+        self.interval = float(interval)
+        self.policy = policy
+        self.clock = clock
+        self.next_deadline = None
+
+        self.ticks = 0
+        self.missed = 0      # Ticks sautés (politique SKIP)
+        self.overruns = 0    # Réveils survenus après l'échéance suivante
+        self.jitter = RunningStats()  # Retard de réveil en millisecondes
+
+    def start(self, now=None):
+        """Place la première échéance (immédiate par défaut)"""
+        self.next_deadline = self.clock() if now is None else now
+
+    def wait(self, stop_event=None):
+        """Attend la prochaine échéance et retourne son instant (horloge monotone).
+
+        Retourne None si stop_event est levé pendant l'attente.
+        """
+        if self.next_deadline is None:
+            self.start()
+
+        remaining = self.next_deadline - self.clock()
+        if remaining > 0:
+            if stop_event is not None:
+                if stop_event.wait(remaining):
+                    return None
+            else:
+                time.sleep(remaining)
+        return self._tick(self.clock())
+
+    def due(self, now):
+        """Version non bloquante: True si l'échéance est atteinte à l'instant now"""
+        if self.next_deadline is None:
+            self.start(now)
+        if now < self.next_deadline:
+            return False
+        self._tick(now)
+        return True
+
+    def _tick(self, now):
+        deadline = self.next_deadline
+        lateness = now - deadline
+
+        if lateness >= self.interval:
+            self.overruns += 1
+            if self.policy == SKIP:
+                # Se recaler sur la dernière échéance de la grille déjà passée
+                skipped = int(math.floor(lateness / self.interval))
+                self.missed += skipped
+                deadline += skipped * self.interval
+                lateness = now - deadline
+
+        self.ticks += 1
+        self.jitter.add(lateness * 1000.0)
+        self.next_deadline = deadline + self.interval
+        return deadline
+
+    def stats(self):
+        """Statistiques de cadence (gigue en millisecondes)"""
+        jitter = self.jitter.snapshot()
+        return {
+            'interval': self.interval,
+            'ticks': self.ticks,
+            'missed': self.missed,
+            'overruns': self.overruns,
+            'jitter_mean_ms': jitter['mean'],
+            'jitter_max_ms': jitter['max'],
+            'jitter_stddev_ms': jitter['stddev'],
+        }
@@ -1,8 +1,4 @@
 import time
-import datetime
-import os
-import psutil
-import ctypes
 import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
@@ -10,39 +6,45 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 import matplotlib.animation as animation
-import matplotlib.dates as mdates
+from matplotlib.ticker import FuncFormatter
 import sqlite3
+from config import (USE_ORACLE, CONNECT_STRING,
+                    UPDATE_INTERVAL, SAMPLE_INTERVAL, SQLITE_DB_PATH,
+                    WRITE_BATCH_SIZE, WRITE_BATCH_MAX_AGE, WRITE_QUEUE_SIZE,
+                    SQLITE_CHECKPOINT_INTERVAL, RETENTION_RAW_DAYS,
+                    RETENTION_MINUTE_DAYS, RETENTION_HOUR_DAYS, RETENTION_INTERVAL,
+                    RETENTION_CHUNK, SPOOL_ENABLED, SPOOL_PATH, SPOOL_MAX_BYTES,
+                    ALERT_SINKS)
+import alerts
+import metrics
+from batch_writer import BatchWriter
+from retention import RetentionJob, retention_targets
+from spool import Spool, spool_path
+from collector import Collector
+from running_stats import RunningStats
+from ring_buffer import RingBuffer
+from live_plot import SlidingWindow, BlitAnimator, full_frame
+from history_view import HistoryWindow
+from ui_channel import UiChannel
+from rollups import seed_query
+from sensors import lire_capteurs_cpu, get_load_sampler
+from storage import (open_oracle, open_sqlite, ensure_oracle_schema,
+                     ensure_sqlite_schema, format_timestamp, is_disconnect,
+                     discard_connection, close_oracle_pools, fetch_recent)
 
 # =======================================
 # Script IoT CPU Temp avec Oracle/SQLite + Interface temps réel
 # =======================================
+# Les paramètres de connexion et d'échantillonnage sont dans config.py
 
-# === Variables de connexion Oracle ===
-DB_USER     = 'system'    # utilisateur Oracle
-DB_PASSWORD = 'jawad-10-10-2001'  # mot de passe Oracle
-USE_ORACLE  = True        # Définir sur True pour utiliser Oracle, False pour SQLite
-
-# Chaîne de connexion - Utiliser FREEPDB1 ou FREE qui sont des services disponibles
-CONNECT_STRING = "localhost:1521/FREE"
-# Alternative si la connexion échoue
-# CONNECT_STRING = "localhost:1521/FREEPDB1"
-
-# === Variables de configuration ===
-UPDATE_INTERVAL = 2  # Intervalle de mise à jour du graphique en secondes
-SAMPLE_INTERVAL = 5  # Intervalle d'échantillonnage et sauvegarde en secondes
+# === Variables de configuration de l'interface ===
 MAX_POINTS = 60      # Nombre maximum de points dans le graphique temps réel
-SQLITE_DB_PATH = "cpu_temperatures.db"  # Chemin pour la base SQLite
 
-# === Vérification des droits admin sous Windows ===
-skip_wmi = False
-if os.name == 'nt':
-    try:
-        is_admin = ctypes.windll.shell32.IsUserAnAdmin()
-        if not is_admin:
-            print("Attention: exécutez ce script en tant qu'administrateur pour lire la température CPU sous Windows.")
-    except Exception:
-        # Impossible de vérifier, on tentera quand même WMI
-        pass
+# === Rendu du graphique ===
+PLOT_RENDER_MODE = 'blit'   # 'blit': axes fixes + blitting, 'full': recalcul complet à chaque image
+PLOT_REFRESH_MS = 100       # Période de vérification des nouvelles mesures en mode 'blit' (ms)
+METRICS_REFRESH_MS = 1000   # Période d'actualisation des métriques dans la barre de statut (ms)
+UI_REFRESH_MS = 100         # Période d'application des mises à jour venant des threads (ms)
 
 # Vérifier si oracledb est disponible
 try:
@@ -68,10 +70,20 @@ class RealTimeCPUTempMonitor:
         self.connection = None
         self.cursor = None
         self.current_temp = None
-        self.temps_history = []  # Pour le graphique [timestamp, temp]
+        self.history = RingBuffer(MAX_POINTS)  # Pour le graphique (epoch s, temp)
+        self.util_history = RingBuffer(MAX_POINTS)  # Utilisation CPU moyenne (%)
+        self.freq_history = RingBuffer(MAX_POINTS)  # Fréquence en % du maximum
         self.monitor_thread = None
-        self.last_save_time = None
-        self.total_records = 0
+        self.writer = None  # Écrivain par lots (thread dédié)
+        self.spool = None  # Tampon disque des mesures avant la base
+        self.collector = None  # Boucle d'échantillonnage (partagée avec collector.py)
+        self.alert_engine = None  # Détection d'alertes sur chaque mesure
+        self.retention = None  # Compactage des données anciennes (thread dédié)
+        self.history_window = None  # Fenêtre de consultation de l'historique
+        self.metrics_job = None  # Actualisation périodique des métriques affichées
+        self.bootstrap_thread = None  # Connexion et lecture initiale en arrière-plan
+        self.closing = False
+        self.stats = RunningStats()  # Agrégats min/max/moyenne incrémentaux
         self.using_oracle = False
         
         # Variables pour l'animation
@@ -80,11 +92,15 @@ class RealTimeCPUTempMonitor:
         # Configurer l'interface
         self.setup_ui()
         
-        # Tentative de connexion initiale
-        self.connect_to_database()
-        
         # Configuration de la fermeture propre
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        
+        # Canal des mises à jour venant des threads (seule la boucle Tk touche aux widgets)
+        self.ui = UiChannel(self.root, UI_REFRESH_MS)
+        self.ui.start()
+        
+        # Connexion initiale en arrière-plan: la fenêtre s'affiche sans attendre la base
+        self.connect_to_database()
 
     def setup_ui(self):
         """Configure l'interface utilisateur"""
@@ -139,9 +155,25 @@ class RealTimeCPUTempMonitor:
         self.temp_var = tk.StringVar(value="--.- °C")
         ttk.Label(temp_frame, textvariable=self.temp_var, style='Temp.TLabel').pack(side=tk.LEFT, padx=5)
         
+        # Point chaud (capteur le plus chaud)
+        hotspot_frame = ttk.Frame(info_frame)
+        hotspot_frame.grid(row=1, column=0, sticky=tk.W, padx=5, pady=(0, 5))
+        
+        ttk.Label(hotspot_frame, text="Point chaud:").pack(side=tk.LEFT)
+        self.hotspot_var = tk.StringVar(value="--")
+        ttk.Label(hotspot_frame, textvariable=self.hotspot_var).pack(side=tk.LEFT, padx=5)
+        
+        # Charge CPU (utilisation, fréquence, load average)
+        load_frame = ttk.Frame(info_frame)
+        load_frame.grid(row=2, column=0, sticky=tk.W, padx=5, pady=(0, 5))
+        
+        ttk.Label(load_frame, text="Charge:").pack(side=tk.LEFT)
+        self.load_var = tk.StringVar(value="--")
+        ttk.Label(load_frame, textvariable=self.load_var).pack(side=tk.LEFT, padx=5)
+        
         # Statut de connexion Oracle
         conn_frame = ttk.Frame(info_frame)
-        conn_frame.grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        conn_frame.grid(row=3, column=0, sticky=tk.W, padx=5, pady=5)
         
         ttk.Label(conn_frame, text="Base de données:", style='Header.TLabel').pack(side=tk.LEFT)
         self.conn_status_var = tk.StringVar(value="Non connecté")
@@ -172,6 +204,9 @@ class RealTimeCPUTempMonitor:
         
         self.refresh_btn = ttk.Button(btn_frame, text="Actualiser", command=self.load_recent_data)
         self.refresh_btn.pack(side=tk.LEFT, padx=5)
+        
+        self.history_btn = ttk.Button(btn_frame, text="Historique", command=self.open_history)
+        self.history_btn.pack(side=tk.LEFT, padx=5)
 
     def create_realtime_graph(self, parent):
         """Crée le graphique en temps réel"""
@@ -187,11 +222,23 @@ class RealTimeCPUTempMonitor:
         self.ax.set_ylabel('Température (°C)')
         self.ax.grid(True)
         
-        # Formater l'axe X pour les heures:minutes:secondes
-        self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+        # Formater l'axe X (secondes epoch) en heures:minutes:secondes
+        self.ax.xaxis.set_major_formatter(
+            FuncFormatter(lambda x, pos: time.strftime('%H:%M:%S', time.localtime(x))))
         
         # Créer une ligne vide
-        self.line, = self.ax.plot([], [], 'b-', linewidth=2)
+        self.line, = self.ax.plot([], [], 'b-', linewidth=2, label='Température')
+        
+        # Charge CPU sur un axe jumeau à échelle fixe (0-100 %)
+        self.load_ax = self.ax.twinx()
+        self.load_ax.set_ylabel('Charge CPU (%)')
+        self.load_ax.set_ylim(0, 105)
+        self.util_line, = self.load_ax.plot([], [], color='tab:orange', linewidth=1,
+                                            label='Utilisation')
+        self.freq_line, = self.load_ax.plot([], [], color='tab:green', linewidth=1,
+                                            linestyle='--', label='Fréquence (% max)')
+        self.ax.legend(handles=[self.line, self.util_line, self.freq_line],
+                       loc='upper left', fontsize='small')
         
         # Ajouter le canevas
         self.canvas = FigureCanvasTkAgg(self.fig, master=graph_frame)
@@ -200,8 +247,12 @@ class RealTimeCPUTempMonitor:
         
         # Barre d'outils de navigation (zoom, pan, etc.)
         from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk
-        toolbar = NavigationToolbar2Tk(self.canvas, graph_frame)
-        toolbar.update()
+        self.toolbar = NavigationToolbar2Tk(self.canvas, graph_frame)
+        self.toolbar.update()
+        
+        # Fenêtre glissante couvrant l'historique affiché
+        self.plot_window = SlidingWindow(span=MAX_POINTS * UPDATE_INTERVAL)
+        self.fig.autofmt_xdate(rotation=0)
 
     def create_data_table(self, parent):
         """Crée le tableau des données récentes"""
@@ -264,125 +315,152 @@ class RealTimeCPUTempMonitor:
 
     def create_status_bar(self):
         """Crée la barre de statut"""
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        
+        # Métriques internes (capteurs, commit, file, pertes, rendu) à droite
+        self.metrics_var = tk.StringVar(value="")
+        if metrics.REGISTRY.enabled:
+            metrics_label = ttk.Label(status_frame, textvariable=self.metrics_var, relief=tk.SUNKEN, anchor=tk.E)
+            metrics_label.pack(side=tk.RIGHT)
+            self.metrics_job = self.root.after(METRICS_REFRESH_MS, self.refresh_metrics_display)
+        
         self.status_var = tk.StringVar(value="Prêt")
-        status_bar = ttk.Label(self.root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
-        status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        status_bar = ttk.Label(status_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
+        status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+    
+    def refresh_metrics_display(self):
+        """Affiche les métriques internes moyennes dans la barre de statut"""
+        self.metrics_var.set(metrics.status_summary())
+        self.metrics_job = self.root.after(METRICS_REFRESH_MS, self.refresh_metrics_display)
 
     def connect_to_database(self):
-        """Établit la connexion à la base de données (Oracle ou SQLite) et prépare la table"""
-        global USE_ORACLE, HAS_ORACLE
+        """Lance la connexion à la base en arrière-plan (la fenêtre reste réactive).
+
+        Connexion, vérification du schéma et lecture initiale (statistiques,
+        dernières mesures) se font dans un thread; les résultats sont remis
+        à l'interface par le canal self.ui.
+        """
+        if self.bootstrap_thread and self.bootstrap_thread.is_alive():
+            return
+        self.conn_status_var.set("Connexion en cours...")
+        self.status_var.set("Connexion à la base de données en arrière-plan...")
+        self.bootstrap_thread = threading.Thread(target=self.bootstrap_database,
+                                                 name="db-bootstrap", daemon=True)
+        self.bootstrap_thread.start()
+    
+    def bootstrap_database(self):
+        """Thread de démarrage: Oracle si demandé, sinon (ou en cas d'échec) SQLite"""
+        global USE_ORACLE
         
         # Si Oracle est demandé et disponible, tenter la connexion
         if USE_ORACLE and HAS_ORACLE:
             try:
-                if self.connect_to_oracle():
-                    return True
+                self.bootstrap_oracle()
+                return
             except Exception as e:
-                error_msg = f"Erreur de connexion Oracle: {e}\nPassage à SQLite."
-                print(error_msg)
-                messagebox.showinfo("Fallback SQLite", "La connexion Oracle a échoué, utilisation de SQLite à la place.")
+                print(f"Erreur de connexion Oracle: {e}\nPassage à SQLite.")
                 USE_ORACLE = False  # Désactiver Oracle pour les futures tentatives
+                self.ui.send(self.on_oracle_failed, e)
         
         # Si Oracle a échoué ou n'est pas demandé, utiliser SQLite
-        return self.connect_to_sqlite()
-        
-    def connect_to_oracle(self):
-        """Établit la connexion à Oracle et prépare la table"""
         try:
-            # Connexion avec la chaîne directe
-            self.connection = oracledb.connect(user=DB_USER, password=DB_PASSWORD, dsn=CONNECT_STRING)
-            self.cursor = self.connection.cursor()
-            self.conn_status_var.set(f"Connecté à Oracle ({CONNECT_STRING})")
-            self.status_var.set("Connexion Oracle établie avec succès")
-            self.using_oracle = True
-            
-            # Création/Modification de la table pour autoriser NULL
-            self.cursor.execute("""
-            DECLARE
-              cnt NUMBER;
-              col_nullable VARCHAR2(1);
-            BEGIN
-              SELECT COUNT(*) INTO cnt
-                FROM user_tables
-               WHERE table_name = UPPER('CPU_TEMPERATURES');
-              
-              IF cnt = 0 THEN
-                EXECUTE IMMEDIATE '
-                  CREATE TABLE cpu_temperatures (
-                    id           NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
-                    timestamp    TIMESTAMP     NOT NULL,
-                    temp_celsius NUMBER(5,2)   NULL
-                  )';
-              ELSE
-                -- Vérifier si la colonne temp_celsius accepte les NULL
-                SELECT nullable INTO col_nullable
-                FROM user_tab_columns
-                WHERE table_name = 'CPU_TEMPERATURES'
-                AND column_name = 'TEMP_CELSIUS';
-                
-                -- Si la colonne est définie comme NOT NULL, la modifier
-                IF col_nullable = 'N' THEN
-                  EXECUTE IMMEDIATE 'ALTER TABLE cpu_temperatures MODIFY (temp_celsius NULL)';
-                END IF;
-              END IF;
-            END;
-            """)
-            self.connection.commit()
-            
-            # Obtenir le nombre total d'enregistrements
-            self.cursor.execute("SELECT COUNT(*) FROM cpu_temperatures")
-            self.total_records = self.cursor.fetchone()[0]
-            self.records_var.set(str(self.total_records))
-            
-            # Chargement des données récentes
-            self.load_recent_data()
-            
-            return True
-        except oracledb.DatabaseError as e:
-            error_msg = f"Erreur de connexion Oracle : {e}"
-            self.conn_status_var.set("Non connecté - Erreur Oracle")
-            self.status_var.set(error_msg)
-            messagebox.showerror("Erreur Oracle", error_msg)
-            return self.connect_to_sqlite()  # Fallback to SQLite
-    
-    def connect_to_sqlite(self):
-        """Établit la connexion à SQLite et prépare la table"""
+            self.bootstrap_sqlite()
+        except Exception as e:
+            self.ui.send(self.on_database_failed, e)
+    
+    def bootstrap_oracle(self):
+        """Connexion Oracle, schéma (une fois par version) et lecture initiale"""
+        connection = open_oracle(CONNECT_STRING)
         try:
-            self.connection = sqlite3.connect(SQLITE_DB_PATH)
-            self.cursor = self.connection.cursor()
-            self.conn_status_var.set(f"Connecté à SQLite ({SQLITE_DB_PATH})")
-            self.status_var.set("Connexion SQLite établie avec succès")
-            self.using_oracle = False
-            
-            # Création de la table si elle n'existe pas
-            self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS cpu_temperatures (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                temp_celsius REAL
-            )
-            """)
-            self.connection.commit()
-            
-            # Obtenir le nombre total d'enregistrements
-            self.cursor.execute("SELECT COUNT(*) FROM cpu_temperatures")
-            self.total_records = self.cursor.fetchone()[0]
-            self.records_var.set(str(self.total_records))
-            
-            # Chargement des données récentes
-            self.load_recent_data()
-            
-            return True
+            # Création/mise à niveau du schéma, sautée si déjà vérifiée pour ce DSN
+            ensure_oracle_schema(connection, cache_key=CONNECT_STRING)
+            try:
+                seed, rows = self.read_initial_state(connection, True)
+            except oracledb.DatabaseError as e:
+                if is_disconnect(e):
+                    raise
+                # Schéma modifié hors de l'application: le revérifier
+                ensure_oracle_schema(connection, cache_key=CONNECT_STRING, force=True)
+                seed, rows = self.read_initial_state(connection, True)
+        except Exception:
+            discard_connection(connection)
+            raise
+        self.ui.send(self.on_database_ready, connection, True, seed, rows)
+    
+    def bootstrap_sqlite(self):
+        """Schéma SQLite (sauté si déjà à jour) et lecture initiale"""
+        # Création/mise à niveau sur une connexion temporaire qui active aussi le mode WAL
+        setup = open_sqlite(SQLITE_DB_PATH)
+        try:
+            ensure_sqlite_schema(setup)
+            seed, rows = self.read_initial_state(setup, False)
+        finally:
+            setup.close()
+        # Le lecteur de l'interface est ouvert dans le thread Tk (une connexion par thread)
+        self.ui.send(self.on_database_ready, None, False, seed, rows)
+    
+    def read_initial_state(self, connection, using_oracle):
+        """Agrégats des statistiques (table journalière) et 10 dernières mesures"""
+        cursor = connection.cursor()
+        try:
+            cursor.execute(seed_query())
+            seed = cursor.fetchone()
+            return seed, fetch_recent(cursor, using_oracle, 10)
+        finally:
+            cursor.close()
+    
+    def on_database_ready(self, connection, using_oracle, seed, rows):
+        """Thread Tk: installe la connexion de lecture et affiche l'état initial"""
+        if self.closing:
+            if connection is not None:
+                connection.close()
+            return
+        try:
+            if connection is None:
+                # L'interface ne fait que lire: l'écrivain par lots reste le seul à écrire
+                connection = open_sqlite(SQLITE_DB_PATH, readonly=True)
         except sqlite3.Error as e:
-            error_msg = f"Erreur de connexion SQLite : {e}"
-            self.conn_status_var.set("Non connecté - Erreur SQLite")
-            self.status_var.set(error_msg)
-            messagebox.showerror("Erreur SQLite", error_msg)
-            
-            # On peut fonctionner sans base de données
-            self.connection = None
-            self.cursor = None
-            return False
+            self.on_database_failed(e)
+            return
+        
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.using_oracle = using_oracle
+        if using_oracle:
+            self.conn_status_var.set(f"Connecté à Oracle ({CONNECT_STRING})")
+        else:
+            self.conn_status_var.set(f"Connecté à SQLite ({SQLITE_DB_PATH})")
+        
+        # Statistiques depuis les agrégats journaliers (aucun balayage de la table)
+        self.stats.seed(*seed)
+        self.refresh_stats_display()
+        self.show_recent_rows(rows)
+        self.status_var.set(f"Connexion {'Oracle' if using_oracle else 'SQLite'} établie: "
+                            f"{self.stats.records} enregistrements au total")
+        
+        # Surveillance démarrée avant la fin de la connexion: brancher l'écrivain
+        if self.running and self.writer is None:
+            self.start_writer()
+            if self.collector:
+                self.collector.writer = self.writer
+    
+    def on_oracle_failed(self, e):
+        """Thread Tk: la connexion Oracle a échoué, SQLite prend le relais"""
+        self.conn_status_var.set("Non connecté - Erreur Oracle")
+        self.status_var.set(f"Erreur de connexion Oracle : {e}")
+        messagebox.showinfo("Fallback SQLite", "La connexion Oracle a échoué, utilisation de SQLite à la place.")
+    
+    def on_database_failed(self, e):
+        """Thread Tk: aucune base disponible (la surveillance reste possible)"""
+        error_msg = f"Erreur de connexion SQLite : {e}"
+        self.conn_status_var.set("Non connecté - Erreur SQLite")
+        self.status_var.set(error_msg)
+        messagebox.showerror("Erreur SQLite", error_msg)
+        
+        # On peut fonctionner sans base de données
+        self.connection = None
+        self.cursor = None
     
     def load_recent_data(self):
         """Charge les données récentes de la base"""
@@ -391,105 +469,96 @@ class RealTimeCPUTempMonitor:
             return
             
         try:
-            # Récupération des 10 derniers enregistrements pour le tableau
-            if self.using_oracle:
-                self.cursor.execute("""
-                    SELECT id, timestamp, temp_celsius 
-                    FROM cpu_temperatures 
-                    ORDER BY timestamp DESC 
-                    FETCH FIRST 10 ROWS ONLY
-                """)
-            else:  # SQLite
-                self.cursor.execute("""
-                    SELECT id, timestamp, temp_celsius 
-                    FROM cpu_temperatures 
-                    ORDER BY timestamp DESC 
-                    LIMIT 10
-                """)
-                
-            rows = self.cursor.fetchall()
-            
-            # Effacer les données actuelles
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            # Insertion des nouvelles données
-            for row in rows:
-                # Le format timestamp est différent entre SQLite et Oracle
-                if self.using_oracle:
-                    timestamp_str = row[1].strftime('%Y-%m-%d %H:%M:%S') if hasattr(row[1], 'strftime') else str(row[1])
-                else:
-                    timestamp_str = str(row[1])
-                    
-                temp_str = f"{row[2]:.2f}" if row[2] is not None else "N/A"
-                self.tree.insert('', 'end', values=(row[0], timestamp_str, temp_str))
-            
-            # Récupérer les statistiques
-            if self.using_oracle:
-                self.cursor.execute("""
-                    SELECT 
-                        MIN(temp_celsius), 
-                        MAX(temp_celsius), 
-                        AVG(temp_celsius),
-                        COUNT(*)
-                    FROM cpu_temperatures
-                    WHERE temp_celsius IS NOT NULL
-                """)
-            else:  # SQLite
-                self.cursor.execute("""
-                    SELECT 
-                        MIN(temp_celsius), 
-                        MAX(temp_celsius), 
-                        AVG(temp_celsius),
-                        COUNT(*)
-                    FROM cpu_temperatures
-                    WHERE temp_celsius IS NOT NULL
-                """)
-                
-            stats = self.cursor.fetchone()
-            
-            if stats[0] is not None:
-                self.temp_min_var.set(f"{stats[0]:.2f} °C")
-                self.temp_max_var.set(f"{stats[1]:.2f} °C")
-                self.temp_avg_var.set(f"{stats[2]:.2f} °C")
+            rows = self.fetch_recent_rows()
+        except Exception as e:
+            if not (self.using_oracle and is_disconnect(e)):
+                self.status_var.set(f"Erreur lors du chargement des données: {e}")
+                return
+            # Session de lecture perdue: en reprendre une dans le pool
+            try:
+                self.reconnect_reader()
+                rows = self.fetch_recent_rows()
+            except Exception as e:
+                self.status_var.set(f"Erreur lors du chargement des données: {e}")
+                return
+        
+        try:
+            self.show_recent_rows(rows)
             
-            self.total_records = stats[3]
-            self.records_var.set(str(self.total_records))
+            # Statistiques lues depuis les agrégats courants (aucun balayage)
+            if not self.stats.seeded:
+                self.seed_running_stats()
+            self.refresh_stats_display()
             
-            self.status_var.set(f"Données chargées: {self.total_records} enregistrements au total")
+            self.status_var.set(f"Données chargées: {self.stats.records} enregistrements au total")
         except Exception as e:
             self.status_var.set(f"Erreur lors du chargement des données: {e}")
     
+    def show_recent_rows(self, rows):
+        """Remplace le contenu du tableau par les lignes (id, timestamp, temp)"""
+        # Effacer les données actuelles
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        
+        # Insertion des nouvelles données
+        for row in rows:
+            # Oracle renvoie un datetime, SQLite des millisecondes epoch
+            timestamp_str = format_timestamp(row[1])
+                
+            temp_str = f"{row[2]:.2f}" if row[2] is not None else "N/A"
+            self.tree.insert('', 'end', values=(row[0], timestamp_str, temp_str))
+    
+    def open_history(self):
+        """Ouvre (ou ramène au premier plan) la fenêtre d'historique"""
+        if not self.connection:
+            self.status_var.set("Pas de connexion à la base de données pour l'historique")
+            return
+        if self.history_window and not self.history_window.closed:
+            self.history_window.lift()
+            return
+        self.history_window = HistoryWindow(self.root, lambda: self.connection, self.using_oracle)
+    
+    def fetch_recent_rows(self):
+        """Récupération des 10 derniers enregistrements pour le tableau (parcours d'index)"""
+        return fetch_recent(self.cursor, self.using_oracle, 10)
+    
+    def reconnect_reader(self):
+        """Remplace la session Oracle de lecture par une session saine du pool"""
+        discard_connection(self.connection)
+        self.connection = open_oracle(CONNECT_STRING)
+        self.cursor = self.connection.cursor()
+        self.status_var.set("Session Oracle rétablie")
+    
+    def seed_running_stats(self):
+        """Initialise les agrégats courants depuis la table d'agrégats journaliers"""
+        self.cursor.execute(seed_query())
+        self.stats.seed(*self.cursor.fetchone())
+        self.refresh_stats_display()
+    
+    def refresh_stats_display(self):
+        """Affiche les statistiques courantes dans le panneau"""
+        snapshot = self.stats.snapshot()
+        if snapshot['count']:
+            self.temp_min_var.set(f"{snapshot['min']:.2f} °C")
+            self.temp_max_var.set(f"{snapshot['max']:.2f} °C")
+            self.temp_avg_var.set(f"{snapshot['mean']:.2f} °C")
+        self.records_var.set(str(snapshot['records']))
+    
     def update_graph(self, frame):
-        """Fonction appelée par l'animation pour mettre à jour le graphique"""
-        if not self.temps_history:
-            return self.line,
-        
-        # Garder seulement les MAX_POINTS derniers points
-        if len(self.temps_history) > MAX_POINTS:
-            self.temps_history = self.temps_history[-MAX_POINTS:]
-        
-        dates = [t[0] for t in self.temps_history]
-        temps = [t[1] for t in self.temps_history]
-        
-        # Mettre à jour les données de la ligne
-        self.line.set_data(dates, temps)
-        
-        # Ajuster les axes automatiquement
-        self.ax.relim()
-        self.ax.autoscale_view()
-        
-        # Format des dates sur l'axe X
-        self.fig.autofmt_xdate(rotation=0)
-        
-        return self.line,
+        """Fonction appelée par l'animation pour mettre à jour le graphique (mode 'full')"""
+        if not len(self.history):
+            return self.line, self.util_line, self.freq_line
+        return full_frame(self.fig, self.ax, self.line, self.history,
+                          overlays=[(self.util_line, self.util_history),
+                                    (self.freq_line, self.freq_history)])
     
     def start_monitoring(self):
         """Démarre le thread de surveillance"""
         if self.running:
             return
         
-        # Vérifier si la connexion est active (pas bloquant)
+        # Vérifier si la connexion est active (pas bloquant: l'écrivain sera
+        # branché par on_database_ready si la connexion aboutit)
         if not self.connection or self.cursor is None:
             self.connect_to_database()
         
@@ -506,14 +575,29 @@ class RealTimeCPUTempMonitor:
         SAMPLE_INTERVAL = interval
         
         # Initialiser les données du graphique
-        self.temps_history = []
+        self.history.clear()
+        self.util_history.clear()
+        self.freq_history.clear()
+        
+        # Démarrer l'écrivain par lots si une base est disponible
+        self.start_writer()
         
         # Démarrer l'animation du graphique
-        self.anim = animation.FuncAnimation(
-            self.fig, self.update_graph, interval=UPDATE_INTERVAL*1000, blit=True
-        )
+        self.start_animation()
+        
+        # Moteur d'alertes: sinks configurés + table alerts et barre de statut
+        self.alert_engine = alerts.default_engine(
+            UPDATE_INTERVAL, alerts.build_sinks(ALERT_SINKS) + [self.on_alert])
         
         # Démarrer le thread de surveillance
+        self.collector = Collector(
+            self.writer, UPDATE_INTERVAL, SAMPLE_INTERVAL,
+            read_sensors=self.lire_capteurs_cpu,
+            on_sample=self.on_sample,
+            on_dropped=self.on_sample_dropped,
+            on_error=self.on_monitoring_error,
+            alert_engine=self.alert_engine,
+        )
         self.running = True
         self.monitor_thread = threading.Thread(target=self.monitoring_loop, daemon=True)
         self.monitor_thread.start()
@@ -522,237 +606,291 @@ class RealTimeCPUTempMonitor:
         self.stop_btn.config(state=tk.NORMAL)
         self.status_var.set("Surveillance démarrée")
     
+    def start_animation(self):
+        """Démarre le rendu du graphique selon PLOT_RENDER_MODE"""
+        if PLOT_RENDER_MODE == 'blit':
+            if self.anim is None:
+                self.anim = BlitAnimator(
+                    self.root, self.canvas, self.ax, self.line, self.history,
+                    self.plot_window, PLOT_REFRESH_MS, toolbar=self.toolbar,
+                    overlays=[(self.util_line, self.util_history), (self.freq_line, self.freq_history)]
+                )
+            self.anim.start()
+        else:
+            self.anim = animation.FuncAnimation(
+                self.fig, self.update_graph, interval=UPDATE_INTERVAL*1000, blit=True
+            )
+    
+    def stop_animation(self):
+        """Arrête le rendu du graphique"""
+        if not self.anim:
+            return
+        if isinstance(self.anim, BlitAnimator):
+            self.anim.stop()
+        else:
+            self.anim.event_source.stop()
+            self.anim = None
+    
+    def start_writer(self):
+        """Crée (ou recrée) l'écrivain par lots pour la base active"""
+        if not self.connection:
+            return
+        if self.writer and self.writer.using_oracle == self.using_oracle:
+            self.writer.start()
+            return
+        if self.writer:
+            self.writer.close()
+        self.open_spool()
+        
+        self.writer = BatchWriter(
+            self.open_writer_connection,
+            self.using_oracle,
+            batch_size=WRITE_BATCH_SIZE,
+            max_age=WRITE_BATCH_MAX_AGE,
+            queue_size=WRITE_QUEUE_SIZE,
+            on_flush=self.on_batch_written,
+            on_error=self.on_batch_error,
+            checkpoint_interval=SQLITE_CHECKPOINT_INTERVAL,
+            spool=self.spool,
+            on_outage=self.on_writer_outage,
+        )
+        self.writer.start()
+        self.start_retention()
+    
+    def open_spool(self):
+        """Ouvre le spool de la base active (les mesures y passent avant la base)"""
+        if self.spool:
+            self.spool.close()
+            self.spool = None
+        if not SPOOL_ENABLED:
+            return
+        path = spool_path(SPOOL_PATH, self.using_oracle)
+        try:
+            self.spool = Spool(path, max_size=SPOOL_MAX_BYTES)
+        except (OSError, ValueError) as e:
+            self.status_var.set(f"Spool indisponible ({e}), écriture directe en base")
+            return
+        if len(self.spool):
+            self.status_var.set(f"{len(self.spool)} mesures du spool à rejouer en base")
+    
+    def start_retention(self):
+        """Démarre (ou redémarre) le compactage en tâche de fond pour la base active"""
+        if self.retention:
+            self.retention.stop()
+        self.retention = RetentionJob(
+            self.open_writer_connection,
+            self.using_oracle,
+            retention_targets(RETENTION_RAW_DAYS, RETENTION_MINUTE_DAYS, RETENTION_HOUR_DAYS),
+            interval=RETENTION_INTERVAL,
+            chunk=RETENTION_CHUNK,
+            on_error=lambda e: self.report_status(f"Erreur de compactage: {e}"),
+            # Second écrivain SQLite: sérialisé avec le thread écrivain
+            lock=self.writer.write_lock if self.writer and not self.using_oracle else None,
+        )
+        self.retention.start()
+    
+    def open_writer_connection(self):
+        """Ouvre la connexion dédiée au thread écrivain"""
+        if self.using_oracle:
+            return open_oracle(CONNECT_STRING)
+        # SQLite impose une connexion par thread; la rétention écrit par la
+        # sienne mais sous le verrou d'écriture de l'écrivain (write_lock)
+        return open_sqlite(SQLITE_DB_PATH)
+    
+    def on_batch_written(self, rows, ids):
+        """Appelée par le thread écrivain après chaque commit, avec les id générés"""
+        for _, temp_c, _ in rows:
+            self.stats.add(temp_c)
+        last_timestamp = rows[-1][0]
+        backlog = self.writer.backlog() if self.writer else 0
+        
+        # Mettre à jour le tableau et les statistiques (fusionnés par le canal)
+        self.ui.post('stats', self.refresh_stats_display)
+        self.ui.post('last_save', self.last_save_var.set, last_timestamp.strftime('%H:%M:%S'))
+        records = [(record_id, timestamp, temp_c)
+                   for record_id, (timestamp, temp_c, _) in zip(ids[-10:], rows[-10:])]
+        self.ui.extend('table', self.update_table_with_new_records, records, limit=10)
+        cadence = self.collector.cadence_stats() if self.collector else None
+        cadence_str = ""
+        if cadence and cadence['ticks']:
+            cadence_str = (f" - gigue moy. {cadence['jitter_mean_ms']:.1f} ms,"
+                           f" max {cadence['jitter_max_ms']:.1f} ms,"
+                           f" {cadence['overruns']} dépassements")
+        self.ui.post('status', self.status_var.set,
+                     f"Lot enregistré: {len(rows)} mesures (en attente: {backlog}){cadence_str}")
+    
+    def on_batch_error(self, e, rows):
+        """Appelée par le thread écrivain si un lot n'a pas pu être enregistré"""
+        # La surveillance continue: seul ce lot est perdu
+        self.report_status(f"Erreur d'écriture en base ({len(rows)} mesures perdues): {e}")
+    
+    def on_writer_outage(self, e, backlog):
+        """Appelée par le thread écrivain quand la base devient indisponible"""
+        self.report_status(f"Base indisponible ({e}): mesures conservées dans le spool "
+                           f"({backlog} en attente)")
+    
     def stop_monitoring(self):
         """Arrête le thread de surveillance"""
         self.running = False
+        if self.collector:
+            self.collector.stop()
+        self.close_alert_engine()
         
         # Arrêter l'animation
-        if self.anim:
-            self.anim.event_source.stop()
-            self.anim = None
+        self.stop_animation()
         
         self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
         self.status_var.set("Surveillance arrêtée")
     
+    def close_alert_engine(self):
+        """Ferme les sinks du moteur d'alertes (un moteur neuf à chaque démarrage)"""
+        if self.alert_engine:
+            self.alert_engine.close()
+            self.alert_engine = None
+    
     def monitoring_loop(self):
         """Boucle principale de surveillance qui s'exécute dans un thread séparé"""
-        # Créer une connexion dédiée pour ce thread si on utilise SQLite
-        thread_connection = None
-        thread_cursor = None
+        self.collector.run()
+    
+    def on_sample(self, timestamp, temp_c, reading):
+        """Appelée par le collecteur après chaque lecture"""
+        sampler = get_load_sampler()
+        load = reading.load_summary(sampler.freq_max if sampler else None) if reading is not None else None
         
-        if self.connection and not self.using_oracle:
-            # Pour SQLite, on crée une nouvelle connexion dans ce thread
-            try:
-                thread_connection = sqlite3.connect(SQLITE_DB_PATH)
-                thread_cursor = thread_connection.cursor()
-            except sqlite3.Error as e:
-                self.root.after(0, lambda: self.status_var.set(f"Erreur de connexion SQLite dans le thread: {e}"))
+        # Mettre à jour l'affichage de la température
+        self.ui.post('temperature', self.update_temperature_display, temp_c, timestamp, reading,
+                     self.alert_engine.level if self.alert_engine else None, load)
+        
+        # Ajouter à l'historique pour le graphique (charge sur la même base de temps)
+        epoch = timestamp.timestamp()
+        if temp_c is not None:
+            self.history.append(epoch, temp_c)
+        if load is not None:
+            if load.util is not None:
+                self.util_history.append(epoch, load.util)
+            if load.freq_pct is not None:
+                self.freq_history.append(epoch, load.freq_pct)
+    
+    def on_alert(self, alert):
+        """Sink d'alerte (thread collecteur): table alerts et barre de statut"""
+        # self.writer est relu à chaque alerte: il peut être branché après le démarrage
+        if self.writer is not None:
+            self.writer.submit_alert(alert)
+        prefix = "Alerte" if alert.state == alerts.RAISED else "Fin d'alerte"
+        self.report_status(f"{prefix} {alert.timestamp.strftime('%H:%M:%S')}: {alert.message}")
+    
+    def on_sample_dropped(self, timestamp):
+        """Appelée par le collecteur si la file d'écriture est pleine"""
+        self.report_status(f"File d'écriture pleine: {self.writer.dropped} mesures perdues")
+    
+    def on_monitoring_error(self, e):
+        """Appelée si la boucle de surveillance s'arrête sur une erreur"""
+        error_msg = f"Erreur dans la boucle de surveillance: {e}"
+        self.running = False
+        self.ui.send(self.on_monitoring_stopped, error_msg)
+    
+    def on_monitoring_stopped(self, error_msg):
+        """Thread Tk: affiche l'erreur et réactive le bouton Démarrer"""
+        self.status_var.set(error_msg)
+        self.start_btn.config(state=tk.NORMAL)
+        self.stop_btn.config(state=tk.DISABLED)
+        messagebox.showerror("Erreur", error_msg)
+    
+    def update_temperature_display(self, temp_c, timestamp, reading=None, level=None, load=None):
+        """Met à jour l'affichage de la température actuelle et son indicateur coloré.
+
+        level est le niveau des seuils du moteur d'alertes (avec hystérésis),
+        load le sensors.LoadSummary de la même lecture.
+        """
+        # Canal le plus chaud parmi tous les capteurs
+        hottest = reading.hottest() if reading is not None else None
+        if hottest:
+            self.hotspot_var.set(f"{hottest[0]} ({hottest[1]:.1f} °C, {reading.temperatures()} capteurs)")
+        
+        if load is not None:
+            parts = []
+            if load.util is not None:
+                parts.append(f"{load.util:.0f} %")
+            if load.freq is not None:
+                parts.append(f"{load.freq / 1000:.2f} GHz")
+            if load.load1 is not None:
+                parts.append(f"load {load.load1:.2f}")
+            self.load_var.set(", ".join(parts))
         
-        while self.running:
-            try:
-                # Lire la température
-                temp_c = self.lire_temperature_cpu()
-                timestamp = datetime.datetime.now()
-                
-                # Mettre à jour l'affichage de la température
-                self.root.after(0, self.update_temperature_display, temp_c, timestamp)
-                
-                # Ajouter à l'historique pour le graphique
-                if temp_c is not None:
-                    self.temps_history.append((timestamp, temp_c))
-                
-                # Insérer dans la base de données toutes les SAMPLE_INTERVAL secondes
-                if (self.last_save_time is None or 
-                    (timestamp - self.last_save_time).total_seconds() >= SAMPLE_INTERVAL):
-                    
-                    # Choisir la connexion appropriée selon le thread
-                    if self.using_oracle and self.connection and self.cursor:
-                        # Utiliser la connexion Oracle principale (pas de problème de thread)
-                        connection = self.connection
-                        cursor = self.cursor
-                    elif thread_connection and thread_cursor:
-                        # Utiliser la connexion SQLite de ce thread
-                        connection = thread_connection
-                        cursor = thread_cursor
-                    else:
-                        connection = None
-                        cursor = None
-                    
-                    if connection and cursor:
-                        if self.using_oracle:
-                            # Oracle
-                            if temp_c is not None:
-                                cursor.execute(
-                                    "INSERT INTO cpu_temperatures (timestamp, temp_celsius) VALUES (:ts, :temp)",
-                                    {'ts': timestamp, 'temp': round(temp_c, 2)}
-                                )
-                            else:
-                                cursor.execute(
-                                    "INSERT INTO cpu_temperatures (timestamp, temp_celsius) VALUES (:ts, NULL)",
-                                    {'ts': timestamp}
-                                )
-                        else:
-                            # SQLite
-                            timestamp_str = timestamp.strftime('%Y-%m-%d %H:%M:%S')
-                            if temp_c is not None:
-                                cursor.execute(
-                                    "INSERT INTO cpu_temperatures (timestamp, temp_celsius) VALUES (?, ?)",
-                                    (timestamp_str, round(temp_c, 2))
-                                )
-                            else:
-                                cursor.execute(
-                                    "INSERT INTO cpu_temperatures (timestamp, temp_celsius) VALUES (?, NULL)",
-                                    (timestamp_str,)
-                                )
-                        
-                        connection.commit()
-                        self.last_save_time = timestamp
-                        self.total_records += 1
-                        
-                        # Mettre à jour le tableau et les statistiques
-                        self.root.after(0, lambda: self.records_var.set(str(self.total_records)))
-                        self.root.after(0, lambda: self.last_save_var.set(timestamp.strftime('%H:%M:%S')))
-                        self.root.after(0, self.update_table_with_new_record, timestamp, temp_c)
-                
-                # Attendre un court instant
-                time.sleep(UPDATE_INTERVAL)
-                
-            except Exception as e:
-                error_msg = f"Erreur dans la boucle de surveillance: {e}"
-                self.root.after(0, lambda: self.status_var.set(error_msg))
-                self.root.after(0, lambda: messagebox.showerror("Erreur", error_msg))
-                self.running = False
-                self.root.after(0, lambda: self.start_btn.config(state=tk.NORMAL))
-                self.root.after(0, lambda: self.stop_btn.config(state=tk.DISABLED))
-                break
-    
-    def update_temperature_display(self, temp_c, timestamp):
-        """Met à jour l'affichage de la température actuelle et son indicateur coloré"""
         if temp_c is not None:
             self.temp_var.set(f"{temp_c:.1f} °C")
             
             # Mettre à jour l'indicateur coloré
-            if temp_c > 75:  # Critique
+            if level == alerts.CRITICAL:
                 self.temp_indicator.configure(style='Critical.TLabel')
-            elif temp_c > 60:  # Attention
+            elif level == alerts.WARNING:
                 self.temp_indicator.configure(style='Warning.TLabel')
             else:  # Normal
                 self.temp_indicator.configure(style='Normal.TLabel')
                 
-            # Mettre à jour les statistiques si nécessaire
-            try:
-                current_min = float(self.temp_min_var.get().split()[0])
-                if temp_c < current_min or self.temp_min_var.get() == "--.- °C":
-                    self.temp_min_var.set(f"{temp_c:.2f} °C")
-            except:
-                self.temp_min_var.set(f"{temp_c:.2f} °C")
-                
-            try:
-                current_max = float(self.temp_max_var.get().split()[0])
-                if temp_c > current_max or self.temp_max_var.get() == "--.- °C":
-                    self.temp_max_var.set(f"{temp_c:.2f} °C")
-            except:
-                self.temp_max_var.set(f"{temp_c:.2f} °C")
         else:
             self.temp_var.set("N/A")
             self.temp_indicator.configure(style='TLabel')  # Style neutre
     
-    def update_table_with_new_record(self, timestamp, temp_c):
-        """Ajoute un nouvel enregistrement au tableau et retire le plus ancien"""
-        if not self.connection or not self.cursor:
-            return
-            
-        # Récupérer l'ID du dernier enregistrement
-        try:
-            if self.using_oracle:
-                self.cursor.execute("SELECT MAX(id) FROM cpu_temperatures")
-            else:  # SQLite
-                self.cursor.execute("SELECT MAX(id) FROM cpu_temperatures")
-                
-            last_id = self.cursor.fetchone()[0]
-            
-            # Ajouter le nouvel enregistrement en haut du tableau
+    def update_table_with_new_records(self, records):
+        """Ajoute les nouveaux enregistrements (id, timestamp, temp) en haut du tableau.
+
+        Les id sont fournis par l'écrivain: aucun accès à la base ici.
+        """
+        for record_id, timestamp, temp_c in records:
             timestamp_str = timestamp.strftime('%Y-%m-%d %H:%M:%S')
             temp_str = f"{temp_c:.2f}" if temp_c is not None else "N/A"
-            
-            self.tree.insert('', 0, values=(last_id, timestamp_str, temp_str))
-            
-            # Supprimer le dernier élément si plus de 10
-            if len(self.tree.get_children()) > 10:
-                last_item = self.tree.get_children()[-1]
-                self.tree.delete(last_item)
-                
-        except Exception as e:
-            self.status_var.set(f"Erreur lors de la mise à jour du tableau: {e}")
+            self.tree.insert('', 0, values=(record_id, timestamp_str, temp_str))
+        
+        # Ne garder que les 10 plus récents
+        children = self.tree.get_children()
+        if len(children) > 10:
+            self.tree.delete(*children[10:])
     
-    def lire_temperature_cpu(self):
-        """
-        Lit la température CPU moyenne en °C.
-        - Sous Windows: tente WMI, puis fallback à d'autres méthodes.
-        - Sous Linux/macOS: psutil.sensors_temperatures().
-        Retourne float (°C) ou None si impossible.
-        """
-        global skip_wmi
-        # Branch Windows
-        if os.name == 'nt' and not skip_wmi:
-            try:
-                import wmi
-                w = wmi.WMI(namespace="root\\WMI")
-                temps = w.MSAcpi_ThermalZoneTemperature()
-                if temps:
-                    valeurs = [(t.CurrentTemperature / 10.0 - 273.15) for t in temps]
-                    return sum(valeurs) / len(valeurs)
-                else:
-                    raise RuntimeError("Aucun capteur WMI disponible.")
-            except Exception as e:
-                self.root.after(0, lambda: self.status_var.set(f"WMI failed: {e}. Passage en fallback alternatif."))
-                skip_wmi = True
-
-        # Tentative avec psutil (Linux/macOS ou fallback)
-        try:
-            if hasattr(psutil, 'sensors_temperatures'):
-                temps_dict = psutil.sensors_temperatures()
-                
-                # Linux coretemp
-                if 'coretemp' in temps_dict:
-                    valeurs = [t.current for t in temps_dict['coretemp']]
-                    return sum(valeurs) / len(valeurs)
-                # Autre capteur
-                for key in temps_dict:
-                    if temps_dict[key]:
-                        return temps_dict[key][0].current
-        except Exception as e:
-            self.root.after(0, lambda: self.status_var.set(f"psutil.sensors_temperatures() error: {e}"))
-
-        # Si on est sur Windows, essayons une dernière méthode - simulation basée sur la charge CPU
-        if os.name == 'nt':
-            try:
-                # Obtenir charge CPU actuelle
-                cpu_load = psutil.cpu_percent(interval=0.5)
-                # Température ambiante supposée + charge proportionnelle (simulation)
-                simulated_temp = 25 + (cpu_load * 0.5)
-                return simulated_temp
-            except Exception as e:
-                self.root.after(0, lambda: self.status_var.set(f"Méthode alternative de température échouée: {e}"))
-
-        return None
+    def lire_capteurs_cpu(self):
+        """Lit la température CPU et le détail par capteur (voir sensors.lire_capteurs_cpu)"""
+        return lire_capteurs_cpu(self.report_status)
+    
+    def report_status(self, message):
+        """Affiche un message dans la barre de statut depuis n'importe quel thread"""
+        self.ui.post('status', self.status_var.set, message)
     
     def on_closing(self):
         """Ferme proprement l'application"""
+        self.closing = True
         self.running = False
+        if self.collector:
+            self.collector.stop()
+        self.close_alert_engine()
         
         # Arrêter l'animation
-        if self.anim:
-            self.anim.event_source.stop()
+        self.stop_animation()
+        if self.metrics_job is not None:
+            self.root.after_cancel(self.metrics_job)
+            self.metrics_job = None
+        self.ui.stop()
         
         if self.monitor_thread and self.monitor_thread.is_alive():
             self.monitor_thread.join(1.0)  # Attendre 1 seconde max
         
+        if self.retention:
+            self.retention.stop()
+            self.retention = None
+        
+        # Écrire les mesures encore en file avant de fermer
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        if self.spool:
+            self.spool.close()
+            self.spool = None
+        
         if self.cursor:
             self.cursor.close()
         if self.connection:
             self.connection.close()
+        close_oracle_pools()
             
         self.root.destroy()
 
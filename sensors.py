@@ -0,0 +1,469 @@
+import errno
+import os
+import re
+import sys
+import ctypes
+import math
+import time
+from array import array
+from collections import namedtuple
+
+import psutil
+
+from config import SENSOR_BACKEND, LOAD_SAMPLING
+
+# =======================================
+# Lecture des capteurs de température CPU
+# =======================================
+#
+# Module sans dépendance graphique, partagé par l'interface et par le
+# collecteur headless.
+#
+# Une lecture capture tous les capteurs disponibles (coeurs, packages,
+# k10temp, nvme, acpitz...) dans un SensorReading: un tuple de noms de
+# canaux et un vecteur float32 de températures, dans le même ordre.
+#
+# Sous Linux, HwmonReader lit directement /sys/class/hwmon: les entrées
+# sont découvertes une fois, les descripteurs restent ouverts et chaque
+# tick ne fait qu'un os.pread par canal. Un périphérique retiré (ENODEV,
+# ENOENT) ou ajouté (liste des hwmonN modifiée, vérifiée toutes les
+# HWMON_RESCAN_INTERVAL secondes) déclenche une nouvelle découverte. Une
+# entrée qui reste en ENODEV (capteur en veille) ne relance pas la
+# découverte à chaque tick: au plus une fois par intervalle, NaN entre-temps.
+#
+# La charge du processeur est ajoutée au même vecteur (canaux util/N en %,
+# freq/N en MHz, load/1m, load/5m, load/15m): une seule ligne par tick,
+# enregistrée comme les températures, qui permet de distinguer un
+# échauffement dû à la charge d'un défaut de refroidissement.
+
+HWMON_ROOT = '/sys/class/hwmon'
+HWMON_RESCAN_INTERVAL = 30.0  # Secondes entre deux vérifications de la liste des périphériques
+_GONE_ERRNOS = (errno.ENODEV, errno.ENOENT)
+
+# Puces des canaux de charge (les autres canaux sont des températures)
+UTIL_CHIP = 'util'
+FREQ_CHIP = 'freq'
+LOAD_CHIP = 'load'
+LOAD_CHIPS = (UTIL_CHIP, FREQ_CHIP, LOAD_CHIP)
+LOADAVG_LABELS = ('1m', '5m', '15m')
+
+# Résumé de la charge d'un tick: utilisation moyenne (%), fréquence
+# moyenne (MHz), fréquence en % du maximum (ou None), charge sur 1 minute
+LoadSummary = namedtuple('LoadSummary', 'util freq freq_pct load1')
+
+
+def is_load_channel(name):
+    """Vrai pour un canal de charge (utilisation, fréquence, load average)"""
+    return name.split('/', 1)[0] in LOAD_CHIPS
+
+# === Vérification des droits admin sous Windows ===
+skip_wmi = False
+if os.name == 'nt':
+    try:
+        is_admin = ctypes.windll.shell32.IsUserAnAdmin()
+        if not is_admin:
+            print("Attention: exécutez ce script en tant qu'administrateur pour lire la température CPU sous Windows.")
+    except Exception:
+        # Impossible de vérifier, on tentera quand même WMI
+        pass
+
+
+class SensorReading:
+    """Lecture groupée de tous les canaux de température d'un tick"""
+
+    __slots__ = ('channels', 'values')
+
+    def __init__(self, channels, values):
+        self.channels = channels  # tuple de noms "puce/libellé"
+        self.values = values      # array('f'), même ordre que channels
+
+    def __len__(self):
+        return len(self.channels)
+
+    def pack(self):
+        """Sérialise les températures en float32 little-endian"""
+        values = self.values
+        if sys.byteorder != 'little':
+            values = array('f', values)
+            values.byteswap()
+        return values.tobytes()
+
+    @staticmethod
+    def unpack(channels, payload):
+        """Reconstruit une lecture depuis les octets stockés en base"""
+        values = array('f')
+        values.frombytes(payload)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return SensorReading(tuple(channels), values)
+
+    def hottest(self):
+        """Canal de température le plus chaud (nom, température) ou None"""
+        best = None
+        for name, value in zip(self.channels, self.values):
+            if (not math.isnan(value) and (best is None or value > best[1])
+                    and not is_load_channel(name)):
+                best = (name, value)
+        return best
+
+    def temperatures(self):
+        """Nombre de canaux de température (hors canaux de charge)"""
+        return sum(1 for name in self.channels if not is_load_channel(name))
+
+    def extend(self, other):
+        """Nouvelle lecture: canaux de self suivis de ceux de other"""
+        values = array('f', self.values)
+        values.extend(other.values)
+        return SensorReading(self.channels + other.channels, values)
+
+    def load_summary(self, freq_max=None):
+        """LoadSummary des canaux de charge, ou None s'il n'y en a pas"""
+        util, freq, load1 = [], [], None
+        for name, value in zip(self.channels, self.values):
+            if math.isnan(value):
+                continue
+            chip, _, label = name.partition('/')
+            if chip == UTIL_CHIP:
+                util.append(value)
+            elif chip == FREQ_CHIP:
+                freq.append(value)
+            elif chip == LOAD_CHIP and label == LOADAVG_LABELS[0]:
+                load1 = float(value)
+        if not util and not freq and load1 is None:
+            return None
+        util_mean = sum(util) / len(util) if util else None
+        freq_mean = sum(freq) / len(freq) if freq else None
+        freq_pct = freq_mean / freq_max * 100.0 if freq_mean is not None and freq_max else None
+        return LoadSummary(util_mean, freq_mean, freq_pct, load1)
+
+
+class HwmonReader:
+    """Lecteur sysfs hwmon à descripteurs de fichiers persistants.
+
+    root permet de pointer vers une arborescence factice (tests, benchmarks).
+    Les noms de canaux suivent la même convention que lire_capteurs().
+    rescan_interval: secondes entre deux vérifications de la liste des
+    périphériques (None pour ne jamais vérifier), et délai minimal entre
+    deux redécouvertes sur erreur de lecture (HWMON_RESCAN_INTERVAL si None).
+    """
+
+    def __init__(self, root=HWMON_ROOT, rescan_interval=HWMON_RESCAN_INTERVAL):
+        self.root = root
+        self.rescan_interval = rescan_interval
+        self.channels = ()
+        self.paths = []
+        self.fds = []
+        self.devices = ()
+        self.next_rescan = None
+        self.retry_gone_at = None  # Prochaine redécouverte permise sur ENODEV persistant
+        self.discoveries = 0
+        self.discover()
+
+    def _list_devices(self):
+        try:
+            return tuple(sorted(os.listdir(self.root), key=_natural_key))
+        except OSError:
+            return ()
+
+    def discover(self):
+        """(Re)découvre les entrées tempN_input et ouvre leurs descripteurs"""
+        self.close()
+        self.discoveries += 1
+        chips = {}  # nom de puce -> [(libellé, chemin)], dans l'ordre de psutil
+        devices = self._list_devices()
+        self.devices = devices
+        if self.rescan_interval is not None:
+            self.next_rescan = time.monotonic() + self.rescan_interval
+        for device in devices:
+            base = os.path.join(self.root, device)
+            name = _read_text(os.path.join(base, 'name'))
+            if name is None:
+                # Certains pilotes exposent les attributs dans device/
+                base = os.path.join(base, 'device')
+                name = _read_text(os.path.join(base, 'name'))
+            if name is None:
+                name = device
+            try:
+                inputs = [f for f in os.listdir(base) if _TEMP_INPUT.match(f)]
+            except OSError:
+                continue
+            for filename in sorted(inputs, key=_natural_key):
+                prefix = filename[:-len('_input')]
+                label = _read_text(os.path.join(base, prefix + '_label')) or ''
+                chips.setdefault(name, []).append((label, os.path.join(base, filename)))
+
+        channels = []
+        for chip, entries in chips.items():
+            seen = {}
+            for index, (label, path) in enumerate(entries):
+                label = label or str(index)
+                rank = seen.get(label, 0)
+                seen[label] = rank + 1
+                if rank:
+                    label = f"{label}#{rank}"
+                try:
+                    fd = os.open(path, os.O_RDONLY)
+                except OSError:
+                    continue
+                channels.append(f"{chip}/{label}")
+                self.paths.append(path)
+                self.fds.append(fd)
+        self.channels = tuple(channels)
+
+    def read(self):
+        """Relit toutes les entrées (un os.pread par canal)"""
+        if self.next_rescan is not None and time.monotonic() >= self.next_rescan:
+            self.next_rescan = time.monotonic() + self.rescan_interval
+            if self._list_devices() != self.devices:
+                self.discover()
+        values, gone = self._read_values()
+        if gone:
+            now = time.monotonic()
+            if self.retry_gone_at is None or now >= self.retry_gone_at:
+                # Périphérique retiré: nouvelle découverte et relecture immédiate
+                interval = self.rescan_interval
+                self.retry_gone_at = now + (HWMON_RESCAN_INTERVAL if interval is None else interval)
+                self.discover()
+                values, gone = self._read_values()
+        if not gone:
+            self.retry_gone_at = None
+        return SensorReading(self.channels, values)
+
+    def _read_values(self):
+        """Valeurs (NaN si illisibles) et vrai si un périphérique a disparu"""
+        values = array('f', bytes(4 * len(self.fds)))
+        gone = False
+        for i, fd in enumerate(self.fds):
+            try:
+                values[i] = int(os.pread(fd, 32, 0)) / 1000.0
+            except OSError as e:
+                values[i] = math.nan
+                gone = gone or e.errno in _GONE_ERRNOS
+            except ValueError:
+                values[i] = math.nan
+        return values, gone
+
+    def close(self):
+        """Ferme les descripteurs ouverts"""
+        for fd in self.fds:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self.fds = []
+        self.paths = []
+        self.channels = ()
+
+
+class LoadSampler:
+    """Échantillonne utilisation par coeur, fréquence par coeur et load average.
+
+    L'utilisation est mesurée depuis l'appel précédent (psutil, sans
+    attente): avec un appel par tick, c'est la moyenne sur l'intervalle.
+    freq_max est la fréquence maximale annoncée, ou à défaut la plus haute
+    observée (MHz), pour exprimer la fréquence en % du maximum.
+    """
+
+    def __init__(self):
+        self.channels = ()
+        self.freq_max = None
+        self._layout = None
+        psutil.cpu_percent(percpu=True)  # Référence pour la première mesure
+
+    def read(self):
+        """Retourne une SensorReading des canaux de charge"""
+        values = array('f', psutil.cpu_percent(percpu=True))
+        ncores = len(values)
+        try:
+            freqs = psutil.cpu_freq(percpu=True) or []
+        except (OSError, NotImplementedError, AttributeError):
+            freqs = []
+        for entry in freqs:
+            values.append(entry.current)
+            if entry.max:
+                self.freq_max = max(self.freq_max or 0.0, entry.max)
+        if freqs and not any(entry.max for entry in freqs):
+            self.freq_max = max([self.freq_max or 0.0] + [entry.current for entry in freqs])
+        try:
+            values.extend(psutil.getloadavg())
+            nload = len(LOADAVG_LABELS)
+        except (OSError, AttributeError):
+            nload = 0
+
+        # Noms des canaux recalculés seulement si le nombre de coeurs change
+        layout = (ncores, len(freqs), nload)
+        if layout != self._layout:
+            self._layout = layout
+            self.channels = (tuple(f"{UTIL_CHIP}/{i}" for i in range(ncores))
+                             + tuple(f"{FREQ_CHIP}/{i}" for i in range(len(freqs)))
+                             + tuple(f"{LOAD_CHIP}/{label}" for label in LOADAVG_LABELS[:nload]))
+        return SensorReading(self.channels, values)
+
+
+_TEMP_INPUT = re.compile(r'^temp\d+_input$')
+
+
+def _natural_key(name):
+    """Clé de tri 'hwmon2' < 'hwmon10', 'temp2' < 'temp10'"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+
+def _read_text(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+_hwmon_reader = None
+
+
+def _get_hwmon_reader():
+    """Lecteur hwmon partagé, ou None s'il n'est pas utilisable ici"""
+    global _hwmon_reader
+    if SENSOR_BACKEND == 'psutil' or not sys.platform.startswith('linux'):
+        return None
+    if _hwmon_reader is None:
+        _hwmon_reader = HwmonReader()
+    return _hwmon_reader if _hwmon_reader.channels else None
+
+
+_load_sampler = None
+
+
+def get_load_sampler():
+    """Échantillonneur de charge partagé, ou None si LOAD_SAMPLING est désactivé"""
+    global _load_sampler
+    if not LOAD_SAMPLING:
+        return None
+    if _load_sampler is None:
+        _load_sampler = LoadSampler()
+    return _load_sampler
+
+
+def lire_capteurs(sensors_temperatures=None):
+    """Lit tous les capteurs en une seule passe (hwmon direct ou psutil).
+
+    Retourne un SensorReading (éventuellement vide). Les libellés en double
+    sur une même puce sont suffixés par leur rang (#1, #2...).
+    """
+    if sensors_temperatures is None:
+        reader = _get_hwmon_reader()
+        if reader is not None:
+            return reader.read()
+        if not hasattr(psutil, 'sensors_temperatures'):
+            return SensorReading((), array('f'))
+        sensors_temperatures = psutil.sensors_temperatures()
+
+    channels = []
+    values = array('f')
+    for chip, entries in sensors_temperatures.items():
+        seen = {}
+        for index, entry in enumerate(entries):
+            label = entry.label or str(index)
+            rank = seen.get(label, 0)
+            seen[label] = rank + 1
+            if rank:
+                label = f"{label}#{rank}"
+            channels.append(f"{chip}/{label}")
+            current = entry.current
+            values.append(current if current is not None else math.nan)
+    return SensorReading(tuple(channels), values)
+
+
+def temperature_from_reading(reading):
+    """Température CPU agrégée à partir d'une lecture complète.
+
+    Même règle que lire_temperature_cpu: moyenne de coretemp si présente,
+    sinon premier canal disponible.
+    """
+    coretemp = [v for name, v in zip(reading.channels, reading.values)
+                if name.startswith('coretemp/') and not math.isnan(v)]
+    if coretemp:
+        return sum(coretemp) / len(coretemp)
+    for name, value in zip(reading.channels, reading.values):
+        if not math.isnan(value) and not is_load_channel(name):
+            return float(value)
+    return None
+
+
+def lire_temperature_cpu(report=None):
+    """
+    Lit la température CPU moyenne en °C.
+    - Sous Windows: tente WMI, puis fallback à d'autres méthodes.
+    - Sous Linux/macOS: psutil.sensors_temperatures().
+    report(message) est appelée pour signaler un échec de méthode.
+    Retourne float (°C) ou None si impossible.
+    """
+    global skip_wmi
+    if report is None:
+        report = print
+
+    # Branch Windows
+    if os.name == 'nt' and not skip_wmi:
+        try:
+            import wmi
+            w = wmi.WMI(namespace="root\\WMI")
+            temps = w.MSAcpi_ThermalZoneTemperature()
+            if temps:
+                valeurs = [(t.CurrentTemperature / 10.0 - 273.15) for t in temps]
+                return sum(valeurs) / len(valeurs)
+            else:
+                raise RuntimeError("Aucun capteur WMI disponible.")
+        except Exception as e:
+            report(f"WMI failed: {e}. Passage en fallback alternatif.")
+            skip_wmi = True
+
+    # Tentative avec psutil (Linux/macOS ou fallback)
+    try:
+        temp_c = temperature_from_reading(lire_capteurs())
+        if temp_c is not None:
+            return temp_c
+    except Exception as e:
+        report(f"psutil.sensors_temperatures() error: {e}")
+
+    # Si on est sur Windows, essayons une dernière méthode - simulation basée sur la charge CPU
+    if os.name == 'nt':
+        try:
+            # Obtenir charge CPU actuelle
+            cpu_load = psutil.cpu_percent(interval=0.5)
+            # Température ambiante supposée + charge proportionnelle (simulation)
+            simulated_temp = 25 + (cpu_load * 0.5)
+            return simulated_temp
+        except Exception as e:
+            report(f"Méthode alternative de température échouée: {e}")
+
+    return None
+
+
+def lire_capteurs_cpu(report=None):
+    """Lit la température agrégée et le détail par canal en un seul appel.
+
+    Retourne (temp_c, reading). reading contient aussi les canaux de charge
+    (LOAD_SAMPLING); il vaut None si aucun canal n'est disponible.
+    """
+    if report is None:
+        report = print
+
+    load = None
+    sampler = get_load_sampler()
+    if sampler is not None:
+        try:
+            load = sampler.read()
+        except Exception as e:
+            report(f"Lecture de la charge CPU échouée: {e}")
+
+    if os.name != 'nt' or skip_wmi:
+        reading = None
+        try:
+            reading = lire_capteurs()
+        except Exception as e:
+            report(f"psutil.sensors_temperatures() error: {e}")
+        if reading is not None and len(reading):
+            temp_c = temperature_from_reading(reading)
+            return temp_c, reading.extend(load) if load is not None else reading
+        if os.name != 'nt':
+            return None, load
+
+    return lire_temperature_cpu(report), load
@@ -0,0 +1,218 @@
+import datetime
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou consultatif
+    fcntl = None
+
+from sensors import SensorReading
+
+# =======================================
+# Spool local: tampon d'écriture anticipée sur disque
+# =======================================
+#
+# Chaque mesure est d'abord ajoutée à un fichier projeté en mémoire (mmap),
+# en mode ajout seul; le thread écrivain relit ce fichier par lots et
+# n'avance le curseur de lecture qu'après le commit en base. Une base lente
+# ou indisponible ne fait donc que grossir le spool: l'échantillonnage
+# continue et rien n'est perdu, y compris après un redémarrage du processus.
+#
+# Format: un en-tête de 4 Kio (curseurs d'écriture et de lecture, nombre
+# d'enregistrements en attente) suivi d'enregistrements de taille variable:
+#   longueur totale (u32), date en µs epoch (i64), température (f32, NaN si
+#   absente), longueur des noms de canaux (u16), noms séparés par \x1f en
+#   UTF-8, puis les températures des canaux en float32 little-endian.
+# Quand tout a été expédié, les curseurs reviennent au début du fichier.
+# Un spool n'a qu'un seul processus propriétaire (verrou exclusif).
+
+SPOOL_MAGIC = b'CPUSPOOL'
+SPOOL_VERSION = 1
+HEADER = struct.Struct('<8sIQQQ')   # magic, version, écriture, lecture, en attente
+DATA_START = 4096
+RECORD = struct.Struct('<IqfH')
+CHANNEL_SEPARATOR = '\x1f'
+
+
+def spool_path(template, using_oracle):
+    """Chemin du spool de la base cible (un spool par base)"""
+    return template.format(backend='oracle' if using_oracle else 'sqlite')
+
+
+class SpoolFull(Exception):
+    """Le spool a atteint sa taille maximale"""
+
+
+class Spool:
+    """Tampon persistant ajout seul, partagé entre un producteur et un écrivain.
+
+    initial_size: taille du fichier à la création; il double ensuite au
+    besoin jusqu'à max_size (octets), au-delà de quoi append() refuse.
+    """
+
+    def __init__(self, path, initial_size=1024 * 1024, max_size=64 * 1024 * 1024):
+        self.path = path
+        self.max_size = int(max_size)
+        self.condition = threading.Condition()
+        self.channel_cache = {}  # octets des noms -> tuple (objets partagés)
+        self.pending_since = None  # Instant monotone du plus ancien enregistrement non expédié
+
+        exists = os.path.exists(path) and os.path.getsize(path) >= DATA_START
+        self.file = open(path, 'r+b' if exists else 'w+b')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self.file.close()
+                raise OSError(f"Spool déjà utilisé par un autre processus: {path}")
+        if not exists:
+            self.file.truncate(max(DATA_START * 2, int(initial_size)))
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+
+        magic, version, write, read, pending = HEADER.unpack_from(self.mm, 0)
+        if magic != SPOOL_MAGIC:
+            write, read, pending = DATA_START, DATA_START, 0
+            HEADER.pack_into(self.mm, 0, SPOOL_MAGIC, SPOOL_VERSION, write, read, pending)
+        elif version != SPOOL_VERSION:
+            raise ValueError(f"Version de spool non prise en charge: {version}")
+        self.write_offset = write
+        self.read_offset = read
+        self.pending = pending
+        if pending:
+            # Reliquat d'une exécution précédente: à rejouer sans attendre
+            self.pending_since = float('-inf')
+
+    def __len__(self):
+        return self.pending
+
+    def size_bytes(self):
+        """Octets en attente d'expédition"""
+        return self.write_offset - self.read_offset
+
+    def append(self, timestamp, temp_c, reading=None):
+        """Ajoute une mesure; lève SpoolFull si la taille maximale est atteinte"""
+        if reading is not None and len(reading):
+            names = CHANNEL_SEPARATOR.join(reading.channels).encode('utf-8')
+            values = reading.pack()
+        else:
+            names, values = b'', b''
+        length = RECORD.size + len(names) + len(values)
+        micros = int(round(timestamp.timestamp() * 1_000_000))
+        temp = float('nan') if temp_c is None else temp_c
+
+        with self.condition:
+            self._reserve(length)
+            offset = self.write_offset
+            RECORD.pack_into(self.mm, offset, length, micros, temp, len(names))
+            start = offset + RECORD.size
+            self.mm[start:start + len(names)] = names
+            start += len(names)
+            self.mm[start:start + len(values)] = values
+            # Curseur publié après l'enregistrement: un arrêt brutal ne laisse
+            # jamais d'enregistrement partiel dans la zone valide
+            self.write_offset = offset + length
+            self.pending += 1
+            if self.pending_since is None:
+                self.pending_since = time.monotonic()
+            self._store_header()
+            self.condition.notify_all()
+
+    def read(self, max_records):
+        """Lit sans les consommer jusqu'à max_records mesures.
+
+        Retourne (lignes (timestamp, temp, reading), octets lus) à passer
+        à commit() une fois les lignes enregistrées. Les octets lus restent
+        valables même si un compactage déplace les données entre-temps.
+        """
+        rows = []
+        with self.condition:
+            offset = self.read_offset
+            end = self.write_offset
+            mm = self.mm
+            while offset < end and len(rows) < max_records:
+                length, micros, temp, names_len = RECORD.unpack_from(mm, offset)
+                start = offset + RECORD.size
+                reading = None
+                if names_len:
+                    names = mm[start:start + names_len]
+                    channels = self.channel_cache.get(names)
+                    if channels is None:
+                        channels = tuple(names.decode('utf-8').split(CHANNEL_SEPARATOR))
+                        self.channel_cache[names] = channels
+                    reading = SensorReading.unpack(channels, mm[start + names_len:offset + length])
+                timestamp = datetime.datetime.fromtimestamp(micros / 1_000_000)
+                rows.append((timestamp, None if math.isnan(temp) else temp, reading))
+                offset += length
+            return rows, offset - self.read_offset
+
+    def commit(self, nbytes, count):
+        """Marque comme expédiées les count mesures (nbytes octets) lues en tête"""
+        with self.condition:
+            self.read_offset += nbytes
+            self.pending -= count
+            if self.read_offset >= self.write_offset:
+                # Tout est expédié: repartir du début du fichier
+                self.read_offset = self.write_offset = DATA_START
+                self.pending = 0
+                self.pending_since = None
+            else:
+                self.pending_since = time.monotonic()
+            self._store_header()
+
+    def wait(self, min_records, timeout=None):
+        """Attend au moins min_records mesures en attente (ou wake(), ou timeout)"""
+        with self.condition:
+            if self.pending < min_records:
+                self.condition.wait(timeout)
+            return self.pending
+
+    def wake(self):
+        """Réveille un écrivain bloqué dans wait()"""
+        with self.condition:
+            self.condition.notify_all()
+
+    def flush(self):
+        """Force l'écriture des pages modifiées sur disque"""
+        with self.condition:
+            self.mm.flush()
+
+    def close(self):
+        with self.condition:
+            if self.mm is None:
+                return
+            self.mm.flush()
+            self.mm.close()
+            self.file.close()
+            self.mm = None
+
+    def _reserve(self, length):
+        """Garantit length octets libres en fin de zone (compactage puis agrandissement)"""
+        if self.write_offset + length <= len(self.mm):
+            return
+        if self.read_offset > DATA_START:
+            # Ramener les données non expédiées au début du fichier
+            size = self.write_offset - self.read_offset
+            self.mm.move(DATA_START, self.read_offset, size)
+            self.read_offset = DATA_START
+            self.write_offset = DATA_START + size
+            self._store_header()
+            if self.write_offset + length <= len(self.mm):
+                return
+        new_size = len(self.mm)
+        while self.write_offset + length > new_size:
+            new_size *= 2
+        if new_size > self.max_size:
+            raise SpoolFull(f"Spool plein ({self.size_bytes()} octets en attente)")
+        self.mm.flush()
+        self.mm.close()
+        self.file.truncate(new_size)
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+
+    def _store_header(self):
+        HEADER.pack_into(self.mm, 0, SPOOL_MAGIC, SPOOL_VERSION,
+                         self.write_offset, self.read_offset, self.pending)
@@ -0,0 +1,569 @@
+import json
+import pathlib
+import sqlite3
+import threading
+
+from config import (DB_USER, DB_PASSWORD, CONNECT_STRING, SQLITE_DB_PATH,
+                    ORACLE_POOL_MIN, ORACLE_POOL_MAX, ORACLE_STMT_CACHE,
+                    ORACLE_PING_INTERVAL, SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS,
+                    SQLITE_MMAP_SIZE, SQLITE_CACHE_KB, SQLITE_BUSY_TIMEOUT,
+                    SCHEMA_CACHE_FILE)
+from rollups import ensure_rollup_tables, to_epoch_ms, from_epoch_ms
+
+# Vérifier si oracledb est disponible
+try:
+    import oracledb
+    HAS_ORACLE = True
+except ImportError:
+    oracledb = None
+    HAS_ORACLE = False
+
+# =======================================
+# Schéma de stockage Oracle / SQLite
+# =======================================
+#
+# Sous SQLite, cpu_temperatures.timestamp est un INTEGER en millisecondes
+# epoch (lignes plus petites, tri et comparaisons numériques). Les deux
+# bases disposent d'un index sur timestamp pour que "les N dernières
+# mesures" et les requêtes par plage soient des parcours d'index.
+#
+# Les connexions SQLite reçoivent un profil de performance: journal WAL
+# (une seule connexion écrit, les lecteurs lisent un instantané sans la
+# bloquer), synchronous=NORMAL (pas de fsync par commit en WAL), cache de
+# pages et lectures par mmap.
+#
+# La colonne host identifie la machine d'origine des mesures reçues par
+# l'agrégateur de flotte (fleet.py); elle vaut NULL pour la machine locale.
+# Les agrégats, les statistiques et le dédoublonnage du spool ne portent
+# que sur les mesures locales.
+
+# Version du schéma: à incrémenter à chaque modification des DDL ci-dessous.
+# Une base déjà à cette version n'exécute plus les DDL au démarrage (SQLite:
+# PRAGMA user_version; Oracle: fichier SCHEMA_CACHE_FILE, par DSN).
+SCHEMA_VERSION = 2
+
+TIMESTAMP_INDEX = 'cpu_temperatures_ts_idx'
+HOST_INDEX = 'cpu_temperatures_host_ts_idx'
+HOST_MAX_LENGTH = 64
+MIGRATION_CHUNK = 50000  # Lignes copiées par transaction lors de la migration
+
+# Création/Modification de la table Oracle pour autoriser NULL + index temporel
+ORACLE_SCHEMA_DDL = f"""
+DECLARE
+  cnt NUMBER;
+  col_nullable VARCHAR2(1);
+BEGIN
+  SELECT COUNT(*) INTO cnt
+    FROM user_tables
+   WHERE table_name = UPPER('CPU_TEMPERATURES');
+
+  IF cnt = 0 THEN
+    EXECUTE IMMEDIATE '
+      CREATE TABLE cpu_temperatures (
+        id           NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        timestamp    TIMESTAMP     NOT NULL,
+        temp_celsius NUMBER(5,2)   NULL,
+        host         VARCHAR2({HOST_MAX_LENGTH}) NULL
+      )';
+  ELSE
+    -- Vérifier si la colonne temp_celsius accepte les NULL
+    SELECT nullable INTO col_nullable
+    FROM user_tab_columns
+    WHERE table_name = 'CPU_TEMPERATURES'
+    AND column_name = 'TEMP_CELSIUS';
+
+    -- Si la colonne est définie comme NOT NULL, la modifier
+    IF col_nullable = 'N' THEN
+      EXECUTE IMMEDIATE 'ALTER TABLE cpu_temperatures MODIFY (temp_celsius NULL)';
+    END IF;
+
+    -- Colonne host (agrégateur de flotte), NULL pour la machine locale
+    SELECT COUNT(*) INTO cnt
+      FROM user_tab_columns
+     WHERE table_name = 'CPU_TEMPERATURES'
+       AND column_name = 'HOST';
+
+    IF cnt = 0 THEN
+      EXECUTE IMMEDIATE 'ALTER TABLE cpu_temperatures ADD (host VARCHAR2({HOST_MAX_LENGTH}) NULL)';
+    END IF;
+  END IF;
+
+  -- Index temporel (création en ligne pour ne pas bloquer les insertions)
+  SELECT COUNT(*) INTO cnt
+    FROM user_indexes
+   WHERE index_name = UPPER('{TIMESTAMP_INDEX}');
+
+  IF cnt = 0 THEN
+    EXECUTE IMMEDIATE 'CREATE INDEX {TIMESTAMP_INDEX} ON cpu_temperatures (timestamp) ONLINE';
+  END IF;
+
+  -- Index (host, timestamp): dernières mesures d'une machine
+  SELECT COUNT(*) INTO cnt
+    FROM user_indexes
+   WHERE index_name = UPPER('{HOST_INDEX}');
+
+  IF cnt = 0 THEN
+    EXECUTE IMMEDIATE 'CREATE INDEX {HOST_INDEX} ON cpu_temperatures (host, timestamp) ONLINE';
+  END IF;
+END;
+"""
+
+# Mesures multi-capteurs: une ligne par tick, vecteur float32 en BLOB.
+# sensor_layouts sert de dictionnaire: liste ordonnée des noms de canaux.
+# Le vecteur (colonne temps) inclut les canaux de charge CPU de la même
+# lecture (util/N en %, freq/N en MHz, load/1m...; voir sensors.py).
+ORACLE_SENSOR_DDL = """
+DECLARE
+  cnt NUMBER;
+BEGIN
+  SELECT COUNT(*) INTO cnt FROM user_tables WHERE table_name = 'SENSOR_LAYOUTS';
+  IF cnt = 0 THEN
+    EXECUTE IMMEDIATE '
+      CREATE TABLE sensor_layouts (
+        id       NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        channels VARCHAR2(4000) NOT NULL UNIQUE
+      )';
+  END IF;
+
+  SELECT COUNT(*) INTO cnt FROM user_tables WHERE table_name = 'SENSOR_SAMPLES';
+  IF cnt = 0 THEN
+    EXECUTE IMMEDIATE '
+      CREATE TABLE sensor_samples (
+        timestamp TIMESTAMP NOT NULL,
+        layout_id NUMBER    NOT NULL REFERENCES sensor_layouts (id),
+        temps     BLOB      NOT NULL
+      )';
+    EXECUTE IMMEDIATE 'CREATE INDEX sensor_samples_ts_idx ON sensor_samples (timestamp)';
+  END IF;
+END;
+"""
+
+# Alertes du moteur d'alertes (alerts.py): levées et retours à la normale
+ORACLE_ALERTS_DDL = """
+DECLARE
+  cnt NUMBER;
+BEGIN
+  SELECT COUNT(*) INTO cnt FROM user_tables WHERE table_name = 'ALERTS';
+  IF cnt = 0 THEN
+    EXECUTE IMMEDIATE '
+      CREATE TABLE alerts (
+        id        NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        timestamp TIMESTAMP     NOT NULL,
+        kind      VARCHAR2(16)  NOT NULL,
+        severity  VARCHAR2(16)  NOT NULL,
+        state     VARCHAR2(16)  NOT NULL,
+        value     NUMBER,
+        message   VARCHAR2(400)
+      )';
+    EXECUTE IMMEDIATE 'CREATE INDEX alerts_ts_idx ON alerts (timestamp)';
+  END IF;
+END;
+"""
+
+# Partitionnement journalier par intervalle des tables brutes: la rétention
+# supprime des partitions entières. La partition initiale reste vide.
+# Sans option Partitioning (ORA-00439), la conversion est ignorée et la
+# rétention se rabat sur des DELETE par tranches; toute autre erreur remonte.
+ORACLE_PARTITION_DDL = """
+DECLARE
+  cnt NUMBER;
+  partitioning_off EXCEPTION;
+  PRAGMA EXCEPTION_INIT(partitioning_off, -439);
+BEGIN
+  SELECT COUNT(*) INTO cnt FROM user_part_tables WHERE table_name = UPPER('{table}');
+  IF cnt = 0 THEN
+    BEGIN
+      EXECUTE IMMEDIATE '
+        ALTER TABLE {table} MODIFY
+          PARTITION BY RANGE (timestamp) INTERVAL (NUMTODSINTERVAL(1, ''DAY''))
+          (PARTITION p_origin VALUES LESS THAN (TIMESTAMP ''2000-01-01 00:00:00''))
+          ONLINE UPDATE INDEXES ({index} LOCAL)';
+    EXCEPTION
+      WHEN partitioning_off THEN NULL;
+    END;
+  END IF;
+END;
+"""
+
+SQLITE_SENSOR_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS sensor_layouts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        channels TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sensor_samples (
+        timestamp INTEGER NOT NULL,
+        layout_id INTEGER NOT NULL REFERENCES sensor_layouts (id),
+        temps BLOB NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS sensor_samples_ts_idx ON sensor_samples (timestamp)",
+)
+
+SQLITE_ALERTS_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        severity TEXT NOT NULL,
+        state TEXT NOT NULL,
+        value REAL,
+        message TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS alerts_ts_idx ON alerts (timestamp)",
+)
+
+SQLITE_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp INTEGER NOT NULL,
+    temp_celsius REAL,
+    host TEXT
+)
+"""
+
+
+# Codes d'erreur indiquant une session perdue (réseau, arrêt d'instance...)
+DISCONNECT_ERRORS = {
+    'DPY-1001', 'DPY-4011', 'DPI-1080',
+    'ORA-00028', 'ORA-01012', 'ORA-02396', 'ORA-03113', 'ORA-03114', 'ORA-03135',
+}
+
+_oracle_pools = {}
+_oracle_pools_lock = threading.Lock()
+
+
+def get_oracle_pool(dsn=CONNECT_STRING):
+    """Pool de sessions Oracle partagé par DSN (créé au premier appel)"""
+    with _oracle_pools_lock:
+        pool = _oracle_pools.get(dsn)
+        if pool is None:
+            pool = oracledb.create_pool(
+                user=DB_USER, password=DB_PASSWORD, dsn=dsn,
+                min=ORACLE_POOL_MIN, max=ORACLE_POOL_MAX, increment=1,
+                stmtcachesize=ORACLE_STMT_CACHE,
+                ping_interval=ORACLE_PING_INTERVAL,
+                getmode=oracledb.POOL_GETMODE_TIMEDWAIT, wait_timeout=10000,
+            )
+            _oracle_pools[dsn] = pool
+        return pool
+
+
+def open_oracle(dsn=CONNECT_STRING):
+    """Emprunte une session au pool Oracle (close() la rend au pool)"""
+    return get_oracle_pool(dsn).acquire()
+
+
+def close_oracle_pools():
+    """Ferme tous les pools Oracle (à la fermeture de l'application)"""
+    with _oracle_pools_lock:
+        for pool in _oracle_pools.values():
+            try:
+                pool.close(force=True)
+            except Exception:
+                pass
+        _oracle_pools.clear()
+
+
+def is_disconnect(error):
+    """True si l'exception signale une session Oracle perdue"""
+    if oracledb is None or not isinstance(error, oracledb.Error):
+        return False
+    err = error.args[0] if error.args else None
+    return getattr(err, 'full_code', None) in DISCONNECT_ERRORS or bool(getattr(err, 'isrecoverable', False))
+
+
+def is_transient(error):
+    """True si l'échec d'écriture peut disparaître en réessayant plus tard
+    (session perdue, base verrouillée ou injoignable)"""
+    if is_disconnect(error) or isinstance(error, sqlite3.OperationalError):
+        return True
+    return oracledb is not None and isinstance(error, (oracledb.OperationalError,
+                                                       oracledb.InterfaceError))
+
+
+def discard_connection(connection):
+    """Retire une session cassée du pool (ou ferme une connexion simple)"""
+    try:
+        for pool in _oracle_pools.values():
+            try:
+                pool.drop(connection)
+                return
+            except Exception:
+                continue
+        connection.close()
+    except Exception:
+        pass
+
+
+def open_sqlite(path=SQLITE_DB_PATH, readonly=False):
+    """Ouvre une connexion SQLite avec le profil de performance (une par thread).
+
+    readonly=True ouvre la base en lecture seule (mode=ro): destiné aux
+    lecteurs de l'interface, qui ne prennent jamais le verrou d'écriture.
+    """
+    if readonly and path != ':memory:':
+        uri = pathlib.Path(path).absolute().as_uri() + '?mode=ro'
+        connection = sqlite3.connect(uri, uri=True, timeout=SQLITE_BUSY_TIMEOUT)
+    else:
+        connection = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT)
+    apply_sqlite_profile(connection, readonly)
+    return connection
+
+
+def apply_sqlite_profile(connection, readonly=False):
+    """Applique les PRAGMA de performance à une connexion SQLite"""
+    cursor = connection.cursor()
+    try:
+        if not readonly:
+            # Le mode WAL est persistant: il reste actif pour les lecteurs
+            cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size=-{int(SQLITE_CACHE_KB)}")
+        cursor.execute(f"PRAGMA mmap_size={int(SQLITE_MMAP_SIZE)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def checkpoint_sqlite(connection, mode='PASSIVE'):
+    """Reporte le WAL dans la base; retourne (bloqué, pages du WAL, pages reportées).
+
+    Le mode PASSIVE n'attend ni les lecteurs ni les écrivains: les pages
+    encore lues par un instantané seront reportées au checkpoint suivant.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA wal_checkpoint({mode})")
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def ensure_oracle_schema(connection, cache_key=None, force=False):
+    """Crée ou met à niveau le schéma Oracle.
+
+    cache_key (le DSN): ne rien faire si ce schéma a déjà été vérifié à
+    la version courante, et le noter après succès. force=True ignore le
+    cache (schéma supprimé ou modifié hors de l'application).
+    """
+    if cache_key is not None and not force and _schema_cache().get(cache_key) == SCHEMA_VERSION:
+        return False
+    cursor = connection.cursor()
+    try:
+        cursor.execute(ORACLE_SCHEMA_DDL)
+        cursor.execute(ORACLE_SENSOR_DDL)
+        cursor.execute(ORACLE_ALERTS_DDL)
+        connection.commit()
+        cursor.execute(ORACLE_PARTITION_DDL.format(table='cpu_temperatures', index=TIMESTAMP_INDEX))
+        cursor.execute(ORACLE_PARTITION_DDL.format(table='sensor_samples', index='sensor_samples_ts_idx'))
+        ensure_rollup_tables(cursor, True)
+        connection.commit()
+    finally:
+        cursor.close()
+    if cache_key is not None:
+        _store_schema_cache(cache_key)
+    return True
+
+
+def _schema_cache():
+    try:
+        with open(SCHEMA_CACHE_FILE, encoding='utf-8') as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _store_schema_cache(key):
+    cache = _schema_cache()
+    cache[key] = SCHEMA_VERSION
+    try:
+        tmp_path = f"{SCHEMA_CACHE_FILE}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        pathlib.Path(tmp_path).replace(SCHEMA_CACHE_FILE)
+    except OSError:
+        pass  # Simple cache: le schéma sera revérifié au prochain démarrage
+
+
+def ensure_sqlite_schema(connection, force=False):
+    """Crée ou met à niveau le schéma SQLite (migration des dates incluse).
+
+    Retourne False sans rien exécuter si la base est déjà à SCHEMA_VERSION.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("PRAGMA user_version")
+        if not force and cursor.fetchone()[0] >= SCHEMA_VERSION:
+            return False
+
+        cursor.execute(SQLITE_TABLE_DDL.format(table='cpu_temperatures'))
+        connection.commit()
+
+        if sqlite_timestamp_type(cursor) != 'INTEGER':
+            migrate_sqlite_timestamps(connection)
+
+        if not sqlite_has_column(cursor, 'host'):
+            cursor.execute("ALTER TABLE cpu_temperatures ADD COLUMN host TEXT")
+
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TIMESTAMP_INDEX} ON cpu_temperatures (timestamp)")
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {HOST_INDEX} ON cpu_temperatures (host, timestamp)")
+        for statement in SQLITE_SENSOR_DDL + SQLITE_ALERTS_DDL:
+            cursor.execute(statement)
+        connection.commit()
+
+        ensure_rollup_tables(cursor, False)
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        connection.commit()
+        return True
+    finally:
+        cursor.close()
+
+
+def sqlite_timestamp_type(cursor):
+    """Type déclaré de la colonne cpu_temperatures.timestamp"""
+    cursor.execute("PRAGMA table_info(cpu_temperatures)")
+    for row in cursor.fetchall():
+        if row[1] == 'timestamp':
+            return (row[2] or '').upper()
+    return None
+
+
+def sqlite_has_column(cursor, column):
+    """Vrai si cpu_temperatures possède la colonne"""
+    cursor.execute("PRAGMA table_info(cpu_temperatures)")
+    return any(row[1] == column for row in cursor.fetchall())
+
+
+def migrate_sqlite_timestamps(connection, chunk=MIGRATION_CHUNK):
+    """Convertit une ancienne table à dates TEXT en dates INTEGER (ms epoch).
+
+    La copie se fait par tranches d'id dans une table temporaire, chaque
+    tranche dans sa propre transaction: les autres connexions peuvent
+    continuer à écrire, et une migration interrompue reprend là où elle
+    s'était arrêtée. Seule la bascule finale prend le verrou d'écriture.
+    """
+    cursor = connection.cursor()
+    # Les dates TEXT sont en heure locale: 'utc' les convertit avant %s
+    copy_sql = """
+        INSERT INTO cpu_temperatures_migration (id, timestamp, temp_celsius)
+        SELECT id, CAST(strftime('%s', timestamp, 'utc') AS INTEGER) * 1000, temp_celsius
+        FROM cpu_temperatures
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+    """
+    try:
+        cursor.execute(SQLITE_TABLE_DDL.format(table='cpu_temperatures_migration'))
+        connection.commit()
+
+        while True:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM cpu_temperatures_migration")
+            last_id = cursor.fetchone()[0]
+            cursor.execute(copy_sql, (last_id, chunk))
+            copied = cursor.rowcount
+            connection.commit()
+            if copied < chunk:
+                break
+
+        # Bascule: rattraper les dernières lignes puis remplacer la table
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM cpu_temperatures_migration")
+        cursor.execute(copy_sql, (cursor.fetchone()[0], -1))
+        cursor.execute("DROP TABLE cpu_temperatures")
+        cursor.execute("ALTER TABLE cpu_temperatures_migration RENAME TO cpu_temperatures")
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def fetch_recent(cursor, using_oracle, limit=10):
+    """Les limit dernières mesures locales (id, timestamp, temp_celsius), parcours d'index"""
+    if using_oracle:
+        cursor.execute("""
+            SELECT id, timestamp, temp_celsius
+            FROM cpu_temperatures
+            WHERE host IS NULL
+            ORDER BY timestamp DESC
+            FETCH FIRST :1 ROWS ONLY
+        """, (limit,))
+    else:
+        cursor.execute("""
+            SELECT id, timestamp, temp_celsius
+            FROM cpu_temperatures
+            WHERE host IS NULL
+            ORDER BY timestamp DESC
+            LIMIT ?
+        """, (limit,))
+    return cursor.fetchall()
+
+
+def local_timestamps_ms(cursor, using_oracle, first_ms, last_ms):
+    """Dates (ms epoch) des mesures locales déjà en base sur l'intervalle"""
+    if using_oracle:
+        cursor.execute("SELECT timestamp FROM cpu_temperatures "
+                       "WHERE timestamp BETWEEN :1 AND :2 AND host IS NULL",
+                       (from_epoch_ms(first_ms), from_epoch_ms(last_ms)))
+        return {to_epoch_ms(row[0]) for row in cursor}
+    cursor.execute("SELECT timestamp FROM cpu_temperatures "
+                   "WHERE timestamp BETWEEN ? AND ? AND host IS NULL",
+                   (int(first_ms), int(last_ms)))
+    return {row[0] for row in cursor}
+
+
+def get_or_create_layout(cursor, channels, using_oracle):
+    """Identifiant de la liste de canaux dans sensor_layouts (créée si absente)"""
+    key = json.dumps(list(channels), ensure_ascii=False, separators=(',', ':'))
+    if using_oracle:
+        cursor.execute("SELECT id FROM sensor_layouts WHERE channels = :1", (key,))
+    else:
+        cursor.execute("SELECT id FROM sensor_layouts WHERE channels = ?", (key,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    if using_oracle:
+        id_var = cursor.var(int)
+        cursor.execute(
+            "INSERT INTO sensor_layouts (channels) VALUES (:1) RETURNING id INTO :2", (key, id_var))
+        return id_var.getvalue()[0]
+    cursor.execute("INSERT INTO sensor_layouts (channels) VALUES (?)", (key,))
+    return cursor.lastrowid
+
+
+def _blob_as_bytes(cursor, metadata):
+    """outputtypehandler: BLOB lus en bytes avec la ligne (pas d'objet LOB)"""
+    if metadata.type_code is oracledb.DB_TYPE_BLOB:
+        return cursor.var(oracledb.DB_TYPE_LONG_RAW, arraysize=cursor.arraysize)
+
+
+def fetch_blobs_as_bytes(cursor, enabled=True):
+    """Fait revenir les BLOB Oracle en bytes dans chaque paquet du fetch,
+    au lieu d'un aller-retour LOB.read() par ligne (enabled=False rétablit)"""
+    if oracledb is not None:
+        cursor.outputtypehandler = _blob_as_bytes if enabled else None
+
+
+def load_layouts(cursor):
+    """Dictionnaire {layout_id: tuple des noms de canaux}"""
+    cursor.execute("SELECT id, channels FROM sensor_layouts")
+    return {row[0]: tuple(json.loads(row[1])) for row in cursor.fetchall()}
+
+
+def format_timestamp(value):
+    """Formate une date lue en base (datetime Oracle ou ms epoch SQLite)"""
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, (int, float)):
+        return from_epoch_ms(value).strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
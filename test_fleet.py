@@ -0,0 +1,108 @@
+import asyncio
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import fleet
+import history
+from rollups import RESOLUTIONS, to_epoch_ms
+from storage import open_sqlite, ensure_sqlite_schema, fetch_recent, local_timestamps_ms
+
+# =======================================
+# Tests de l'agrégateur de flotte avec des agents simulés sur localhost
+# =======================================
+#
+# L'agrégateur écoute sur un port éphémère et écrit dans une base SQLite
+# temporaire; simulate_agents joue le rôle des collecteurs distants.
+
+AGENTS = 3
+RATE = 20         # Mesures par seconde et par agent
+DURATION = 0.5    # Secondes
+
+
+class FleetAggregatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.workdir, 'fleet.db')
+        connection = open_sqlite(self.path)
+        try:
+            ensure_sqlite_schema(connection)
+        finally:
+            connection.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def run_agents(self, transport):
+        """Démarre l'agrégateur, simule les agents, arrête; retourne (envoyées, stats)"""
+        async def scenario():
+            aggregator = fleet.FleetAggregator(lambda: open_sqlite(self.path), False,
+                                               batch_size=16, max_age=0.05)
+            await aggregator.start('127.0.0.1', 0, udp=transport == 'udp', tcp=transport == 'tcp')
+            try:
+                sent = await fleet.simulate_agents(aggregator.addresses()[transport],
+                                                   AGENTS, RATE, DURATION, transport)
+                await asyncio.sleep(0.1)  # Derniers datagrammes en vol
+            finally:
+                await aggregator.stop()
+            return sent, aggregator.stats()
+        return asyncio.run(scenario())
+
+    def query(self, sql, params=()):
+        connection = open_sqlite(self.path)
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def check_rows(self, sent, stats):
+        expected_hosts = [f'sim-{i:05d}' for i in range(AGENTS)]
+        self.assertGreater(sent, 0)
+        self.assertEqual(stats['received'], sent)
+        self.assertEqual(stats['written'], sent)
+        self.assertEqual((stats['malformed'], stats['dropped'], stats['failed']), (0, 0, 0))
+        self.assertEqual(self.query("SELECT COUNT(*) FROM cpu_temperatures")[0][0], sent)
+        hosts = [row[0] for row in self.query(
+            "SELECT DISTINCT host FROM cpu_temperatures ORDER BY host")]
+        self.assertEqual(hosts, expected_hosts)
+
+    def test_udp_agents(self):
+        self.check_rows(*self.run_agents('udp'))
+
+    def test_tcp_agents(self):
+        self.check_rows(*self.run_agents('tcp'))
+
+    def test_local_queries_exclude_fleet_rows(self):
+        local = datetime.datetime.now() - datetime.timedelta(hours=1)
+        connection = open_sqlite(self.path)
+        try:
+            connection.execute("INSERT INTO cpu_temperatures (timestamp, temp_celsius) VALUES (?, ?)",
+                               (to_epoch_ms(local), 42.0))
+            connection.commit()
+        finally:
+            connection.close()
+        sent, _ = self.run_agents('udp')
+
+        connection = open_sqlite(self.path)
+        try:
+            cursor = connection.cursor()
+            recent = fetch_recent(cursor, False, limit=sent + 10)
+            self.assertEqual([row[2] for row in recent], [42.0])
+            # Les mesures de flotte n'entrent pas dans le dédoublonnage de la reprise locale
+            self.assertEqual(local_timestamps_ms(cursor, False, 0, 2 ** 62), {to_epoch_ms(local)})
+            envelope = history.fetch_envelope(cursor, False, local - datetime.timedelta(minutes=1),
+                                              datetime.datetime.now() + datetime.timedelta(minutes=1),
+                                              width=100)
+            self.assertEqual(envelope.tier, 'raw')
+            self.assertEqual(len(envelope.times), 1)
+            for table, _ in RESOLUTIONS.values():
+                self.assertEqual(cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0], 0)
+        finally:
+            connection.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import errno
+import math
+import os
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+from unittest import mock
+
+import sensors
+from fake_hwmon import FAKE_CHIPS, make_fake_hwmon
+
+# =======================================
+# Tests du lecteur hwmon sur une arborescence sysfs factice
+# =======================================
+#
+# Lancement: python -m pytest -q   (ou python -m unittest test_sensors)
+
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+@unittest.skipUnless(hasattr(os, 'pread'), "os.pread indisponible sur cette plateforme")
+class HwmonReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.root = os.path.join(self.workdir, 'hwmon')
+        make_fake_hwmon(self.root)
+        self.readers = []
+
+    def tearDown(self):
+        for reader in self.readers:
+            reader.close()
+        shutil.rmtree(self.workdir)
+
+    def reader(self, **kwargs):
+        reader = sensors.HwmonReader(self.root, **kwargs)
+        self.readers.append(reader)
+        return reader
+
+    def add_chip(self, device, chip, entries):
+        """Ajoute hwmon<device> avec des entrées (libellé ou None, contenu)"""
+        base = os.path.join(self.root, device)
+        os.makedirs(base)
+        write(os.path.join(base, 'name'), chip + '\n')
+        for n, (label, content) in enumerate(entries, 1):
+            write(os.path.join(base, f'temp{n}_input'), content)
+            if label is not None:
+                write(os.path.join(base, f'temp{n}_label'), label + '\n')
+        return base
+
+    def test_channel_names_and_values(self):
+        reading = self.reader().read()
+        self.assertEqual(len(reading), sum(count for _, count in FAKE_CHIPS))
+        self.assertEqual(reading.channels[:3], ('coretemp/Core 0', 'coretemp/Core 1', 'coretemp/Core 2'))
+        self.assertIn('k10temp/Core 1', reading.channels)
+        values = dict(zip(reading.channels, reading.values))
+        self.assertEqual(values['coretemp/Core 0'], 41.0)
+        self.assertEqual(values['nvme/Core 2'], 43.0)
+
+    def test_natural_device_order(self):
+        self.add_chip('hwmon10', 'zz', [('a', '30000\n')])
+        reading = self.reader().read()
+        self.assertEqual(reading.channels[-1], 'zz/a')
+
+    def test_duplicate_and_missing_labels(self):
+        self.add_chip('hwmon4', 'dup', [('Composite', '30000\n'), ('Composite', '31000\n'),
+                                        (None, '32000\n'), ('Composite', '33000\n')])
+        reading = self.reader().read()
+        dup = [name for name in reading.channels if name.startswith('dup/')]
+        self.assertEqual(dup, ['dup/Composite', 'dup/Composite#1', 'dup/2', 'dup/Composite#2'])
+
+    def test_values_follow_rewritten_files(self):
+        reader = self.reader()
+        path = os.path.join(self.root, 'hwmon0', 'temp1_input')
+        write(path, '55500\n')
+        self.assertEqual(reader.read().values[0], 55.5)
+        write(path, '61250\n')
+        self.assertEqual(reader.read().values[0], 61.25)
+
+    def test_garbage_and_unreadable_inputs_are_nan(self):
+        base = self.add_chip('hwmon4', 'bad', [('garbage', 'abc\n'), ('empty', '')])
+        os.mkdir(os.path.join(base, 'temp3_input'))  # Entrée illisible (EISDIR)
+        reading = self.reader().read()
+        values = dict(zip(reading.channels, reading.values))
+        self.assertTrue(math.isnan(values['bad/garbage']))
+        self.assertTrue(math.isnan(values['bad/empty']))
+        self.assertTrue(math.isnan(values['bad/2']))
+        self.assertEqual(values['coretemp/Core 0'], 41.0)
+        self.assertEqual(reading.hottest()[0], 'coretemp/Core 8')
+
+    def test_rediscovers_when_a_device_disappears(self):
+        reader = self.reader(rescan_interval=None)
+        shutil.rmtree(os.path.join(self.root, 'hwmon1'))
+        real_pread = os.pread
+        gone = set(reader.fds[9:12])  # Descripteurs de nvme (hwmon1)
+
+        def pread(fd, size, offset):
+            # Les numéros de descripteurs sont réutilisés après la redécouverte
+            if fd in gone and reader.discoveries == 1:
+                raise OSError(errno.ENODEV, "No such device")
+            return real_pread(fd, size, offset)
+
+        with mock.patch('sensors.os.pread', side_effect=pread):
+            reading = reader.read()
+        self.assertEqual(reader.discoveries, 2)
+        self.assertFalse(any(name.startswith('nvme/') for name in reading.channels))
+        self.assertFalse(any(math.isnan(value) for value in reading.values))
+
+    def test_persistent_enodev_is_rate_limited(self):
+        reader = self.reader(rescan_interval=None)
+        real_pread = os.pread
+        asleep = reader.paths.index(os.path.join(self.root, 'hwmon1', 'temp1_input'))
+
+        def pread(fd, size, offset):
+            # Capteur présent mais en veille: ENODEV même après redécouverte
+            if fd == reader.fds[asleep]:
+                raise OSError(errno.ENODEV, "No such device")
+            return real_pread(fd, size, offset)
+
+        now = [1000.0]
+        with mock.patch('sensors.os.pread', side_effect=pread), \
+                mock.patch('sensors.time.monotonic', side_effect=lambda: now[0]):
+            for _ in range(5):
+                reading = reader.read()
+            self.assertEqual(reader.discoveries, 2)
+            self.assertTrue(math.isnan(reading.values[asleep]))
+            self.assertEqual(reading.values[0], 41.0)
+            now[0] += sensors.HWMON_RESCAN_INTERVAL
+            reader.read()
+            self.assertEqual(reader.discoveries, 3)
+
+    def test_rescan_picks_up_new_devices(self):
+        reader = self.reader(rescan_interval=0)
+        before = len(reader.read())
+        self.assertEqual(reader.discoveries, 1)  # Liste inchangée: pas de nouvelle découverte
+        self.add_chip('hwmon4', 'new', [('x', '20000\n')])
+        reading = reader.read()
+        self.assertEqual(len(reading), before + 1)
+        self.assertEqual(dict(zip(reading.channels, reading.values))['new/x'], 20.0)
+
+    def test_empty_root(self):
+        reader = sensors.HwmonReader(os.path.join(self.workdir, 'absent'))
+        self.assertEqual(len(reader.read()), 0)
+
+
+class LireCapteursTest(unittest.TestCase):
+
+    def test_psutil_format_none_is_nan(self):
+        entry = namedtuple('shwtemp', 'label current high critical')
+        reading = sensors.lire_capteurs({
+            'coretemp': [entry('Core 0', 50.0, None, None), entry('Core 0', None, None, None)],
+            'acpitz': [entry('', 40.0, None, None)],
+        })
+        self.assertEqual(reading.channels, ('coretemp/Core 0', 'coretemp/Core 0#1', 'acpitz/0'))
+        self.assertTrue(math.isnan(reading.values[1]))
+        self.assertEqual(sensors.temperature_from_reading(reading), 50.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import collections
+import threading
+
+# =======================================
+# Canal de mises à jour de l'interface depuis les threads de travail
+# =======================================
+#
+# Les threads (collecteur, écrivain, connexion) ne touchent jamais Tk: ils
+# déposent leurs mises à jour dans ce canal, que la boucle Tk vide sur un
+# minuteur. Les mises à jour d'un même élément (clé) sont fusionnées entre
+# deux vidages: seule la dernière valeur est appliquée. Le nombre d'appels
+# Tk par seconde est donc borné par (nombre de clés) x (vidages par
+# seconde), quelle que soit la cadence d'échantillonnage.
+#
+# Les événements ponctuels (erreurs, fin de connexion) passent par send():
+# ils ne sont pas fusionnés et sont appliqués dans l'ordre d'envoi.
+
+
+class UiChannel:
+    """File de mises à jour vidée par la boucle Tk toutes les interval_ms"""
+
+    def __init__(self, root, interval_ms=100):
+        self.root = root
+        self.interval_ms = int(interval_ms)
+        self.lock = threading.Lock()
+        self.latest = {}                   # clé -> (callback, args), dernière valeur
+        self.events = collections.deque()  # (callback, args), non fusionnés
+        self.job = None
+
+        # Compteurs observables
+        self.posted = 0
+        self.coalesced = 0
+        self.applied = 0
+
+    def start(self):
+        if self.job is None:
+            self.job = self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+    def post(self, key, callback, *args):
+        """Mise à jour de l'élément key: remplace celle encore en attente"""
+        with self.lock:
+            self.posted += 1
+            if key in self.latest:
+                self.coalesced += 1
+            self.latest[key] = (callback, args)
+
+    def extend(self, key, callback, items, limit=None):
+        """Ajoute des éléments à la liste en attente de key (les limit derniers).
+
+        callback reçoit la liste accumulée depuis le dernier vidage.
+        """
+        with self.lock:
+            self.posted += 1
+            pending = self.latest.get(key)
+            if pending is not None:
+                self.coalesced += 1
+                items = pending[1][0] + list(items)
+            else:
+                items = list(items)
+            if limit is not None:
+                items = items[-limit:]
+            self.latest[key] = (callback, (items,))
+
+    def send(self, callback, *args):
+        """Événement ponctuel, appliqué tel quel au prochain vidage"""
+        with self.lock:
+            self.posted += 1
+            self.events.append((callback, args))
+
+    def drain(self):
+        """Applique les mises à jour en attente (thread Tk); retourne leur nombre"""
+        with self.lock:
+            if not self.latest and not self.events:
+                return 0
+            updates = list(self.latest.values())
+            self.latest.clear()
+            events = list(self.events)
+            self.events.clear()
+        for callback, args in updates + events:
+            try:
+                callback(*args)
+            except Exception as e:
+                # Une mise à jour en échec ne doit pas arrêter le canal
+                print(f"Erreur de mise à jour de l'interface: {e}")
+        self.applied += len(updates) + len(events)
+        return len(updates) + len(events)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'posted': self.posted,
+                'coalesced': self.coalesced,
+                'applied': self.applied,
+                'pending': len(self.latest) + len(self.events),
+            }
+
+    def _tick(self):
+        self.job = self.root.after(self.interval_ms, self._tick)
+        self.drain()
@@ -8,35 +8,62 @@ SELECT USER, TO_CHAR(SYSDATE, 'DD-MON-YYYY HH24:MI:SS') AS DATE_HEURE FROM DUAL;
 -- Voir la structure de la table
 DESCRIBE cpu_temperatures;
 
--- Voir les données enregistrées (10 derniers enregistrements)
-SELECT * FROM cpu_temperatures ORDER BY timestamp DESC FETCH FIRST 10 ROWS ONLY;
+-- Voir les données enregistrées (10 derniers enregistrements locaux,
+-- hors mesures reçues des agents de la flotte)
+SELECT * FROM cpu_temperatures WHERE host IS NULL ORDER BY timestamp DESC FETCH FIRST 10 ROWS ONLY;
 
--- Voir les statistiques des températures
+-- Voir les statistiques des températures (lues depuis les agrégats journaliers)
 SELECT 
-    MIN(temp_celsius) AS min_temp,
-    MAX(temp_celsius) AS max_temp,
-    AVG(temp_celsius) AS avg_temp,
-    COUNT(*) AS total_records
-FROM cpu_temperatures
-WHERE temp_celsius IS NOT NULL;
+    MIN(min_temp) AS min_temp,
+    MAX(max_temp) AS max_temp,
+    SUM(sum_temp) / NULLIF(SUM(temp_count), 0) AS avg_temp,
+    SUM(temp_count) AS total_records
+FROM cpu_temp_rollup_day;
 
 -- Compter le nombre d'enregistrements par jour
 SELECT 
-    TO_CHAR(timestamp, 'YYYY-MM-DD') AS jour,
-    COUNT(*) AS nombre_mesures,
-    ROUND(AVG(temp_celsius), 2) AS temp_moyenne
-FROM cpu_temperatures
-GROUP BY TO_CHAR(timestamp, 'YYYY-MM-DD')
+    TO_CHAR(bucket_start, 'YYYY-MM-DD') AS jour,
+    records AS nombre_mesures,
+    ROUND(sum_temp / NULLIF(temp_count, 0), 2) AS temp_moyenne
+FROM cpu_temp_rollup_day
 ORDER BY jour DESC;
 
--- Trouver les 5 températures les plus élevées
+-- Moyennes horaires des dernières 24 heures
 SELECT 
-    id,
-    timestamp, 
-    temp_celsius
-FROM cpu_temperatures
-WHERE temp_celsius IS NOT NULL
-ORDER BY temp_celsius DESC
+    TO_CHAR(bucket_start, 'YYYY-MM-DD HH24:MI') AS heure,
+    records AS nombre_mesures,
+    ROUND(sum_temp / NULLIF(temp_count, 0), 2) AS temp_moyenne,
+    min_temp,
+    max_temp
+FROM cpu_temp_rollup_hour
+WHERE bucket_start >= CAST(TRUNC(SYSDATE, 'HH') - 1 AS TIMESTAMP)
+ORDER BY bucket_start DESC;
+
+-- Trouver les 5 températures les plus élevées (sur la période conservée
+-- en brut). Les 5 valeurs maximales se trouvent forcément dans les 5 heures
+-- dont le maximum est le plus élevé: on ne lit que ces heures dans la table
+-- brute. Les heures antérieures à la plus ancienne mesure locale restante
+-- (purgées par la rétention) sont écartées, sinon leur maximum occuperait
+-- une place sans qu'aucune ligne brute ne puisse la remplir.
+WITH heures_chaudes AS (
+    SELECT bucket_start
+    FROM cpu_temp_rollup_hour
+    WHERE max_temp IS NOT NULL
+      AND bucket_start >= (SELECT MIN(timestamp) FROM cpu_temperatures WHERE host IS NULL)
+    ORDER BY max_temp DESC
+    FETCH FIRST 5 ROWS ONLY
+)
+SELECT 
+    t.id,
+    t.timestamp, 
+    t.temp_celsius
+FROM cpu_temperatures t
+JOIN heures_chaudes h
+  ON t.timestamp >= h.bucket_start
+ AND t.timestamp <  h.bucket_start + INTERVAL '1' HOUR
+WHERE t.temp_celsius IS NOT NULL
+  AND t.host IS NULL
+ORDER BY t.temp_celsius DESC
 FETCH FIRST 5 ROWS ONLY;
 
 -- Afficher un histogramme ASCII simple des températures
@@ -46,25 +73,24 @@ COLUMN bar FORMAT A50
 BREAK ON REPORT
 COMPUTE SUM OF count ON REPORT
 
-SELECT 
-    CASE 
-        WHEN temp_celsius < 40 THEN 'Moins de 40°C'
-        WHEN temp_celsius < 50 THEN '40°C - 50°C'
-        WHEN temp_celsius < 60 THEN '50°C - 60°C'
-        WHEN temp_celsius < 70 THEN '60°C - 70°C'
-        WHEN temp_celsius < 80 THEN '70°C - 80°C'
-        ELSE 'Plus de 80°C'
-    END AS temp_range,
-    COUNT(*) AS count,
-    RPAD('■', COUNT(*)/10 + 1, '■') AS bar
-FROM cpu_temperatures
-WHERE temp_celsius IS NOT NULL
-GROUP BY CASE 
-    WHEN temp_celsius < 40 THEN 'Moins de 40°C'
-    WHEN temp_celsius < 50 THEN '40°C - 50°C'
-    WHEN temp_celsius < 60 THEN '50°C - 60°C'
-    WHEN temp_celsius < 70 THEN '60°C - 70°C'
-    WHEN temp_celsius < 80 THEN '70°C - 80°C'
-    ELSE 'Plus de 80°C'
-END
+WITH h AS (
+    SELECT 
+        SUM(hist_lt40)  AS lt40,
+        SUM(hist_40_50) AS r40_50,
+        SUM(hist_50_60) AS r50_60,
+        SUM(hist_60_70) AS r60_70,
+        SUM(hist_70_80) AS r70_80,
+        SUM(hist_ge80)  AS ge80
+    FROM cpu_temp_rollup_day
+)
+SELECT temp_range, count, RPAD('■', count/10 + 1, '■') AS bar
+FROM (
+    SELECT 'Moins de 40°C' AS temp_range, lt40   AS count FROM h UNION ALL
+    SELECT '40°C - 50°C',                 r40_50          FROM h UNION ALL
+    SELECT '50°C - 60°C',                 r50_60          FROM h UNION ALL
+    SELECT '60°C - 70°C',                 r60_70          FROM h UNION ALL
+    SELECT '70°C - 80°C',                 r70_80          FROM h UNION ALL
+    SELECT 'Plus de 80°C',                ge80            FROM h
+)
+WHERE count > 0
 ORDER BY temp_range;